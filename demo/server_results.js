@@ -0,0 +1,51 @@
+// Copyright (c) 2012 Thumbtack, Inc.
+
+// Included by python/abba/server.py in the pages it serves, after Abba.SERVER_RESULTS is set to
+// the results it computed. Replaces Abba.Experiment with one returning those results, so they're
+// rendered instead of being computed in the browser. Anything the server didn't compute (after the
+// inputs are edited) is still computed in the browser.
+var Abba = (function(Abba) {
+
+var BrowserExperiment = Abba.Experiment;
+
+Abba.ServerExperiment = function(numVariations, baselineNumSuccesses, baselineNumTrials,
+                                 intervalAlpha) {
+    var server = Abba.SERVER_RESULTS;
+    this._browserExperiment = new BrowserExperiment(
+        numVariations, baselineNumSuccesses, baselineNumTrials, intervalAlpha);
+    this._serverResults = null;
+    if (server
+        && server.numComparisons == Math.max(1, numVariations)
+        && server.baseline.numSuccesses == baselineNumSuccesses
+        && server.baseline.numTrials == baselineNumTrials
+        && Math.abs(server.intervalAlpha - intervalAlpha) < 1e-9) {
+        this._serverResults = server;
+    }
+};
+Abba.ServerExperiment.prototype = {
+    getBaselineProportion: function() {
+        if (this._serverResults) {
+            return this._serverResults.baseline.proportion;
+        }
+        return this._browserExperiment.getBaselineProportion();
+    },
+
+    getResults: function(numSuccesses, numTrials) {
+        var key = numSuccesses + ',' + numTrials;
+        if (this._serverResults && key in this._serverResults.variations) {
+            return this._serverResults.variations[key];
+        }
+        return this._browserExperiment.getResults(numSuccesses, numTrials);
+    }
+};
+
+if (Abba.SERVER_RESULTS) {
+    Abba.Experiment = Abba.ServerExperiment;
+    if (!window.location.hash) {
+        // the app renders the state in the hash when it loads
+        window.location.hash = Abba.SERVER_RESULTS.hash;
+    }
+}
+
+return Abba;
+}(Abba || {}));
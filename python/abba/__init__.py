@@ -24,7 +24,10 @@ Some simple example usage::
     0.047886616311815511
 
 
-ABBA requires SciPy for underlying statistical functions.
+ABBA requires NumPy, and uses SciPy for underlying statistical functions when it's available. SciPy
+is only imported when first needed; a pure NumPy implementation is used if it's missing, or if the
+ABBA_BACKEND environment variable is set to 'numpy' (see abba.backends). Install ABBA[scipy] to
+get it along with ABBA.
 
 For more info, see the docstrings, unit tests, and the ABBA website (including an interactive
 Javascript version) at http://www.thumbtack.com/labs/abba/.
@@ -0,0 +1,145 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Score experiments from asyncio code without blocking the event loop.
+
+Experiment.get_results() can take tens to hundreds of milliseconds on large experiments. A Scorer
+runs scoring in an executor (the event loop's default thread pool, or any concurrent.futures
+executor, including a process pool), and abba.aio.Experiment mirrors abba.stats.Experiment with
+coroutine methods that use one:
+
+    >>> scorer = abba.aio.Scorer(max_concurrency=8)
+    >>> experiment = abba.aio.Experiment(
+    ...     num_trials=3, baseline_num_successes=20, baseline_num_trials=1000, scorer=scorer)
+    >>> results = await experiment.get_results(num_successes=50, num_trials=2000)
+
+Identical requests made while one is already being computed share its result instead of starting
+another computation, and at most max_concurrency computations are submitted to the executor at
+once, so a burst of requests queues cheaply on the event loop rather than flooding the executor.
+
+A Scorer belongs to the event loop it's first used in. Experiments created without one share a
+default Scorer per event loop (see get_default_scorer()), so requests from Experiments built
+separately, e.g. one per web request, are coalesced and limited together.
+"""
+
+import asyncio
+import functools
+import os
+import weakref
+
+from abba import parallel
+from abba import stats
+
+def _get_results(experiment_arguments, num_successes, num_trials):
+    return stats.Experiment(*experiment_arguments).get_results(num_successes, num_trials)
+
+def _get_all_results(experiment_arguments, arms):
+    return stats.Experiment(*experiment_arguments).get_all_results(arms)
+
+class Scorer(object):
+    def __init__(self, executor=None, max_concurrency=None):
+        """
+        executor: a concurrent.futures executor, or None for the event loop's default executor.
+            Work sent to a process pool must be picklable, which it is for all requests made here.
+        max_concurrency: most computations submitted to the executor at once (by default, the
+            number of CPUs)
+        """
+        self._executor = executor
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        # created on first use, so it belongs to the running event loop
+        self._semaphore = None
+        # futures of the computations in progress, by request
+        self._in_flight = {}
+        self.num_computed = 0
+        self.num_coalesced = 0
+
+    def run(self, function, *arguments):
+        """
+        Returns an awaitable for function(*arguments) computed in the executor, sharing the
+        computation with any identical request (same function and arguments, which must be
+        hashable) in progress. Each caller awaits a shield of the shared future, so cancelling one
+        caller doesn't cancel the computation for the others.
+        """
+        key = (function,) + arguments
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._compute(function, arguments))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self.num_computed += 1
+        else:
+            self.num_coalesced += 1
+        return asyncio.shield(future)
+
+    async def _compute(self, function, arguments):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                functools.partial(function, *arguments),
+            )
+
+    async def score_experiment(self, baseline, variations, confidence_level=0.95):
+        """
+        Same as abba.parallel.score_experiment(): score an experiment given as a baseline
+        (num_successes, num_trials) pair and a sequence of such pairs for the variations, in a
+        single computation. Returns a list of Results.
+        """
+        return await self.run(
+            parallel.score_experiment,
+            tuple(baseline),
+            tuple(tuple(variation) for variation in variations),
+            confidence_level,
+        )
+
+# default Scorers by event loop, dropped along with their loops
+_default_scorers = weakref.WeakKeyDictionary()
+
+def get_default_scorer():
+    """
+    Returns the Scorer shared by Experiments created without one in the running event loop,
+    creating it (with the loop's default executor) on first use.
+    """
+    loop = asyncio.get_running_loop()
+    scorer = _default_scorers.get(loop)
+    if scorer is None:
+        scorer = _default_scorers[loop] = Scorer()
+    return scorer
+
+class Experiment(object):
+    """
+    An asyncio counterpart of abba.stats.Experiment, with the same constructor arguments plus the
+    Scorer to use (by default, the running event loop's default one, see get_default_scorer()).
+    """
+    def __init__(self, num_trials, baseline_num_successes, baseline_num_trials,
+                 confidence_level=0.95, scorer=None):
+        self._arguments = (num_trials, baseline_num_successes, baseline_num_trials,
+                           confidence_level)
+        self._experiment = stats.Experiment(*self._arguments)
+        self._scorer = scorer
+
+    @property
+    def scorer(self):
+        """
+        The Scorer given to the constructor, or else the running event loop's default one.
+        """
+        return self._scorer or get_default_scorer()
+
+    def get_baseline_proportion(self):
+        return self._experiment.get_baseline_proportion()
+
+    async def get_results(self, num_successes, num_trials):
+        return await self.scorer.run(_get_results, self._arguments, num_successes, num_trials)
+
+    async def get_all_results(self, arms):
+        """
+        Score several variations, given as (num_successes, num_trials) pairs, in a single
+        computation that scores identical pairs once, as stats.Experiment.get_all_results() does.
+        Returns a list of Results.
+        """
+        return await self.scorer.run(
+            _get_all_results,
+            self._arguments,
+            tuple((num_successes, num_trials) for num_successes, num_trials in arms),
+        )
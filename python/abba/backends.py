@@ -0,0 +1,263 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Implementations of the probability distribution functions used by abba.stats.
+
+ScipyBackend wraps scipy.stats. NumpyBackend is a minimal implementation using only NumPy and the
+math module, for when SciPy is unavailable or too costly to import (it takes hundreds of
+milliseconds and tens of MB). Nothing is imported until the backend is first used; see
+get_backend().
+
+A backend provides norm_pdf(), norm_cdf(), norm_sf() and norm_ppf() for the standard normal
+distribution, and binomial(num_trials, probability), which returns an object with pmf(), cdf(),
+ppf() and isf() methods like a frozen scipy.stats.binom distribution. All functions accept scalars
+or arrays.
+"""
+
+import math
+import os
+
+import numpy
+
+class _ScipyBinomial(object):
+    """
+    Calls the scipy.stats.binom methods with fixed parameters. Equivalent to freezing the
+    distribution, which costs about a millisecond (mostly building docstrings) and dominated
+    scoring small experiments.
+    """
+    __slots__ = ('_binom', '_parameters')
+
+    def __init__(self, binom, num_trials, probability):
+        self._binom = binom
+        self._parameters = (num_trials, probability)
+
+    def pmf(self, count):
+        return self._binom.pmf(count, *self._parameters)
+
+    def cdf(self, count):
+        return self._binom.cdf(count, *self._parameters)
+
+    def sf(self, count):
+        return self._binom.sf(count, *self._parameters)
+
+    def ppf(self, q):
+        return self._binom.ppf(q, *self._parameters)
+
+    def isf(self, q):
+        return self._binom.isf(q, *self._parameters)
+
+class ScipyBackend(object):
+    name = 'scipy'
+
+    def __init__(self):
+        from scipy import stats
+        self._norm = stats.norm
+        self._binom = stats.binom
+
+    def norm_pdf(self, x):
+        return self._norm.pdf(x)
+
+    def norm_cdf(self, x):
+        return self._norm.cdf(x)
+
+    def norm_sf(self, x):
+        return self._norm.sf(x)
+
+    def norm_ppf(self, q):
+        return self._norm.ppf(q)
+
+    def binomial(self, num_trials, probability):
+        return _ScipyBinomial(self._binom, num_trials, probability)
+
+def _vectorize(function):
+    """
+    Apply a scalar function elementwise to a scalar or an array, returning the same kind of value.
+    """
+    vectorized = numpy.vectorize(function, otypes=[float])
+    def apply(x):
+        if numpy.ndim(x) == 0:
+            return function(float(x))
+        return vectorized(x)
+    return apply
+
+# rational approximation coefficients for the normal quantile function from Peter Acklam,
+# "An algorithm for computing the inverse normal cumulative distribution function"
+_ACKLAM_A = (
+    -3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02,
+    -3.066479806614716e+01, 2.506628277459239e+00,
+)
+_ACKLAM_B = (
+    -5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01,
+    -1.328068155288572e+01,
+)
+_ACKLAM_C = (
+    -7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+    -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00,
+)
+_ACKLAM_D = (
+    7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00,
+)
+_ACKLAM_LOW = 0.02425
+
+def _polynomial(coefficients, x):
+    value = 0.0
+    for coefficient in coefficients:
+        value = value * x + coefficient
+    return value
+
+def _norm_ppf(q):
+    if math.isnan(q) or q < 0 or q > 1:
+        return float('nan')
+    if q == 0:
+        return float('-inf')
+    if q == 1:
+        return float('inf')
+    if q > 0.5:
+        # 1 - q is exact here, and the lower tail is computed more accurately
+        return -_norm_ppf(1 - q)
+    if q < _ACKLAM_LOW:
+        r = math.sqrt(-2 * math.log(q))
+        x = _polynomial(_ACKLAM_C, r) / (_polynomial(_ACKLAM_D, r) * r + 1)
+    else:
+        r = q - 0.5
+        s = r * r
+        x = _polynomial(_ACKLAM_A, s) * r / (_polynomial(_ACKLAM_B, s) * s + 1)
+    # one step of Halley's method brings the relative error from about 1e-9 to machine precision
+    error = 0.5 * math.erfc(-x / math.sqrt(2)) - q
+    u = error * math.sqrt(2 * math.pi) * math.exp(x * x / 2)
+    return x - u / (1 + x * u / 2)
+
+class _NumpyBinomial(object):
+    """
+    A binomial distribution evaluated from a table of probability masses over a window around the
+    expectation wide enough that the mass outside it is negligible (well below 1e-30).
+
+    Masses are computed from the ratios of successive masses, accumulated in log space from the
+    lower end of the window and normalized numerically, so no log-gamma evaluations are needed and
+    precision doesn't degrade for large num_trials. Building the table takes
+    O(sqrt(num_trials * probability * (1 - probability))) time; every evaluation after that is a
+    table lookup.
+    """
+    # window half-width, in standard deviations plus a constant for very skewed distributions
+    WINDOW_STANDARD_DEVIATIONS = 12
+    WINDOW_PADDING = 40
+
+    def __init__(self, num_trials, probability):
+        self.num_trials = num_trials
+        self.probability = probability
+        if probability <= 0 or probability >= 1:
+            self._lower = self._upper = 0 if probability <= 0 else num_trials
+            self._masses = numpy.ones(1)
+        else:
+            expectation = num_trials * probability
+            half_width = (
+                self.WINDOW_STANDARD_DEVIATIONS * math.sqrt(expectation * (1 - probability))
+                + self.WINDOW_PADDING
+            )
+            self._lower = int(max(0, math.floor(expectation - half_width)))
+            self._upper = int(min(num_trials, math.ceil(expectation + half_width)))
+            counts = numpy.arange(self._lower, self._upper, dtype=float)
+            # log(P(k + 1) / P(k)) for each k in the window but the last
+            log_ratios = (
+                numpy.log(num_trials - counts) - numpy.log(counts + 1)
+                + math.log(probability) - math.log1p(-probability)
+            )
+            log_masses = numpy.concatenate(([0.0], numpy.cumsum(log_ratios)))
+            masses = numpy.exp(log_masses - log_masses.max())
+            self._masses = masses / masses.sum()
+        self._cdf = numpy.cumsum(self._masses)
+        # the masses are normalized over the window, so avoid rounding error in the last entry
+        self._cdf[-1] = 1.0
+        # survival function P(X > k), summed from the upper end to keep precision in that tail
+        self._survival = numpy.concatenate((numpy.cumsum(self._masses[:0:-1])[::-1], [0.0]))
+
+    def _index(self, count):
+        return numpy.floor(numpy.asarray(count, dtype=float)) - self._lower
+
+    def _lookup(self, table, count, below, above):
+        index = self._index(count)
+        inside = (index >= 0) & (index < len(table))
+        values = numpy.where(index < 0, below, above).astype(float)
+        values[inside] = table[index[inside].astype(int)]
+        return values[()] if values.ndim == 0 else values
+
+    def pmf(self, count):
+        count = numpy.asarray(count, dtype=float)
+        masses = self._lookup(self._masses, count, 0.0, 0.0)
+        return numpy.where(count == numpy.floor(count), masses, 0.0)[()]
+
+    def cdf(self, count):
+        return self._lookup(self._cdf, count, 0.0, 1.0)
+
+    def sf(self, count):
+        return self._lookup(self._survival, count, 1.0, 0.0)
+
+    def ppf(self, q):
+        """
+        Smallest count k with cdf(k) >= q.
+        """
+        index = numpy.searchsorted(self._cdf, q, side='left')
+        return (numpy.minimum(index, len(self._cdf) - 1) + self._lower).astype(float)[()]
+
+    def isf(self, q):
+        """
+        Smallest count k with sf(k) <= q.
+        """
+        index = numpy.searchsorted(-self._survival, -numpy.asarray(q, dtype=float), side='left')
+        return (numpy.minimum(index, len(self._survival) - 1) + self._lower).astype(float)[()]
+
+class NumpyBackend(object):
+    name = 'numpy'
+
+    _erfc = staticmethod(_vectorize(math.erfc))
+    norm_ppf = staticmethod(_vectorize(_norm_ppf))
+
+    def norm_pdf(self, x):
+        return numpy.exp(-numpy.square(x) / 2) / math.sqrt(2 * math.pi)
+
+    def norm_cdf(self, x):
+        return 0.5 * self._erfc(-numpy.asarray(x) / math.sqrt(2))
+
+    def norm_sf(self, x):
+        return 0.5 * self._erfc(numpy.asarray(x) / math.sqrt(2))
+
+    def binomial(self, num_trials, probability):
+        return _NumpyBinomial(num_trials, probability)
+
+BACKENDS = {
+    ScipyBackend.name: ScipyBackend,
+    NumpyBackend.name: NumpyBackend,
+}
+
+_backend = None
+
+def _default_backend():
+    name = os.environ.get('ABBA_BACKEND')
+    if name:
+        return BACKENDS[name]()
+    try:
+        return ScipyBackend()
+    except ImportError:
+        return NumpyBackend()
+
+def get_backend():
+    """
+    Returns the backend in use. Unless set_backend() was called, the first call picks the backend
+    named by the ABBA_BACKEND environment variable ('scipy' or 'numpy'), or else SciPy if it can be
+    imported, or else NumPy.
+    """
+    global _backend
+    if _backend is None:
+        _backend = _default_backend()
+    return _backend
+
+def set_backend(backend):
+    """
+    Select a backend by name ('scipy' or 'numpy'), or pass a backend instance. None restores the
+    default choice.
+    """
+    global _backend
+    if backend is None or not isinstance(backend, str):
+        _backend = backend
+    else:
+        _backend = BACKENDS[backend]()
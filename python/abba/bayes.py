@@ -0,0 +1,238 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Bayesian scoring of experiments, as an alternative to the p-values of abba.stats.Experiment.
+
+Each arm's success rate gets a Beta posterior from a Beta prior (uniform by default) and its counts.
+A variation is scored by the probability that its rate is higher than the baseline's, and by the
+expected loss from choosing it: how much lower its rate is than the baseline's, on average over the
+posteriors (zero where it's higher).
+
+    >>> experiment = abba.bayes.BayesianExperiment(
+    ...     num_trials=1, baseline_num_successes=50, baseline_num_trials=200)
+    >>> results = experiment.get_results(num_successes=70, num_trials=190)
+    >>> results.probability_to_beat_baseline
+
+For two arms these are computed by numerical integration over a grid of each posterior's density,
+in constant time. The probability of each arm being the best of several is computed by Monte Carlo,
+drawing from all the posteriors in chunks limited by a memory budget.
+"""
+
+import collections
+
+import numpy
+
+from abba import stats
+
+# points in the grid over each posterior, spanning this many standard deviations either side of
+# its mean
+_GRID_POINTS = 4096
+_GRID_STANDARD_DEVIATIONS = 20
+# where a posterior's density is infinite at 0 or 1 (a shape parameter below 1), the grid also has
+# this many points spaced geometrically from these distances of 0 and of 1 (which floats resolve
+# less finely)
+_GEOMETRIC_GRID_POINTS = 16384
+_ENDPOINT_DISTANCES = (1e-30, 1e-15)
+
+BayesianResults = collections.namedtuple(
+    'BayesianResults',
+    (
+        'num_successes',
+        'num_trials',
+        # as in abba.stats.Results
+        'proportion', # ValueWithInterval
+        'improvement', # ValueWithInterval
+        'relative_improvement', # ValueWithInterval
+        'probability_to_beat_baseline', # posterior probability that trial > baseline
+        'expected_loss', # posterior mean of max(baseline rate - trial rate, 0)
+        'probability_to_be_best', # among all arms, or None if not computed
+    ),
+)
+
+def beta_posterior(num_successes, num_trials, prior=(1, 1)):
+    """
+    Returns the (alpha, beta) parameters of the Beta posterior of a success rate.
+    """
+    prior_alpha, prior_beta = prior
+    return (prior_alpha + num_successes, prior_beta + num_trials - num_successes)
+
+def _posterior_window(posterior):
+    alpha, beta = posterior
+    total = float(alpha + beta)
+    mean = alpha / total
+    standard_deviation = numpy.sqrt(alpha * beta / (total**2 * (total + 1)))
+    width = _GRID_STANDARD_DEVIATIONS * standard_deviation
+    return max(0.0, mean - width), min(1.0, mean + width)
+
+def _xlogy(x, y):
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return numpy.where(x == 0, 0.0, x * numpy.log(y))
+
+def _grid(posteriors):
+    points = []
+    for posterior in posteriors:
+        lower, upper = _posterior_window(posterior)
+        points.append(numpy.linspace(lower, upper, _GRID_POINTS))
+        alpha, beta = posterior
+        if alpha < 1:
+            points.append([0.0])
+            points.append(numpy.geomspace(_ENDPOINT_DISTANCES[0], upper, _GEOMETRIC_GRID_POINTS))
+        if beta < 1:
+            points.append([1.0])
+            points.append(
+                1 - numpy.geomspace(_ENDPOINT_DISTANCES[1], 1 - lower, _GEOMETRIC_GRID_POINTS)
+            )
+    return numpy.unique(numpy.concatenate(points))
+
+def _interval_masses(posterior, grid):
+    """
+    Returns arrays of the probability and the partial mean of a Beta posterior over each interval
+    between consecutive grid points, normalized numerically.
+
+    These come from the trapezoidal rule, except in an interval at an end of [0, 1] where the
+    density is infinite. There the density is close to a power of the distance to that end, which
+    is integrated exactly.
+    """
+    alpha, beta = posterior
+    log_density = _xlogy(alpha - 1, grid) + _xlogy(beta - 1, 1 - grid)
+    singular = numpy.isposinf(log_density)
+    log_density[singular] = -numpy.inf
+    density = numpy.exp(log_density - log_density.max())
+    widths = numpy.diff(grid)
+    masses = (density[1:] + density[:-1]) / 2 * widths
+    partial_means = (grid[1:] * density[1:] + grid[:-1] * density[:-1]) / 2 * widths
+    if singular[0]:
+        # density proportional to x**(alpha - 1) on [0, grid[1]]
+        masses[0] = density[1] * widths[0] / alpha
+        partial_means[0] = masses[0] * grid[1] * alpha / (alpha + 1)
+    if singular[-1]:
+        masses[-1] = density[-2] * widths[-1] / beta
+        partial_means[-1] = masses[-1] * (1 - widths[-1] * beta / (beta + 1))
+    total = masses.sum()
+    return masses / total, partial_means / total
+
+def _expectation(masses, partial_means, grid, values):
+    """
+    Integral of values, given on the grid and interpolated linearly, against a posterior's interval
+    masses: each interval contributes its mass times the interpolated value at its mean.
+    """
+    return float(numpy.sum(
+        masses * values[:-1]
+        + (partial_means - masses * grid[:-1]) / numpy.diff(grid) * numpy.diff(values)
+    ))
+
+def compare_posteriors(baseline_posterior, variation_posterior):
+    """
+    Returns (P(variation rate > baseline rate), E[max(baseline rate - variation rate, 0)]) for
+    independent Beta posteriors given as (alpha, beta) pairs.
+
+    Both are integrals over the baseline posterior of functions of the variation's cumulative
+    distribution, evaluated on a grid made of points spread over each posterior, so the result is
+    accurate (to about 1e-6) however narrow or far apart the posteriors are, including for shape
+    parameters below 1.
+    """
+    if min(baseline_posterior[1], variation_posterior[1]) < min(
+            baseline_posterior[0], variation_posterior[0], 1):
+        # the same comparison for the failure rates, so that the grid resolves the most singular
+        # density at 0
+        return compare_posteriors(variation_posterior[::-1], baseline_posterior[::-1])
+    grid = _grid((baseline_posterior, variation_posterior))
+    baseline_masses, baseline_partial_means = _interval_masses(baseline_posterior, grid)
+    variation_masses, variation_partial_means = _interval_masses(variation_posterior, grid)
+    variation_cdf = numpy.concatenate(([0.0], numpy.cumsum(variation_masses)))
+    # the variation's partial expectation, E[rate; rate < x]
+    variation_partial_mean = numpy.concatenate(([0.0], numpy.cumsum(variation_partial_means)))
+
+    probability_to_beat = _expectation(
+        baseline_masses,
+        baseline_partial_means,
+        grid,
+        1 - variation_cdf,
+    )
+    expected_loss = _expectation(
+        baseline_masses,
+        baseline_partial_means,
+        grid,
+        grid * variation_cdf - variation_partial_mean,
+    )
+    return min(1.0, max(0.0, probability_to_beat)), max(0.0, expected_loss)
+
+def probability_to_be_best(posteriors, num_draws=100000, seed=None, memory_budget=2**24):
+    """
+    Monte Carlo estimate of the probability that each arm has the highest rate, given a list of
+    (alpha, beta) posteriors. Draws are made in chunks of at most memory_budget bytes.
+    """
+    generator = numpy.random.default_rng(seed)
+    alphas = numpy.array([posterior[0] for posterior in posteriors], dtype=float)
+    betas = numpy.array([posterior[1] for posterior in posteriors], dtype=float)
+    # each draw takes a float per arm, plus as much again for temporaries
+    chunk_size = max(1, memory_budget // (16 * len(posteriors)))
+    wins = numpy.zeros(len(posteriors))
+    remaining = num_draws
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        draws = generator.beta(alphas, betas, size=(size, len(posteriors)))
+        wins += numpy.bincount(draws.argmax(axis=1), minlength=len(posteriors))
+        remaining -= size
+    return wins / num_draws
+
+class BayesianExperiment(object):
+    """
+    A Bayesian counterpart of abba.stats.Experiment, with the same constructor arguments plus the
+    prior as an (alpha, beta) pair. proportion, improvement and relative_improvement are the same
+    confidence intervals as Experiment reports.
+    """
+    def __init__(self, num_trials, baseline_num_successes, baseline_num_trials,
+                 confidence_level=0.95, prior=(1, 1)):
+        """
+        num_trials: number of trials to be compared to the baseline
+        """
+        self.prior = prior
+        self._experiment = stats.Experiment(
+            num_trials,
+            baseline_num_successes,
+            baseline_num_trials,
+            confidence_level,
+        )
+        self._baseline_posterior = beta_posterior(
+            baseline_num_successes,
+            baseline_num_trials,
+            prior,
+        )
+
+    def get_baseline_proportion(self):
+        return self._experiment.get_baseline_proportion()
+
+    def get_results(self, num_successes, num_trials, probability_to_be_best=None):
+        probability_to_beat, expected_loss = compare_posteriors(
+            self._baseline_posterior,
+            beta_posterior(num_successes, num_trials, self.prior),
+        )
+        return BayesianResults(
+            num_successes,
+            num_trials,
+            *(
+                self._experiment.get_estimates(num_successes, num_trials)
+                + (probability_to_beat, expected_loss, probability_to_be_best)
+            )
+        )
+
+    def get_all_results(self, variations, num_draws=100000, seed=None, memory_budget=2**24):
+        """
+        Score several variations, given as (num_successes, num_trials) pairs, including the
+        probability that each is the best of all arms, baseline included (see
+        probability_to_be_best() for the other arguments). Returns a list of BayesianResults.
+        """
+        probabilities = probability_to_be_best(
+            [self._baseline_posterior] + [
+                beta_posterior(num_successes, num_trials, self.prior)
+                for num_successes, num_trials in variations
+            ],
+            num_draws=num_draws,
+            seed=seed,
+            memory_budget=memory_budget,
+        )
+        return [
+            self.get_results(num_successes, num_trials, probability_to_be_best=probability)
+            for (num_successes, num_trials), probability in zip(variations, probabilities[1:])
+        ]
@@ -0,0 +1,119 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+A bounded LRU cache for memoizing p-values. See abba.stats.enable_cache().
+"""
+
+import collections
+import pickle
+import threading
+import time
+
+CacheInfo = collections.namedtuple(
+    'CacheInfo',
+    ('hits', 'misses', 'evictions', 'expirations', 'size', 'maxsize', 'ttl'),
+)
+
+class ResultCache(object):
+    """
+    A thread-safe least-recently-used cache with an optional time-to-live.
+
+    maxsize: maximum number of entries kept; the least recently used entry is evicted beyond this.
+    ttl: number of seconds an entry stays valid, or None to keep entries until evicted.
+
+    Entries are stamped with wall-clock expiration times, so a cache saved by one process with
+    save() can be merged into the cache of another process with load().
+    """
+    def __init__(self, maxsize=4096, ttl=None, clock=time.time):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._expired(entry[0])
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at <= self._clock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._expired(entry[0]):
+                self.expirations += 1
+                self.misses += 1
+                return default
+            # re-inserting moves the entry to the most recently used end
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._store(key, expires_at, value)
+
+    def _store(self, key, expires_at, value):
+        self._entries.pop(key, None)
+        self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        return CacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+            size=len(self._entries),
+            maxsize=self.maxsize,
+            ttl=self.ttl,
+        )
+
+    def save(self, path):
+        """
+        Write all unexpired entries to the file at path, for sharing with other processes.
+        """
+        with self._lock:
+            entries = [
+                (key, expires_at, value)
+                for key, (expires_at, value) in self._entries.items()
+                if not self._expired(expires_at)
+            ]
+        with open(path, 'wb') as output_file:
+            pickle.dump(entries, output_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        """
+        Merge unexpired entries from a file written by save(). Loaded entries are treated as most
+        recently used, so they may evict existing entries. Returns the number of entries loaded.
+        """
+        with open(path, 'rb') as input_file:
+            entries = pickle.load(input_file)
+        num_loaded = 0
+        with self._lock:
+            for key, expires_at, value in entries:
+                if not self._expired(expires_at):
+                    self._store(key, expires_at, value)
+                    num_loaded += 1
+        return num_loaded
@@ -0,0 +1,478 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+The abba command: score experiments from CSV or JSONL files of counts or events.
+
+    $ abba results.csv
+    $ zcat events.jsonl.gz | abba --input_format jsonl --output_format csv > scores.csv
+
+Each input row (a CSV line under a header, or a JSON object per line) has an experiment id, an arm
+label and either counts (num_successes and num_trials columns) or a single event, when there is no
+num_trials column: one trial, which is a success if the num_successes column is 1 or true. Column
+names are set with the --*_column options. Rows are summed per experiment and arm in a single
+pass, so memory use depends on the number of arms, not rows. Each experiment is then scored with
+abba.stats.Experiment, the baseline being chosen as in abba.report.choose_baseline().
+
+Output is one JSON object per experiment (as in abba.report.group_results_to_dict(), with the
+experiment id, or an error), or one CSV row per variation with the columns of
+abba.columnar.score_arrays(). Experiments are output in the order they first appear.
+
+Files on disk are memory-mapped; large ones are split into ranges of lines summed by separate
+processes, which assumes no record spans lines. Many experiments are scored in processes as well,
+using abba.parallel.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+
+from abba import parallel
+from abba import report
+from abba import stats
+
+Columns = collections.namedtuple(
+    'Columns',
+    ('experiment', 'label', 'num_successes', 'num_trials'),
+)
+DEFAULT_COLUMNS = Columns('experiment', 'label', 'num_successes', 'num_trials')
+
+INPUT_FORMATS = ('csv', 'jsonl')
+OUTPUT_FORMATS = ('jsonl', 'csv')
+_EXTENSION_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl'}
+
+# split files at least this large among worker processes, and score in processes when there are at
+# least this many experiments; below these, starting the processes costs more than it saves
+PARALLEL_MIN_BYTES = 16 * 2**20
+PARALLEL_MIN_EXPERIMENTS = 200
+# ranges per worker, so a slow range doesn't leave the other workers idle
+_RANGES_PER_WORKER = 4
+
+_TRUE_VALUES = frozenset(('1', 'true', 't', 'yes', 'y'))
+_FALSE_VALUES = frozenset(('0', 'false', 'f', 'no', 'n', ''))
+# the usual event values, looked up before trying other spellings
+_EVENT_SUCCESSES = {'0': 0, '1': 1, 'false': 0, 'true': 1, 0: 0, 1: 1}
+# bytes of a file decoded at once
+_BLOCK_SIZE = 2**20
+
+CSV_FIELDS = (
+    'experiment', 'label', 'num_successes', 'num_trials',
+    'baseline_label', 'baseline_num_successes', 'baseline_num_trials',
+    'proportion', 'proportion_lower_bound', 'proportion_upper_bound',
+    'improvement', 'improvement_lower_bound', 'improvement_upper_bound',
+    'relative_improvement', 'relative_improvement_lower_bound', 'relative_improvement_upper_bound',
+    'two_tailed_p_value', 'improvement_one_tailed_p_value',
+)
+
+def _parse_count(value):
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+def _parse_success(value):
+    if isinstance(value, (bool, int)) and value in (0, 1):
+        return int(value)
+    normalized = str(value).strip().lower()
+    if normalized in _TRUE_VALUES:
+        return 1
+    if normalized in _FALSE_VALUES:
+        return 0
+    raise ValueError
+
+def _csv_records(lines, indexes):
+    """
+    Yield (experiment, label, num_successes, num_trials) from CSV lines, given the Columns of field
+    indexes; num_trials is None for events, as is a missing experiment.
+    """
+    experiment_index, label_index, successes_index, trials_index = indexes
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        try:
+            yield (
+                row[experiment_index] if experiment_index is not None else None,
+                row[label_index],
+                row[successes_index],
+                row[trials_index] if trials_index is not None else None,
+            )
+        except IndexError:
+            raise ValueError('Too few fields in row %r' % (row,))
+
+def _jsonl_records(lines, columns):
+    for line in lines:
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict) or columns.label not in row:
+            raise ValueError('Row has no %r: %r' % (columns.label, row))
+        if columns.num_successes not in row:
+            raise ValueError('Row has no %r: %r' % (columns.num_successes, row))
+        yield (
+            row.get(columns.experiment),
+            row[columns.label],
+            row[columns.num_successes],
+            row.get(columns.num_trials),
+        )
+
+def _records(lines, input_format, fields):
+    if input_format == 'csv':
+        return _csv_records(lines, fields)
+    return _jsonl_records(lines, fields)
+
+def _sum_records(records, totals):
+    """
+    Add records to totals, a dict of (experiment, label) -> [num_successes, num_trials]. One lookup
+    per record; aggregate_records() nests the result.
+    """
+    for experiment, label, num_successes, num_trials in records:
+        try:
+            if num_trials is None:
+                success = _EVENT_SUCCESSES.get(num_successes)
+                num_successes = _parse_success(num_successes) if success is None else success
+                num_trials = 1
+            else:
+                num_successes = _parse_count(num_successes)
+                num_trials = _parse_count(num_trials)
+            key = (experiment, label)
+            counts = totals.get(key)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid row: %r' % ((experiment, label, num_successes, num_trials),))
+        if counts is None:
+            totals[key] = [num_successes, num_trials]
+        else:
+            counts[0] += num_successes
+            counts[1] += num_trials
+    return totals
+
+def _merge_totals(totals, other):
+    for key, (num_successes, num_trials) in other.items():
+        counts = totals.get(key)
+        if counts is None:
+            totals[key] = [num_successes, num_trials]
+        else:
+            counts[0] += num_successes
+            counts[1] += num_trials
+    return totals
+
+def _nest_totals(totals):
+    experiments = collections.OrderedDict()
+    for (experiment, label), counts in totals.items():
+        groups = experiments.get(experiment)
+        if groups is None:
+            groups = experiments[experiment] = collections.OrderedDict()
+        groups[label] = counts
+    return experiments
+
+def aggregate_records(records):
+    """
+    Sum (experiment, label, num_successes, num_trials) records, where num_trials is None for a
+    single event, into an OrderedDict of experiment -> OrderedDict of label -> [num_successes,
+    num_trials], both in the order first seen.
+    """
+    return _nest_totals(_sum_records(records, collections.OrderedDict()))
+
+def _csv_indexes(header, columns):
+    names = next(csv.reader([header.lstrip('\ufeff')]), [])
+    indexes = dict((name.strip(), index) for index, name in enumerate(names))
+    for name in (columns.label, columns.num_successes):
+        if name not in indexes:
+            raise ValueError('No %r column in the header %r' % (name, names))
+    return Columns(*(indexes.get(name) for name in columns))
+
+def _mapped_lines(mapped, start, end):
+    """
+    Yield the lines of mapped[start:end], decoded a block at a time (decoding each line separately
+    takes longer than parsing it).
+    """
+    while start < end:
+        block_end = min(end, start + _BLOCK_SIZE)
+        if block_end < end:
+            # end the block after its last newline, or after the end of a line longer than a block
+            newline = mapped.rfind(b'\n', start, block_end)
+            if newline < 0:
+                newline = mapped.find(b'\n', block_end, end)
+            block_end = end if newline < 0 else newline + 1
+        for line in mapped[start:block_end].decode('utf-8').splitlines(True):
+            yield line
+        start = block_end
+
+def _open_mapped(path):
+    """
+    Returns the file at path memory-mapped, or None if it's empty (which can't be mapped).
+    """
+    with open(path, 'rb') as input_file:
+        if os.fstat(input_file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _sum_range(path, start, end, input_format, fields):
+    mapped = _open_mapped(path)
+    try:
+        return _sum_records(
+            _records(_mapped_lines(mapped, start, end), input_format, fields),
+            collections.OrderedDict(),
+        )
+    finally:
+        mapped.close()
+
+def _line_ranges(mapped, start, num_ranges):
+    """
+    Split mapped[start:] into up to num_ranges (start, end) ranges of whole lines.
+    """
+    size = len(mapped)
+    boundaries = [start]
+    for index in range(1, num_ranges):
+        offset = max(start + (size - start) * index // num_ranges, boundaries[-1])
+        newline = mapped.find(b'\n', offset)
+        boundaries.append(size if newline < 0 else newline + 1)
+    boundaries.append(size)
+    return [
+        (range_start, range_end)
+        for range_start, range_end in zip(boundaries, boundaries[1:])
+        if range_start < range_end
+    ]
+
+def aggregate_file(path, input_format='csv', columns=DEFAULT_COLUMNS, executor=None,
+                   num_ranges=1):
+    """
+    Sum the rows of a file on disk as aggregate_records() does. With an executor, the file is
+    split into num_ranges ranges of lines summed in it.
+    """
+    mapped = _open_mapped(path)
+    if mapped is None:
+        return collections.OrderedDict()
+    try:
+        start = 0
+        fields = columns
+        if input_format == 'csv':
+            header = mapped.readline()
+            fields = _csv_indexes(header.decode('utf-8'), columns)
+            start = len(header)
+        if executor is None or num_ranges < 2:
+            return aggregate_records(
+                _records(_mapped_lines(mapped, start, len(mapped)), input_format, fields)
+            )
+        ranges = _line_ranges(mapped, start, num_ranges)
+    finally:
+        mapped.close()
+    futures = [
+        executor.submit(_sum_range, path, range_start, range_end, input_format, fields)
+        for range_start, range_end in ranges
+    ]
+    totals = collections.OrderedDict()
+    for future in futures:
+        _merge_totals(totals, future.result())
+    return _nest_totals(totals)
+
+def aggregate_stream(stream, input_format='csv', columns=DEFAULT_COLUMNS):
+    """
+    Sum the rows read from a binary stream (such as sys.stdin.buffer) as aggregate_records() does.
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        fields = columns
+        if input_format == 'csv':
+            header = lines.readline()
+            if not header:
+                return collections.OrderedDict()
+            fields = _csv_indexes(header, columns)
+        return aggregate_records(_records(lines, input_format, fields))
+    finally:
+        # leave the stream open for the caller
+        lines.detach()
+
+def _experiment_spec(groups, baseline_label, confidence_level):
+    """
+    Returns (baseline label, variation labels, abba.parallel spec) for one experiment's groups,
+    raising ValueError if it can't be scored.
+    """
+    baseline_label = report.choose_baseline(groups, baseline_label)
+    for label, (num_successes, num_trials) in groups.items():
+        if not 0 <= num_successes <= num_trials or num_trials < 1:
+            raise ValueError('Invalid counts for %r: %r' % (label, (num_successes, num_trials)))
+    variation_labels = [label for label in groups if label != baseline_label]
+    if not variation_labels:
+        raise ValueError('No groups to compare to the baseline %r' % (baseline_label,))
+    spec = (
+        tuple(groups[baseline_label]),
+        [tuple(groups[label]) for label in variation_labels],
+        confidence_level,
+    )
+    return baseline_label, variation_labels, spec
+
+def score_aggregates(experiments, baseline_label=None, confidence_level=0.95, executor=None):
+    """
+    Score aggregated experiments, yielding (experiment, groups, GroupResults or None, error
+    message or None) in order. Variations are scored in the executor if one is given.
+    """
+    scored = []
+    specs = []
+    for experiment, groups in experiments.items():
+        try:
+            baseline, variation_labels, spec = _experiment_spec(
+                groups,
+                baseline_label,
+                confidence_level,
+            )
+        except ValueError as error:
+            scored.append((experiment, groups, None, str(error)))
+            continue
+        scored.append((experiment, groups, (baseline, variation_labels), None))
+        specs.append(spec)
+
+    if executor is None:
+        all_results = (parallel.score_experiment(*spec) for spec in specs)
+    else:
+        all_results = parallel.imap_experiments(specs, executor=executor)
+    all_results = iter(all_results)
+    for experiment, groups, labels, error in scored:
+        if error is not None:
+            yield experiment, groups, None, error
+            continue
+        baseline, variation_labels = labels
+        baseline_num_successes, baseline_num_trials = groups[baseline]
+        baseline_proportion = stats.Experiment(
+            len(variation_labels),
+            baseline_num_successes,
+            baseline_num_trials,
+            confidence_level,
+        ).get_baseline_proportion()
+        group_results = report.GroupResults(
+            baseline,
+            baseline_proportion,
+            collections.OrderedDict(zip(variation_labels, next(all_results))),
+        )
+        yield experiment, groups, group_results, None
+
+def _json_output(experiment, groups, group_results, error):
+    output = collections.OrderedDict([('experiment', experiment)])
+    if error is not None:
+        output['error'] = error
+    else:
+        output.update(report.group_results_to_dict(groups, group_results))
+    return output
+
+def _csv_rows(experiment, groups, group_results):
+    baseline_num_successes, baseline_num_trials = groups[group_results.baseline_label]
+    for label, results in group_results.results.items():
+        row = [
+            experiment,
+            label,
+            results.num_successes,
+            results.num_trials,
+            group_results.baseline_label,
+            baseline_num_successes,
+            baseline_num_trials,
+        ]
+        intervals = (results.proportion, results.improvement, results.relative_improvement)
+        for value_with_interval in intervals:
+            row.extend(float(value) for value in value_with_interval)
+        row.append(float(results.two_tailed_p_value))
+        row.append(float(results.improvement_one_tailed_p_value))
+        yield row
+
+def write_results(scored, output_file, output_format='jsonl', error_file=None):
+    """
+    Write the output of score_aggregates() to a text file. Errors are written in the JSON output,
+    or to error_file for CSV. Returns the number of experiments with errors.
+    """
+    num_errors = 0
+    writer = None
+    if output_format == 'csv':
+        writer = csv.writer(output_file, lineterminator='\n')
+        writer.writerow(CSV_FIELDS)
+    for experiment, groups, group_results, error in scored:
+        num_errors += error is not None
+        if writer is None:
+            output_file.write(json.dumps(_json_output(experiment, groups, group_results, error)))
+            output_file.write('\n')
+        elif error is not None:
+            if error_file is not None:
+                error_file.write('Experiment %r: %s\n' % (experiment, error))
+        else:
+            writer.writerows(_csv_rows(experiment, groups, group_results))
+    return num_errors
+
+def _input_format(path, input_format):
+    if input_format is not None:
+        return input_format
+    extension = os.path.splitext(path)[1].lower()
+    return _EXTENSION_FORMATS.get(extension, 'csv')
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='abba',
+        description='Score A/B test experiments from CSV or JSONL files of counts or events.',
+    )
+    parser.add_argument('input', nargs='?', default='-',
+                        help='file to read, or - for standard input (default)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write, or - for standard output (default)')
+    parser.add_argument('--input_format', choices=INPUT_FORMATS,
+                        help='default: from the file extension, else csv')
+    parser.add_argument('--output_format', choices=OUTPUT_FORMATS, default='jsonl')
+    parser.add_argument('--experiment_column', default=DEFAULT_COLUMNS.experiment,
+                        help='experiment id; if absent, all rows are one experiment')
+    parser.add_argument('--label_column', default=DEFAULT_COLUMNS.label)
+    parser.add_argument('--successes_column', default=DEFAULT_COLUMNS.num_successes,
+                        help='number of successes, or whether an event is a success')
+    parser.add_argument('--trials_column', default=DEFAULT_COLUMNS.num_trials,
+                        help='number of trials; if absent, each row is one trial')
+    parser.add_argument('--baseline',
+                        help='label of the baseline arm (default: "baseline", else the first)')
+    parser.add_argument('--confidence_level', type=float, default=0.95)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes to use for large inputs (default: one per CPU)')
+    args = parser.parse_args(argv)
+    if not 0 < args.confidence_level < 1:
+        parser.error('--confidence_level must be between 0 and 1: %r' % (args.confidence_level,))
+    return args
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    columns = Columns(
+        args.experiment_column,
+        args.label_column,
+        args.successes_column,
+        args.trials_column,
+    )
+    input_format = _input_format(args.input, args.input_format)
+    executor = None
+    try:
+        try:
+            if args.input == '-':
+                experiments = aggregate_stream(sys.stdin.buffer, input_format, columns)
+            else:
+                if args.workers > 1 and os.path.getsize(args.input) >= PARALLEL_MIN_BYTES:
+                    executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.workers)
+                experiments = aggregate_file(
+                    args.input,
+                    input_format,
+                    columns,
+                    executor,
+                    args.workers * _RANGES_PER_WORKER,
+                )
+        except (IOError, ValueError) as error:
+            sys.stderr.write('abba: %s\n' % (error,))
+            return 2
+        if (executor is None and args.workers > 1
+                and len(experiments) >= PARALLEL_MIN_EXPERIMENTS):
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.workers)
+        scored = score_aggregates(experiments, args.baseline, args.confidence_level, executor)
+        if args.output == '-':
+            num_errors = write_results(scored, sys.stdout, args.output_format, sys.stderr)
+        else:
+            with open(args.output, 'w', newline='') as output_file:
+                num_errors = write_results(scored, output_file, args.output_format, sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return 1 if num_errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Score many experiments given as columns: one row per arm, with columns for the experiment id, the
+arm label, and the number of successes and trials.
+
+The columns may be NumPy arrays (in a dict), a pandas DataFrame or a pyarrow Table, and results are
+returned in the same form, with one row per non-baseline arm. pandas and pyarrow are only imported
+when given their objects.
+
+    >>> columns = {
+    ...     'experiment': numpy.array(['signup', 'signup', 'signup', 'checkout', 'checkout']),
+    ...     'label': numpy.array(['baseline', 'red', 'blue', 'baseline', 'green']),
+    ...     'num_successes': numpy.array([20, 50, 70, 5, 9]),
+    ...     'num_trials': numpy.array([1000, 2000, 2000, 100, 100]),
+    ... }
+    >>> results = abba.columnar.score_columns(columns)
+    >>> results['two_tailed_p_value']
+
+Within each experiment the baseline is the arm labeled baseline_label, or else the experiment's
+first row, as in abba.report.choose_baseline(). Rows are grouped by sorting an index on the
+experiment ids (the input columns are never copied as a whole) and all variations are scored
+together by abba.stats.get_results_batch().
+"""
+
+import collections
+
+import numpy
+
+from abba import report
+from abba import stats
+
+# Results fields holding a ValueWithInterval, each output as three columns
+_INTERVAL_FIELDS = ('proportion', 'improvement', 'relative_improvement')
+
+ExperimentGroups = collections.namedtuple(
+    'ExperimentGroups',
+    (
+        'variation_rows', # row index of each variation, grouped by experiment
+        'baseline_rows', # row index of the baseline of each variation's experiment
+        'num_comparisons', # number of variations in each variation's experiment
+    ),
+)
+
+def _top_level_module(table):
+    return type(table).__module__.split('.')[0]
+
+def _column(table, name):
+    if _top_level_module(table) == 'pyarrow':
+        # zero-copy for numeric columns in a single chunk without nulls
+        return table.column(name).to_numpy()
+    column = table[name]
+    if hasattr(column, 'to_numpy'):
+        return column.to_numpy()
+    return numpy.asarray(column)
+
+def group_experiments(experiment_ids, labels, baseline_label=report.DEFAULT_BASELINE_LABEL):
+    """
+    Group rows by experiment id and find each experiment's baseline. Returns ExperimentGroups of
+    index arrays, with experiments in sorted order of their ids and rows within an experiment in
+    their original order.
+    """
+    experiment_ids = numpy.asarray(experiment_ids)
+    labels = numpy.asarray(labels)
+    if experiment_ids.shape != labels.shape or experiment_ids.ndim != 1:
+        raise ValueError('experiment ids and labels must be 1-d columns of the same length')
+
+    _, group_index = numpy.unique(experiment_ids, return_inverse=True)
+    group_index = group_index.reshape(-1)
+    order = numpy.argsort(group_index, kind='stable')
+    sorted_groups = group_index[order]
+    group_starts = numpy.flatnonzero(numpy.diff(sorted_groups, prepend=-1))
+    group_sizes = numpy.diff(numpy.append(group_starts, len(order)))
+
+    # the first row labeled as the baseline in each group, else the group's first row
+    is_baseline = labels[order] == baseline_label
+    first_baseline = numpy.minimum.reduceat(
+        numpy.where(is_baseline, numpy.arange(len(order)), len(order)),
+        group_starts,
+    ) if len(order) else numpy.zeros(0, dtype=int)
+    baseline_positions = numpy.where(first_baseline < len(order), first_baseline, group_starts)
+
+    is_variation = numpy.ones(len(order), dtype=bool)
+    is_variation[baseline_positions] = False
+    return ExperimentGroups(
+        variation_rows=order[is_variation],
+        baseline_rows=order[numpy.repeat(baseline_positions, group_sizes)[is_variation]],
+        num_comparisons=numpy.repeat(group_sizes - 1, group_sizes)[is_variation],
+    )
+
+def score_arrays(experiment_ids, labels, num_successes, num_trials,
+                 baseline_label=report.DEFAULT_BASELINE_LABEL, confidence_level=0.95,
+                 p_value_precision=stats.Experiment.P_VALUE_PRECISION):
+    """
+    Score columns given as arrays. Returns an OrderedDict of result columns, one row per
+    variation: experiment, label, num_successes, num_trials, baseline_label,
+    baseline_num_successes, baseline_num_trials, then lower and upper bound columns for each
+    interval (e.g. proportion, proportion_lower_bound, proportion_upper_bound) and the p-values.
+    """
+    experiment_ids = numpy.asarray(experiment_ids)
+    labels = numpy.asarray(labels)
+    num_successes = numpy.asarray(num_successes)
+    num_trials = numpy.asarray(num_trials)
+    groups = group_experiments(experiment_ids, labels, baseline_label)
+
+    baseline_num_successes = num_successes[groups.baseline_rows]
+    baseline_num_trials = num_trials[groups.baseline_rows]
+    results = stats.get_results_batch(
+        baseline_num_successes,
+        baseline_num_trials,
+        num_successes[groups.variation_rows],
+        num_trials[groups.variation_rows],
+        groups.num_comparisons,
+        confidence_level=confidence_level,
+        p_value_precision=p_value_precision,
+    )
+
+    columns = collections.OrderedDict((
+        ('experiment', experiment_ids[groups.variation_rows]),
+        ('label', labels[groups.variation_rows]),
+        ('num_successes', results.num_successes),
+        ('num_trials', results.num_trials),
+        ('baseline_label', labels[groups.baseline_rows]),
+        ('baseline_num_successes', baseline_num_successes),
+        ('baseline_num_trials', baseline_num_trials),
+    ))
+    for field in _INTERVAL_FIELDS:
+        value = getattr(results, field)
+        columns[field] = value.value
+        columns[field + '_lower_bound'] = value.lower_bound
+        columns[field + '_upper_bound'] = value.upper_bound
+    columns['two_tailed_p_value'] = results.two_tailed_p_value
+    columns['improvement_one_tailed_p_value'] = results.improvement_one_tailed_p_value
+    return columns
+
+def score_columns(table, experiment='experiment', label='label', num_successes='num_successes',
+                  num_trials='num_trials', baseline_label=report.DEFAULT_BASELINE_LABEL,
+                  confidence_level=0.95, p_value_precision=stats.Experiment.P_VALUE_PRECISION):
+    """
+    Score the experiments in table, a mapping of column names to arrays, a pandas DataFrame or a
+    pyarrow Table. The remaining arguments name its columns. Returns the columns of score_arrays()
+    in the same kind of container as table.
+    """
+    columns = score_arrays(
+        _column(table, experiment),
+        _column(table, label),
+        _column(table, num_successes),
+        _column(table, num_trials),
+        baseline_label=baseline_label,
+        confidence_level=confidence_level,
+        p_value_precision=p_value_precision,
+    )
+    module = _top_level_module(table)
+    if module == 'pandas':
+        import pandas
+        return pandas.DataFrame(columns)
+    if module == 'pyarrow':
+        import pyarrow
+        return pyarrow.table(columns)
+    return columns
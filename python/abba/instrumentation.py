@@ -0,0 +1,164 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Optional instrumentation of abba.stats.
+
+Observers are callables that receive an event for every call to Experiment.get_results() and
+ProportionComparison.iterated_test() (and iterated_test_details()). When no observer is registered
+the only cost is checking an empty list.
+
+    >>> collector = abba.instrumentation.HistogramCollector()
+    >>> with abba.instrumentation.observe(collector):
+    ...     experiment.get_results(70, 2000)
+    >>> collector.summary()
+"""
+
+import collections
+import contextlib
+import math
+import threading
+
+IteratedTestEvent = collections.namedtuple(
+    'IteratedTestEvent',
+    (
+        'seconds', # wall time of the call
+        'method', # method used, see abba.stats.IteratedTestResult
+        'interval_size', # number of baseline success counts summed over
+        'num_evaluations', # number of distribution function evaluations
+        'num_tests',
+        'improvement_only',
+        'baseline_num_trials',
+        'variation_num_trials',
+    ),
+)
+
+GetResultsEvent = collections.namedtuple(
+    'GetResultsEvent',
+    (
+        'seconds', # wall time of the call
+        'p_value_seconds', # part of seconds spent computing p-values
+        'num_comparisons',
+        'baseline_num_trials',
+        'num_trials',
+    ),
+)
+
+# registered observers; abba.stats checks this directly, so it must stay the same list object
+observers = []
+_lock = threading.Lock()
+
+def add_observer(observer):
+    with _lock:
+        observers.append(observer)
+
+def remove_observer(observer):
+    with _lock:
+        observers.remove(observer)
+
+@contextlib.contextmanager
+def observe(observer):
+    """
+    Context manager registering observer for the duration of a block.
+    """
+    add_observer(observer)
+    try:
+        yield observer
+    finally:
+        remove_observer(observer)
+
+def emit(event):
+    for observer in list(observers):
+        observer(event)
+
+class Histogram(object):
+    """
+    Counts positive values in logarithmic buckets, BUCKETS_PER_DOUBLING per power of two. Zero and
+    negative values are counted in a separate bucket.
+    """
+    BUCKETS_PER_DOUBLING = 4
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.buckets = collections.Counter()
+
+    def _bucket(self, value):
+        if value <= 0:
+            return None
+        return int(math.floor(math.log(value, 2) * self.BUCKETS_PER_DOUBLING))
+
+    def _bucket_upper_bound(self, bucket):
+        if bucket is None:
+            return 0.0
+        return 2 ** ((bucket + 1) / float(self.BUCKETS_PER_DOUBLING))
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.buckets[self._bucket(value)] += 1
+
+    def percentile(self, percent):
+        """
+        Returns an upper bound on the given percentile: the upper edge of the bucket containing it,
+        capped at the largest value seen.
+        """
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = self.buckets.get(None, 0)
+        if seen >= rank:
+            return min(0.0, self.maximum)
+        for bucket in sorted(bucket for bucket in self.buckets if bucket is not None):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self._bucket_upper_bound(bucket), self.maximum)
+        return self.maximum
+
+    def summary(self):
+        return collections.OrderedDict((
+            ('count', self.count),
+            ('mean', self.total / self.count if self.count else None),
+            ('min', self.minimum),
+            ('p50', self.percentile(50)),
+            ('p90', self.percentile(90)),
+            ('p99', self.percentile(99)),
+            ('max', self.maximum),
+        ))
+
+class HistogramCollector(object):
+    """
+    An observer aggregating events into Histograms of each numeric field, keyed by
+    (event type name, method, field name). GetResultsEvents have a method of None.
+    """
+    IGNORED_FIELDS = frozenset(('method', 'improvement_only'))
+
+    def __init__(self):
+        self.histograms = collections.defaultdict(Histogram)
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        method = getattr(event, 'method', None)
+        with self._lock:
+            for field, value in zip(event._fields, event):
+                if field not in self.IGNORED_FIELDS:
+                    self.histograms[(type(event).__name__, method, field)].add(value)
+
+    def summary(self):
+        """
+        Returns a nested dict: event type name -> method -> field -> histogram summary.
+        """
+        with self._lock:
+            summary = collections.OrderedDict()
+            for (event_type, method, field), histogram in sorted(
+                self.histograms.items(),
+                key=lambda item: tuple(str(part) for part in item[0]),
+            ):
+                summary.setdefault(event_type, collections.OrderedDict()).setdefault(
+                    method,
+                    collections.OrderedDict(),
+                )[field] = histogram.summary()
+            return summary
@@ -0,0 +1,115 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Experiments whose counts are updated incrementally, e.g. from an event stream.
+"""
+
+import collections
+
+from abba import stats
+
+class LiveExperiment(object):
+    """
+    Keeps running success and trial counts for the baseline and each variation arm, and produces
+    abba.stats.Results on demand.
+
+    Confidence intervals are cheap and always reflect the current counts. P-values are only
+    computed when read, and are reused until the counts of the baseline or that variation have
+    changed by more than recompute_threshold, as a fraction of the counts when they were last
+    computed. The default threshold of zero recomputes after any change.
+    """
+    def __init__(self, baseline_label='baseline', confidence_level=0.95, recompute_threshold=0):
+        self.baseline_label = baseline_label
+        self.confidence_level = confidence_level
+        self.recompute_threshold = recompute_threshold
+        # label -> [num_successes, num_trials]
+        self._counts = collections.OrderedDict()
+        self._counts[baseline_label] = [0, 0]
+        self._experiment = None
+        # label -> (number of arms and counts the p-values were computed from,
+        #           (two-tailed, improvement) p-values)
+        self._p_values = {}
+
+    @property
+    def variation_labels(self):
+        return [label for label in self._counts if label != self.baseline_label]
+
+    def get_counts(self, label):
+        """
+        Returns the current (num_successes, num_trials) for an arm.
+        """
+        return tuple(self._counts[label])
+
+    def add(self, label, num_successes=0, num_trials=0):
+        """
+        Add successes and trials to an arm, creating the arm if it hasn't been seen before.
+        """
+        counts = self._counts.get(label)
+        if counts is None:
+            counts = self._counts[label] = [0, 0]
+            # the number of comparisons changed
+            self._experiment = None
+        counts[0] += num_successes
+        counts[1] += num_trials
+        if label == self.baseline_label:
+            self._experiment = None
+
+    def add_trials(self, label, num_trials=1):
+        self.add(label, num_trials=num_trials)
+
+    def add_successes(self, label, num_successes=1):
+        self.add(label, num_successes=num_successes)
+
+    def _get_experiment(self):
+        if self._experiment is None:
+            baseline_num_successes, baseline_num_trials = self._counts[self.baseline_label]
+            self._experiment = stats.Experiment(
+                num_trials=len(self._counts) - 1,
+                baseline_num_successes=baseline_num_successes,
+                baseline_num_trials=baseline_num_trials,
+                confidence_level=self.confidence_level,
+            )
+        return self._experiment
+
+    def _changed(self, old_count, new_count):
+        return abs(new_count - old_count) > self.recompute_threshold * old_count
+
+    def _get_p_values(self, label):
+        num_successes, num_trials = self._counts[label]
+        counts = tuple(self._counts[self.baseline_label]) + (num_successes, num_trials)
+        cached = self._p_values.get(label)
+        if cached is not None:
+            cached_num_arms, cached_counts, p_values = cached
+            if cached_num_arms == len(self._counts) and not any(
+                self._changed(old_count, new_count)
+                for old_count, new_count in zip(cached_counts, counts)
+            ):
+                return p_values
+        p_values = self._get_experiment().get_p_values(num_successes, num_trials)
+        self._p_values[label] = (len(self._counts), counts, p_values)
+        return p_values
+
+    def get_baseline_proportion(self):
+        return self._get_experiment().get_baseline_proportion()
+
+    def get_results(self, label):
+        """
+        Returns abba.stats.Results for a variation arm.
+        """
+        num_successes, num_trials = self._counts[label]
+        return stats.Results(
+            num_successes,
+            num_trials,
+            *(
+                self._get_experiment().get_estimates(num_successes, num_trials)
+                + self._get_p_values(label)
+            )
+        )
+
+    def get_all_results(self):
+        """
+        Returns an OrderedDict mapping each variation label to its Results.
+        """
+        return collections.OrderedDict(
+            (label, self.get_results(label)) for label in self.variation_labels
+        )
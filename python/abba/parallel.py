@@ -0,0 +1,134 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Score large portfolios of experiments across processes.
+
+Each experiment is specified as a tuple (baseline, variations[, confidence_level]) where baseline is
+a (num_successes, num_trials) pair and variations is a sequence of such pairs. The result for each
+experiment is a list of abba.stats.Results, one per variation.
+
+    >>> specs = [((20, 1000), [(50, 2000), (70, 2000)], 0.95), ...]
+    >>> for results in abba.parallel.imap_experiments(specs, max_workers=32):
+    ...     ...
+"""
+
+import collections
+import concurrent.futures
+import itertools
+import math
+
+from abba import stats
+
+# number of chunks kept in flight per worker, so workers never wait for the producer while memory
+# use stays bounded for arbitrarily long iterables
+_CHUNKS_PER_WORKER = 4
+
+def score_experiment(baseline, variations, confidence_level=0.95):
+    """
+    Score a single experiment spec in the current process.
+    """
+    baseline_num_successes, baseline_num_trials = baseline
+    experiment = stats.Experiment(
+        num_trials=len(variations),
+        baseline_num_successes=baseline_num_successes,
+        baseline_num_trials=baseline_num_trials,
+        confidence_level=confidence_level,
+    )
+    return [
+        experiment.get_results(num_successes, num_trials)
+        for num_successes, num_trials in variations
+    ]
+
+def _score_chunk(chunk):
+    return [score_experiment(*spec) for spec in chunk]
+
+def _default_chunksize(specs, max_workers):
+    try:
+        num_specs = len(specs)
+    except TypeError:
+        return 32
+    return max(1, int(math.ceil(num_specs / float(max_workers * _CHUNKS_PER_WORKER))))
+
+def _iter_chunks(specs, chunksize):
+    iterator = iter(specs)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+def _submit_chunks(specs, executor, max_workers, chunksize):
+    """
+    Yield (start index, future) pairs, lazily submitting chunks as the caller consumes them.
+    """
+    if chunksize is None:
+        chunksize = _default_chunksize(specs, max_workers)
+    start = 0
+    for chunk in _iter_chunks(specs, chunksize):
+        yield start, executor.submit(_score_chunk, chunk)
+        start += len(chunk)
+
+def _run(specs, max_workers, chunksize, executor, consume):
+    if executor is not None:
+        max_workers = getattr(executor, '_max_workers', None) or max_workers or 1
+        for item in consume(_submit_chunks(specs, executor, max_workers, chunksize), max_workers):
+            yield item
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as owned_executor:
+        max_workers = owned_executor._max_workers
+        for item in consume(_submit_chunks(specs, owned_executor, max_workers, chunksize),
+                            max_workers):
+            yield item
+
+def _consume_ordered(submissions, max_workers):
+    pending = collections.deque()
+    for submission in itertools.islice(submissions, max_workers * _CHUNKS_PER_WORKER):
+        pending.append(submission)
+    while pending:
+        _, future = pending.popleft()
+        for results in future.result():
+            yield results
+        for submission in itertools.islice(submissions, 1):
+            pending.append(submission)
+
+def _consume_unordered(submissions, max_workers):
+    pending = dict(
+        (future, start)
+        for start, future in itertools.islice(submissions, max_workers * _CHUNKS_PER_WORKER)
+    )
+    while pending:
+        done, _ = concurrent.futures.wait(
+            pending,
+            return_when=concurrent.futures.FIRST_COMPLETED,
+        )
+        for future in done:
+            start = pending.pop(future)
+            for offset, results in enumerate(future.result()):
+                yield start + offset, results
+        for start, future in itertools.islice(submissions, len(done)):
+            pending[future] = start
+
+def imap_experiments(specs, max_workers=None, chunksize=None, executor=None):
+    """
+    Score experiment specs in a process pool, yielding each experiment's list of Results in input
+    order.
+
+    specs may be any iterable, including a generator; only a bounded number of chunks is held in
+    memory at once. Specs are sent to workers in chunks of chunksize experiments so pickling
+    overhead is amortized (by default, about four chunks per worker when len(specs) is known).
+    Pass an existing concurrent.futures executor to reuse its workers across calls.
+    """
+    return _run(specs, max_workers, chunksize, executor, _consume_ordered)
+
+def imap_experiments_unordered(specs, max_workers=None, chunksize=None, executor=None):
+    """
+    Like imap_experiments(), but yield (index, results) pairs as soon as each chunk completes, where
+    index is the position of the experiment in specs.
+    """
+    return _run(specs, max_workers, chunksize, executor, _consume_unordered)
+
+def score_experiments(specs, max_workers=None, chunksize=None, executor=None):
+    """
+    Score all experiment specs in a process pool and return a list of lists of Results.
+    """
+    return list(imap_experiments(specs, max_workers, chunksize, executor))
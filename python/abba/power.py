@@ -0,0 +1,132 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Sample size and power planning for experiments scored with abba.stats.
+
+Calculations are for the pooled two-proportion z-test of ProportionComparison.z_test(), with alpha
+corrected for the number of variations compared with the baseline, as Experiment does. Effects are
+relative improvements over the baseline rate, like Results.relative_improvement.
+
+Every argument may be an array, and arrays are broadcast against each other, so a whole planning
+grid is computed in one call:
+
+    >>> abba.power.required_trials(
+    ...     baseline_rate=numpy.array([[0.01], [0.05], [0.1]]),
+    ...     relative_effect=numpy.array([0.05, 0.1, 0.2]),
+    ...     num_comparisons=3,
+    ... )
+"""
+
+import numpy
+
+from abba import backends
+from abba import stats
+
+_BISECTION_ITERATIONS = 60
+
+def corrected_alpha(alpha, num_comparisons, correction='sidak'):
+    """
+    Alpha for each of num_comparisons tests keeping the familywise error rate at alpha, using the
+    Sidak correction (as the p-values of Experiment do) or the Bonferroni correction (as its
+    confidence intervals do).
+    """
+    num_comparisons = numpy.maximum(1, num_comparisons)
+    if correction == 'sidak':
+        return -numpy.expm1(numpy.log1p(-numpy.asarray(alpha, dtype=float)) / num_comparisons)
+    if correction == 'bonferroni':
+        return numpy.asarray(alpha, dtype=float) / num_comparisons
+    raise ValueError('Unknown correction %r' % (correction,))
+
+def _z_alpha(confidence_level, num_comparisons, correction, two_tailed):
+    alpha = corrected_alpha(1 - numpy.asarray(confidence_level), num_comparisons, correction)
+    return stats.get_z_critical_value(alpha, two_tailed=two_tailed)
+
+def _standard_errors(baseline_rate, variation_rate, num_trials, ratio):
+    """
+    Standard errors of the difference in proportions under the null hypothesis (pooled) and under
+    the alternative, with num_trials in the baseline and ratio * num_trials in the variation.
+    """
+    variation_num_trials = ratio * num_trials
+    pooled_rate = (baseline_rate + ratio * variation_rate) / (1 + ratio)
+    null_error = numpy.sqrt(
+        pooled_rate * (1 - pooled_rate) * (1.0 / num_trials + 1.0 / variation_num_trials)
+    )
+    alternative_error = numpy.sqrt(
+        baseline_rate * (1 - baseline_rate) / num_trials
+        + variation_rate * (1 - variation_rate) / variation_num_trials
+    )
+    return null_error, alternative_error
+
+def get_power(baseline_rate, relative_effect, num_trials, confidence_level=0.95, num_comparisons=1,
+              correction='sidak', two_tailed=True, ratio=1):
+    """
+    Probability of a significant result when the variation's rate is
+    baseline_rate * (1 + relative_effect), with num_trials in the baseline and ratio * num_trials
+    in each variation. For two-tailed tests the negligible chance of significance in the wrong
+    direction is ignored.
+    """
+    baseline_rate = numpy.asarray(baseline_rate, dtype=float)
+    variation_rate = baseline_rate * (1 + numpy.asarray(relative_effect, dtype=float))
+    z_alpha = _z_alpha(confidence_level, num_comparisons, correction, two_tailed)
+    null_error, alternative_error = _standard_errors(
+        baseline_rate,
+        variation_rate,
+        numpy.asarray(num_trials, dtype=float),
+        ratio,
+    )
+    return backends.get_backend().norm_cdf(
+        (numpy.abs(variation_rate - baseline_rate) - z_alpha * null_error) / alternative_error
+    )
+
+def required_trials(baseline_rate, relative_effect, confidence_level=0.95, power=0.8,
+                    num_comparisons=1, correction='sidak', two_tailed=True, ratio=1):
+    """
+    Number of baseline trials needed to detect a relative effect with the given power (the
+    variations need ratio times as many each). Solved in closed form and rounded up.
+    """
+    baseline_rate = numpy.asarray(baseline_rate, dtype=float)
+    variation_rate = baseline_rate * (1 + numpy.asarray(relative_effect, dtype=float))
+    z_alpha = _z_alpha(confidence_level, num_comparisons, correction, two_tailed)
+    z_beta = backends.get_backend().norm_ppf(power)
+    # both standard errors are proportional to 1 / sqrt(num_trials), so solve with num_trials = 1
+    null_error, alternative_error = _standard_errors(baseline_rate, variation_rate, 1.0, ratio)
+    with numpy.errstate(divide='ignore'):
+        num_trials = (
+            (z_alpha * null_error + z_beta * alternative_error)
+            / numpy.abs(variation_rate - baseline_rate)
+        )**2
+    return numpy.ceil(num_trials)
+
+def minimum_detectable_effect(baseline_rate, num_trials, confidence_level=0.95, power=0.8,
+                              num_comparisons=1, correction='sidak', two_tailed=True, ratio=1):
+    """
+    Smallest relative improvement detected with the given power, with num_trials in the baseline
+    and ratio * num_trials in each variation. Found by bisection over all inputs at once; nan where
+    even a variation rate of 1 wouldn't be detected.
+    """
+    baseline_rate, num_trials, confidence_level, power, num_comparisons, ratio = \
+        numpy.broadcast_arrays(
+            numpy.asarray(baseline_rate, dtype=float),
+            numpy.asarray(num_trials, dtype=float),
+            confidence_level,
+            power,
+            num_comparisons,
+            ratio,
+        )
+
+    def power_at(relative_effect):
+        return get_power(
+            baseline_rate, relative_effect, num_trials, confidence_level, num_comparisons,
+            correction, two_tailed, ratio,
+        )
+
+    # the power increases with the effect up to a variation rate of 1
+    low = numpy.zeros(baseline_rate.shape)
+    high = 1 / baseline_rate - 1
+    detectable = power_at(high) >= power
+    for _ in range(_BISECTION_ITERATIONS):
+        middle = (low + high) / 2
+        enough = power_at(middle) >= power
+        high = numpy.where(enough, middle, high)
+        low = numpy.where(enough, low, middle)
+    return numpy.where(detectable, high, numpy.nan)[()]
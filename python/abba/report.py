@@ -0,0 +1,132 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Scoring of labeled groups of counts, and formatting of the results for people and programs.
+Shared by the command line tools.
+"""
+
+import collections
+
+from abba import stats
+
+DEFAULT_BASELINE_LABEL = 'baseline'
+
+GroupResults = collections.namedtuple(
+    'GroupResults',
+    (
+        'baseline_label',
+        'baseline_proportion', # ValueWithInterval
+        'results', # OrderedDict mapping each variation label to its Results
+    ),
+)
+
+def choose_baseline(labels, baseline_label=None):
+    """
+    Returns the baseline among labels: baseline_label if given, else a label named 'baseline' if
+    there is one, else the first label (matching the web app, which treats the first group as the
+    baseline).
+    """
+    labels = list(labels)
+    if not labels:
+        raise ValueError('No groups to score')
+    if baseline_label is not None:
+        if baseline_label not in labels:
+            raise ValueError('Baseline group %r not found' % (baseline_label,))
+        return baseline_label
+    if DEFAULT_BASELINE_LABEL in labels:
+        return DEFAULT_BASELINE_LABEL
+    return labels[0]
+
+def score_groups(groups, baseline_label=None, confidence_level=0.95):
+    """
+    groups maps labels to (num_successes, num_trials), in display order. Returns GroupResults for
+    the baseline and every other group.
+    """
+    baseline_label = choose_baseline(groups, baseline_label)
+    baseline_num_successes, baseline_num_trials = groups[baseline_label]
+    variation_labels = [label for label in groups if label != baseline_label]
+    experiment = stats.Experiment(
+        num_trials=len(variation_labels),
+        baseline_num_successes=baseline_num_successes,
+        baseline_num_trials=baseline_num_trials,
+        confidence_level=confidence_level,
+    )
+    return GroupResults(
+        baseline_label=baseline_label,
+        baseline_proportion=experiment.get_baseline_proportion(),
+        results=collections.OrderedDict(
+            (label, experiment.get_results(*groups[label])) for label in variation_labels
+        ),
+    )
+
+def _value_with_interval_to_dict(value_with_interval):
+    return collections.OrderedDict(
+        (field, float(value))
+        for field, value in zip(value_with_interval._fields, value_with_interval)
+    )
+
+def results_to_dict(results):
+    """
+    Convert abba.stats.Results to nested dicts of plain numbers, suitable for JSON.
+    """
+    return collections.OrderedDict((
+        ('num_successes', int(results.num_successes)),
+        ('num_trials', int(results.num_trials)),
+        ('proportion', _value_with_interval_to_dict(results.proportion)),
+        ('improvement', _value_with_interval_to_dict(results.improvement)),
+        ('relative_improvement', _value_with_interval_to_dict(results.relative_improvement)),
+        ('two_tailed_p_value', float(results.two_tailed_p_value)),
+        ('improvement_one_tailed_p_value', float(results.improvement_one_tailed_p_value)),
+    ))
+
+def group_results_to_dict(groups, group_results):
+    """
+    Convert the GroupResults returned by score_groups() to nested dicts suitable for JSON.
+    """
+    baseline_num_successes, baseline_num_trials = groups[group_results.baseline_label]
+    return collections.OrderedDict((
+        ('baseline', collections.OrderedDict((
+            ('label', group_results.baseline_label),
+            ('num_successes', int(baseline_num_successes)),
+            ('num_trials', int(baseline_num_trials)),
+            ('proportion', _value_with_interval_to_dict(group_results.baseline_proportion)),
+        ))),
+        ('variations', [
+            collections.OrderedDict([('label', label)] + list(results_to_dict(results).items()))
+            for label, results in group_results.results.items()
+        ]),
+    ))
+
+def _format_interval(value_with_interval, signed=False):
+    number_format = '%+.2f%%' if signed else '%.2f%%'
+    return (number_format + ' (' + number_format + ' to ' + number_format + ')') % (
+        value_with_interval.value * 100,
+        value_with_interval.lower_bound * 100,
+        value_with_interval.upper_bound * 100,
+    )
+
+def format_results_table(groups, group_results, confidence_level=0.95):
+    """
+    Render the GroupResults returned by score_groups() as a plain text table.
+    """
+    row_format = '%-20s %12s %12s  %-32s %-34s %10s'
+    confidence = '%g%% CI' % (confidence_level * 100)
+    lines = [row_format % (
+        'group', 'successes', 'trials', 'rate (%s)' % confidence,
+        'improvement (%s)' % confidence, 'p-value',
+    )]
+    baseline_num_successes, baseline_num_trials = groups[group_results.baseline_label]
+    lines.append(row_format % (
+        group_results.baseline_label, baseline_num_successes, baseline_num_trials,
+        _format_interval(group_results.baseline_proportion), '', '',
+    ))
+    for label, label_results in group_results.results.items():
+        lines.append(row_format % (
+            label,
+            label_results.num_successes,
+            label_results.num_trials,
+            _format_interval(label_results.proportion),
+            _format_interval(label_results.relative_improvement, signed=True),
+            '%.4f' % label_results.two_tailed_p_value,
+        ))
+    return '\n'.join(line.rstrip() for line in lines)
@@ -0,0 +1,226 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Group sequential testing, for experiments whose results are looked at repeatedly.
+
+The p-values of abba.stats.Experiment assume the results are only looked at once, when the
+experiment is over. Stopping an experiment the first time a p-value falls below alpha makes false
+positives far more likely than alpha. A sequential design fixes the number of looks (and when they
+happen, as fractions of the total planned sample) and spends alpha across them with a Lan-DeMets
+spending function, giving a z-value boundary for each look. An experiment may be stopped at the
+first look whose z-value crosses the boundary, with the overall false positive rate kept at alpha.
+
+    >>> experiment = abba.sequential.SequentialExperiment(num_trials=2, num_looks=5)
+    >>> results = experiment.get_results(
+    ...     look=1,
+    ...     baseline_num_successes=80, baseline_num_trials=4000,
+    ...     num_successes=130, num_trials=4000,
+    ... )
+    >>> results.reject
+
+Boundaries are computed by recursive numerical integration (Armitage, McPherson and Rowe) when a
+design is first used and are cached, so every look after that is a constant time comparison.
+"""
+
+import collections
+import math
+
+import numpy
+
+from abba import backends
+from abba import stats
+
+# alpha spent by information fraction t, for a total alpha; both reach alpha at t = 1
+def _obrien_fleming_spending(alpha, information_fraction):
+    z_value = stats.get_z_critical_value(alpha)
+    return 2 * backends.get_backend().norm_sf(z_value / math.sqrt(information_fraction))
+
+def _pocock_spending(alpha, information_fraction):
+    return alpha * math.log(1 + (math.e - 1) * information_fraction)
+
+SPENDING_FUNCTIONS = {
+    'obrien_fleming': _obrien_fleming_spending,
+    'pocock': _pocock_spending,
+}
+
+# number of points in the grid over the continuation region at each look
+_GRID_POINTS = 801
+# one-sided designs truncate the continuation region this many standard deviations below zero
+_LOWER_LIMIT_STANDARD_DEVIATIONS = 10
+_MAX_BOUNDARY = 40.0
+_BISECTION_ITERATIONS = 60
+
+# boundaries keyed by (information fractions, alpha, spending, two_tailed), up to a limit
+_boundaries = {}
+_MAX_BOUNDARIES = 1024
+
+def _simpson_weights(num_points, step):
+    weights = numpy.ones(num_points)
+    weights[1:-1:2] = 4
+    weights[2:-1:2] = 2
+    return weights * step / 3
+
+def _compute_boundaries(information_fractions, alpha, spending, two_tailed):
+    """
+    Z-value boundaries for each look. Works with the score statistic S = Z * sqrt(t), which is
+    Brownian motion in the information fraction t under H0: the density of S over the continuation
+    region (where the boundary hasn't been crossed) is carried from each look to the next by
+    convolving with the normal distribution of the increment, and each boundary is found by
+    bisection so that the probability of first crossing it equals the alpha spent at that look.
+    """
+    backend = backends.get_backend()
+    spend = SPENDING_FUNCTIONS[spending]
+    num_tails = 2 if two_tailed else 1
+
+    boundaries = []
+    spent_alpha = 0.0
+    previous_fraction = 0.0
+    # Simpson's rule nodes and weights times the density of S over the continuation region
+    nodes = weighted_density = None
+    for information_fraction in information_fractions:
+        cumulative_alpha = min(alpha, spend(alpha, information_fraction))
+        target = cumulative_alpha - spent_alpha
+        scale = math.sqrt(information_fraction)
+        increment_standard_deviation = math.sqrt(information_fraction - previous_fraction)
+
+        if nodes is None:
+            def crossing_probability(boundary):
+                return num_tails * backend.norm_sf(boundary)
+        else:
+            def crossing_probability(boundary):
+                upper = backend.norm_sf(
+                    (boundary * scale - nodes) / increment_standard_deviation
+                )
+                if two_tailed:
+                    upper = upper + backend.norm_cdf(
+                        (-boundary * scale - nodes) / increment_standard_deviation
+                    )
+                return numpy.dot(weighted_density, upper)
+
+        if target <= 0:
+            boundary = float('inf')
+        else:
+            low, high = 0.0, _MAX_BOUNDARY
+            for _ in range(_BISECTION_ITERATIONS):
+                middle = (low + high) / 2
+                if crossing_probability(middle) > target:
+                    low = middle
+                else:
+                    high = middle
+            boundary = high
+            spent_alpha += crossing_probability(boundary)
+        boundaries.append(boundary)
+
+        # density of S at this look, over the continuation region
+        upper_limit = min(boundary, _MAX_BOUNDARY) * scale
+        lower_limit = -upper_limit if two_tailed else -_LOWER_LIMIT_STANDARD_DEVIATIONS * scale
+        new_nodes, step = numpy.linspace(lower_limit, upper_limit, _GRID_POINTS, retstep=True)
+        if nodes is None:
+            density = backend.norm_pdf(new_nodes / scale) / scale
+        else:
+            density = numpy.dot(
+                backend.norm_pdf(
+                    (new_nodes[:, numpy.newaxis] - nodes) / increment_standard_deviation
+                ),
+                weighted_density,
+            ) / increment_standard_deviation
+        nodes = new_nodes
+        weighted_density = density * _simpson_weights(_GRID_POINTS, step)
+        previous_fraction = information_fraction
+    return tuple(boundaries)
+
+def get_boundaries(information_fractions, alpha=0.05, spending='obrien_fleming', two_tailed=True):
+    """
+    Returns a tuple of z-value boundaries, one for each look at the given increasing information
+    fractions (the fraction of the planned sample observed at each look, the last being 1), for a
+    design spending alpha with the named spending function ('obrien_fleming' or 'pocock').
+
+    A look at which no alpha is spent has an infinite boundary. Results are cached.
+    """
+    information_fractions = tuple(float(fraction) for fraction in information_fractions)
+    if (not information_fractions
+            or any(fraction <= 0 or fraction > 1 for fraction in information_fractions)
+            or any(b <= a for a, b in zip(information_fractions, information_fractions[1:]))):
+        raise ValueError('Information fractions must increase within (0, 1]')
+    if spending not in SPENDING_FUNCTIONS:
+        raise ValueError('Unknown spending function %r' % (spending,))
+
+    key = (information_fractions, alpha, spending, two_tailed)
+    boundaries = _boundaries.get(key)
+    if boundaries is None:
+        boundaries = _compute_boundaries(information_fractions, alpha, spending, two_tailed)
+        if len(_boundaries) < _MAX_BOUNDARIES:
+            _boundaries[key] = boundaries
+    return boundaries
+
+SequentialResults = collections.namedtuple(
+    'SequentialResults',
+    (
+        'num_successes',
+        'num_trials',
+        # repeated confidence intervals, which hold at every look simultaneously
+        'proportion', # ValueWithInterval
+        'improvement', # ValueWithInterval
+        'relative_improvement', # ValueWithInterval
+        'z_value', # of the two-proportion z-test
+        'boundary', # the z-value boundary at this look
+        'reject', # True if z_value crosses the boundary
+    ),
+)
+
+class SequentialExperiment(object):
+    """
+    A group sequential counterpart of abba.stats.Experiment. The design, fixed up front, is the
+    number of variations compared with the baseline, the confidence level, the spending function and
+    either the number of equally spaced looks or the information fraction of each look.
+
+    Multiple comparisons are handled with a Bonferroni correction, as Experiment does for confidence
+    intervals.
+    """
+    def __init__(self, num_trials, num_looks=None, confidence_level=0.95,
+                 spending='obrien_fleming', information_fractions=None, two_tailed=True):
+        """
+        num_trials: number of trials to be compared to the baseline
+        """
+        if information_fractions is None:
+            if not num_looks:
+                raise ValueError('Either num_looks or information_fractions is required')
+            information_fractions = [(look + 1.0) / num_looks for look in range(num_looks)]
+        self.num_comparisons = max(1, num_trials)
+        self.information_fractions = tuple(information_fractions)
+        self.two_tailed = two_tailed
+        self.boundaries = get_boundaries(
+            self.information_fractions,
+            alpha=(1 - confidence_level) / self.num_comparisons,
+            spending=spending,
+            two_tailed=two_tailed,
+        )
+
+    @property
+    def num_looks(self):
+        return len(self.boundaries)
+
+    def get_results(self, look, baseline_num_successes, baseline_num_trials, num_successes,
+                    num_trials):
+        """
+        Compare a variation with the baseline at a look, numbered from zero, given the counts so
+        far.
+        """
+        if not 0 <= look < self.num_looks:
+            raise ValueError('Look %r is outside the design of %d looks' % (look, self.num_looks))
+        boundary = self.boundaries[look]
+        baseline = stats.Proportion(baseline_num_successes, baseline_num_trials)
+        trial = stats.Proportion(num_successes, num_trials)
+        try:
+            z_value = stats.ProportionComparison(baseline, trial).z_value()
+        except ZeroDivisionError:
+            # no failures (or no successes) in either arm, so no evidence of a difference
+            z_value = 0.0
+        return SequentialResults(
+            num_successes,
+            num_trials,
+            *(
+                stats._estimates(baseline, trial, boundary)
+                + (z_value, boundary, (abs(z_value) if self.two_tailed else z_value) >= boundary)
+            )
+        )
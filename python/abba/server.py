@@ -0,0 +1,376 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+A local HTTP server scoring experiments with abba.stats, for automation and for viewing results
+without the thumbtack.com web app.
+
+    $ python -m abba.server --port 8000
+
+POST /score with a JSON experiment, or a batch of them, and get back JSON results:
+
+    {"groups": {"baseline": [20, 1000], "red button": [50, 2000], "blue button": [70, 2000]},
+     "baseline": "baseline", "confidence_level": 0.95, "multiple_test_correction": true}
+
+    {"experiments": [<experiment>, <experiment>, ...]}
+
+groups maps labels to (num_successes, num_trials) in display order; the optional fields default as
+shown, except that the baseline is chosen as in abba.report.choose_baseline(). Each experiment's
+results are as in abba.report.group_results_to_dict(), or {"error": message} if it's invalid. A
+payload that isn't a valid experiment or batch gets status 400 and {"error": message}. Results are
+cached by counts, so repeated experiments are scored once.
+
+GET /demo/abba.html?<state> serves the demo web app (from a source checkout) showing results
+computed by the server, where <state> is the app's URL hash, e.g.
+"Baseline=20%2C1000&Variation+1=50%2C2000". The tools print such URLs with --abba_url.
+"""
+
+import argparse
+import collections
+import json
+import os
+import posixpath
+import sys
+
+from http import server as http_server
+from urllib import parse
+
+import abba
+from abba import backends
+from abba import cache
+from abba import report
+from abba import stats
+
+# directories of a source checkout served as static files, relative to its root
+_STATIC_DIRECTORIES = ('demo', 'lib', 'abba')
+_CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css',
+    '.js': 'application/javascript',
+}
+_OPTION_PREFIX = 'abba:'
+# inserted into the demo page after the scripts it replaces Abba.Experiment in
+_DEMO_SCRIPTS_ANCHOR = '<script src="../abba/render.js"></script>'
+_DEMO_SCRIPTS = (
+    '<script>Abba.SERVER_RESULTS = %s;</script>\n'
+    '        <script src="server_results.js"></script>'
+)
+
+def _default_static_root():
+    root = os.path.normpath(os.path.join(os.path.dirname(abba.__file__), os.pardir, os.pardir))
+    if os.path.exists(os.path.join(root, 'demo', 'abba.html')):
+        return root
+    return None
+
+class ScoringService(object):
+    """
+    Scores experiments given as decoded JSON, caching Results by counts. Independent of HTTP.
+    """
+    def __init__(self, cache_size=100000):
+        self.cache = cache.ResultCache(maxsize=cache_size)
+        # import SciPy now rather than in the first request
+        backends.get_backend()
+
+    def _parse_groups(self, groups):
+        if not isinstance(groups, dict) or not groups:
+            raise ValueError(
+                'groups must be an object mapping labels to [num_successes, num_trials]'
+            )
+        parsed = collections.OrderedDict()
+        for label, counts in groups.items():
+            num_successes, num_trials = counts
+            if (int(num_successes) != num_successes or int(num_trials) != num_trials
+                    or not 0 <= num_successes <= num_trials or num_trials < 1):
+                raise ValueError('Invalid counts for %r: %r' % (label, counts))
+            parsed[label] = (int(num_successes), int(num_trials))
+        return parsed
+
+    def _parse_multiple_test_correction(self, multiple_test_correction):
+        # not bool(), which makes the string "false" true
+        if not isinstance(multiple_test_correction, bool):
+            raise ValueError(
+                'multiple_test_correction must be true or false: %r' % (multiple_test_correction,)
+            )
+        return multiple_test_correction
+
+    def _parse_confidence_level(self, confidence_level):
+        confidence_level = float(confidence_level)
+        if not 0 < confidence_level < 1:
+            raise ValueError('confidence_level must be between 0 and 1: %r' % (confidence_level,))
+        return confidence_level
+
+    def score_groups(self, groups, baseline_label=None, confidence_level=0.95,
+                     multiple_test_correction=True):
+        """
+        Same as abba.report.score_groups(), with cached results, and without multiple test
+        correction if multiple_test_correction is False.
+        """
+        baseline_label = report.choose_baseline(groups, baseline_label)
+        baseline_counts = groups[baseline_label]
+        variation_labels = [label for label in groups if label != baseline_label]
+        num_comparisons = max(1, len(variation_labels)) if multiple_test_correction else 1
+        # cheap to construct; only the scoring is cached
+        experiment = stats.Experiment(
+            num_comparisons,
+            baseline_counts[0],
+            baseline_counts[1],
+            confidence_level,
+        )
+        experiment_key = (num_comparisons,) + baseline_counts + (confidence_level,)
+
+        baseline_key = ('baseline',) + experiment_key
+        baseline_proportion = self.cache.get(baseline_key)
+        if baseline_proportion is None:
+            baseline_proportion = experiment.get_baseline_proportion()
+            self.cache.set(baseline_key, baseline_proportion)
+        results = collections.OrderedDict()
+        for label in variation_labels:
+            key = ('results',) + experiment_key + groups[label]
+            label_results = self.cache.get(key)
+            if label_results is None:
+                label_results = experiment.get_results(*groups[label])
+                self.cache.set(key, label_results)
+            results[label] = label_results
+        return report.GroupResults(baseline_label, baseline_proportion, results)
+
+    def score(self, experiment):
+        """
+        Score one experiment in the JSON format described above. Returns a dict suitable for
+        JSON, which is {"error": message} if the experiment is invalid.
+        """
+        if not isinstance(experiment, dict):
+            return {'error': 'An experiment must be an object with groups'}
+        try:
+            groups = self._parse_groups(experiment['groups'])
+            group_results = self.score_groups(
+                groups,
+                baseline_label=experiment.get('baseline'),
+                confidence_level=self._parse_confidence_level(
+                    experiment.get('confidence_level', 0.95)
+                ),
+                multiple_test_correction=self._parse_multiple_test_correction(
+                    experiment.get('multiple_test_correction', True)
+                ),
+            )
+        except KeyError as error:
+            return {'error': 'Missing %s' % (error,)}
+        except (TypeError, ValueError, OverflowError) as error:
+            return {'error': str(error)}
+        return report.group_results_to_dict(groups, group_results)
+
+    def score_payload(self, payload):
+        """
+        Score a decoded POST /score payload: a single experiment, or a batch. Returns
+        {"error": message} if the payload is neither.
+        """
+        if isinstance(payload, dict) and 'experiments' in payload:
+            if not isinstance(payload['experiments'], list):
+                return {'error': 'experiments must be a list of experiments'}
+            return {'results': [self.score(experiment) for experiment in payload['experiments']]}
+        return self.score(payload)
+
+    def demo_results(self, state):
+        """
+        Score the experiment described by the demo app's URL hash, returning what
+        demo/server_results.js expects.
+        """
+        groups = collections.OrderedDict()
+        options = {}
+        for name, value in parse.parse_qsl(state, keep_blank_values=True):
+            if name.startswith(_OPTION_PREFIX):
+                options[name[len(_OPTION_PREFIX):]] = value
+            else:
+                groups[name] = [int(count) for count in value.split(',')]
+        groups = self._parse_groups(groups)
+        confidence_level = float(options.get('intervalConfidenceLevel', 0.95))
+        if confidence_level > 1:
+            # a percentage, as the app allows
+            confidence_level /= 100
+        confidence_level = self._parse_confidence_level(confidence_level)
+        multiple_test_correction = options.get('useMultipleTestCorrection', 'true') == 'true'
+        # the app takes the first group as the baseline
+        baseline_label = next(iter(groups))
+        group_results = self.score_groups(
+            groups,
+            baseline_label,
+            confidence_level,
+            multiple_test_correction,
+        )
+
+        def to_js(value_with_interval):
+            return {
+                'value': value_with_interval.value,
+                'lowerBound': value_with_interval.lower_bound,
+                'upperBound': value_with_interval.upper_bound,
+            }
+
+        return {
+            'hash': state,
+            'numComparisons': (
+                max(1, len(group_results.results)) if multiple_test_correction else 1
+            ),
+            'intervalAlpha': 1 - confidence_level,
+            'baseline': {
+                'numSuccesses': groups[baseline_label][0],
+                'numTrials': groups[baseline_label][1],
+                'proportion': to_js(group_results.baseline_proportion),
+            },
+            'variations': dict(
+                (
+                    '%d,%d' % (label_results.num_successes, label_results.num_trials),
+                    {
+                        'proportion': to_js(label_results.proportion),
+                        'relativeImprovement': to_js(label_results.relative_improvement),
+                        'pValue': float(label_results.two_tailed_p_value),
+                    },
+                )
+                for label_results in group_results.results.values()
+            ),
+        }
+
+class RequestHandler(http_server.BaseHTTPRequestHandler):
+    # keep connections alive between requests
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, which with Nagle's algorithm and delayed ACKs
+    # holds each response back about 40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *arguments):
+        if self.server.verbose:
+            http_server.BaseHTTPRequestHandler.log_message(self, format, *arguments)
+
+    def log_error(self, format, *arguments):
+        # even when not verbose
+        http_server.BaseHTTPRequestHandler.log_message(self, format, *arguments)
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_json(self, status, value):
+        self._send(status, json.dumps(value).encode('utf-8'), 'application/json')
+
+    def _send_error(self, status, message):
+        self._send_json(status, {'error': message})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send_error(400, 'Invalid Content-Length')
+            return
+        # read even if it isn't used, so the next request on the connection starts after it
+        body = self.rfile.read(length)
+        if parse.urlsplit(self.path).path != '/score':
+            self._send_error(404, 'Not found')
+            return
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except ValueError as error:
+            self._send_error(400, 'Invalid JSON: %s' % (error,))
+            return
+        try:
+            results = self.server.service.score_payload(payload)
+        except Exception as error:
+            # answer rather than drop the connection
+            self.log_error('Error scoring %s: %r', self.path, error)
+            self._send_error(500, 'Internal error: %s' % (error,))
+            return
+        self._send_json(400 if 'error' in results else 200, results)
+
+    def do_GET(self):
+        url = parse.urlsplit(self.path)
+        if url.path == '/':
+            self.send_response(302)
+            self.send_header('Location', '/demo/abba.html')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        path = self._static_path(url.path)
+        if path is None:
+            self._send_error(404, 'Not found')
+            return
+        with open(path, 'rb') as static_file:
+            body = static_file.read()
+        if url.path == '/demo/abba.html' and url.query:
+            try:
+                results = self.server.service.demo_results(url.query)
+            except (TypeError, ValueError, OverflowError) as error:
+                self._send_error(400, str(error))
+                return
+            # escaped so the JSON can't close the script element
+            scripts = _DEMO_SCRIPTS % (json.dumps(results).replace('</', '<\\/'),)
+            body = body.decode('utf-8').replace(
+                _DEMO_SCRIPTS_ANCHOR,
+                _DEMO_SCRIPTS_ANCHOR + '\n        ' + scripts,
+            ).encode('utf-8')
+        self._send(
+            200,
+            body,
+            _CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream'),
+        )
+
+    do_HEAD = do_GET
+
+    def _static_path(self, url_path):
+        """
+        Returns the file under the static root for url_path, or None if it isn't one we serve.
+        """
+        root = self.server.static_root
+        url_path = posixpath.normpath(parse.unquote(url_path))
+        parts = url_path.lstrip('/').split('/')
+        if root is None or parts[0] not in _STATIC_DIRECTORIES or '..' in parts:
+            return None
+        path = os.path.join(root, *parts)
+        return path if os.path.isfile(path) else None
+
+class Server(http_server.ThreadingHTTPServer):
+    daemon_threads = True
+    # the default of 5 makes clients connecting at once wait a second to retry
+    request_queue_size = 128
+
+    def __init__(self, address, service=None, static_root=None, verbose=False):
+        http_server.ThreadingHTTPServer.__init__(self, address, RequestHandler)
+        self.service = service or ScoringService()
+        self.static_root = static_root
+        self.verbose = verbose
+
+def make_server(host='127.0.0.1', port=8000, cache_size=100000, static_root=None, verbose=False):
+    """
+    Returns a Server (call serve_forever() to run it). static_root is the root of a source
+    checkout to serve the demo app from; by default, the one this module is in, if any.
+    """
+    return Server(
+        (host, port),
+        ScoringService(cache_size),
+        static_root or _default_static_root(),
+        verbose,
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve abba results over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache_size', type=int, default=100000,
+                        help='most results kept in the cache')
+    parser.add_argument('--static_root',
+                        help='source checkout to serve the demo app from')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port, args.cache_size, args.static_root, args.verbose)
+    sys.stderr.write('Serving on http://%s:%d/\n' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
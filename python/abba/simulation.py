@@ -0,0 +1,166 @@
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Monte Carlo simulation of A/B/n experiments, to measure the type I error and power of abba's tests.
+
+Experiments are drawn in chunks as arrays of binomial counts: a baseline with baseline_num_trials
+trials (num_trials by default) and num_variations variations with num_trials trials each. Every
+variation is tested against the baseline, as Experiment does, and the familywise error rate (the
+fraction of experiments in which any variation is significant) is compared with the nominal
+1 - confidence_level:
+
+    >>> results = abba.simulation.simulate(
+    ...     baseline_rate=0.05, num_trials=2000, num_variations=3, num_experiments=10**6, seed=1,
+    ... )
+    >>> results.familywise_rejection_rate, results.nominal_alpha
+
+With a nonzero relative_effect the rejection rates measure power instead.
+
+Two scoring methods are available. 'iterated_test', the default, computes the two-tailed p-values
+of Experiment.get_results(), which is what the simulator calibrates; draws repeat the same counts
+many times, so only the distinct (baseline, variation) count pairs in each chunk are scored.
+'z_test' scores every draw with array operations, with p-values adjusted for multiple comparisons
+like Experiment's. It's much faster for large samples, where the two tests agree closely.
+"""
+
+import collections
+import concurrent.futures
+
+import numpy
+
+from abba import backends
+from abba import stats
+
+SimulationResults = collections.namedtuple(
+    'SimulationResults',
+    (
+        'num_experiments',
+        'nominal_alpha', # 1 - confidence_level
+        'familywise_rejection_rate', # fraction of experiments with any variation significant
+        'familywise_standard_error', # binomial standard error of familywise_rejection_rate
+        'rejection_rates', # array of the fraction of experiments each variation was significant
+    ),
+)
+
+def _z_test_p_values(baseline_successes, successes, baseline_num_trials, num_trials, num_tests):
+    """
+    Two-tailed pooled z-test p-values for arrays of counts, adjusted for num_tests comparisons.
+    """
+    pooled_rate = (baseline_successes + successes) / float(baseline_num_trials + num_trials)
+    standard_error = numpy.sqrt(
+        pooled_rate * (1 - pooled_rate) * (1.0 / baseline_num_trials + 1.0 / num_trials)
+    )
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        difference = successes / float(num_trials) - baseline_successes / float(baseline_num_trials)
+        z_value = numpy.abs(difference) / standard_error
+    # no successes or no failures at all is no evidence of a difference
+    z_value = numpy.where(standard_error > 0, z_value, 0)
+    p_value = numpy.minimum(1, 2 * backends.get_backend().norm_sf(z_value))
+    return stats.probability_union(p_value, num_tests)
+
+def _iterated_test_p_values(baseline_successes, successes, baseline_num_trials, num_trials,
+                            num_tests):
+    pairs, inverse = numpy.unique(
+        numpy.stack((baseline_successes.ravel(), successes.ravel()), axis=1),
+        axis=0,
+        return_inverse=True,
+    )
+    unique_p_values = numpy.array([
+        stats.ProportionComparison(
+            stats.Proportion(int(baseline_count), baseline_num_trials),
+            stats.Proportion(int(count), num_trials),
+        ).iterated_test(
+            num_tests,
+            stats.Experiment.P_VALUE_PRECISION,
+            normal_approximation_trials=stats.Experiment.NORMAL_APPROXIMATION_TRIALS,
+            max_normal_error=stats.Experiment.NORMAL_APPROXIMATION_MAX_ERROR,
+        )
+        for baseline_count, count in pairs
+    ])
+    return unique_p_values[inverse.reshape(-1)].reshape(successes.shape)
+
+_P_VALUE_FUNCTIONS = {
+    'z_test': _z_test_p_values,
+    'iterated_test': _iterated_test_p_values,
+}
+
+def _simulate_chunk(seed_sequence, num_experiments, baseline_rate, variation_rates,
+                    baseline_num_trials, num_trials, alpha, method):
+    """
+    Draw and score one chunk of experiments. Returns (number of experiments with any rejection,
+    array of rejections per variation).
+    """
+    generator = numpy.random.default_rng(seed_sequence)
+    baseline_successes = generator.binomial(
+        baseline_num_trials,
+        baseline_rate,
+        size=(num_experiments, 1),
+    )
+    successes = generator.binomial(
+        num_trials,
+        variation_rates,
+        size=(num_experiments, len(variation_rates)),
+    )
+    p_values = _P_VALUE_FUNCTIONS[method](
+        numpy.broadcast_to(baseline_successes, successes.shape),
+        successes,
+        baseline_num_trials,
+        num_trials,
+        len(variation_rates),
+    )
+    rejected = p_values < alpha
+    return int(rejected.any(axis=1).sum()), rejected.sum(axis=0)
+
+def simulate(baseline_rate, num_trials, num_variations=1, relative_effect=0.0,
+             num_experiments=100000, confidence_level=0.95, method='iterated_test', seed=None,
+             chunk_size=100000, max_workers=None, baseline_num_trials=None):
+    """
+    Simulate num_experiments experiments with num_trials trials in each variation and
+    baseline_num_trials (by default num_trials) in the baseline, where the baseline converts at
+    baseline_rate and the variations at baseline_rate * (1 + relative_effect) (relative_effect may
+    be an array with one entry per variation). Returns SimulationResults.
+
+    Experiments are drawn chunk_size at a time to bound memory. Chunks get independent random
+    streams derived from seed, so results depend only on seed and chunk_size, including when chunks
+    are spread over max_workers processes.
+    """
+    if method not in _P_VALUE_FUNCTIONS:
+        raise ValueError('Unknown method %r' % (method,))
+    variation_rates = baseline_rate * (
+        1 + numpy.broadcast_to(numpy.asarray(relative_effect, dtype=float), (num_variations,))
+    )
+    if baseline_num_trials is None:
+        baseline_num_trials = num_trials
+    alpha = 1 - confidence_level
+    chunk_sizes = [chunk_size] * (num_experiments // chunk_size)
+    if num_experiments % chunk_size:
+        chunk_sizes.append(num_experiments % chunk_size)
+    seed_sequences = numpy.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    arguments = (baseline_rate, variation_rates, baseline_num_trials, num_trials, alpha, method)
+
+    if max_workers is None or max_workers <= 1:
+        chunk_results = [
+            _simulate_chunk(seed_sequence, size, *arguments)
+            for seed_sequence, size in zip(seed_sequences, chunk_sizes)
+        ]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunk_results = list(executor.map(
+                _simulate_chunk,
+                seed_sequences,
+                chunk_sizes,
+                *[[argument] * len(chunk_sizes) for argument in arguments]
+            ))
+
+    familywise_rejections = sum(familywise for familywise, _ in chunk_results)
+    rejections = numpy.sum([per_variation for _, per_variation in chunk_results], axis=0)
+    familywise_rate = familywise_rejections / float(num_experiments)
+    return SimulationResults(
+        num_experiments=num_experiments,
+        nominal_alpha=alpha,
+        familywise_rejection_rate=familywise_rate,
+        familywise_standard_error=float(
+            numpy.sqrt(familywise_rate * (1 - familywise_rate) / num_experiments)
+        ),
+        rejection_rates=rejections / float(num_experiments),
+    )
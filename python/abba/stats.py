@@ -2,21 +2,98 @@
 
 import collections
 import math
-import sys
+import timeit
 
-from scipy import stats
+import numpy
+from numpy.polynomial import hermite_e
+from abba import backends
+from abba import cache
+from abba import instrumentation
 
-if sys.version_info >= (3,):
-    xrange = range
+# opt-in memoization of p-values, see enable_cache()
+_cache = None
+
+def enable_cache(maxsize=4096, ttl=None):
+    """
+    Memoize ProportionComparison.iterated_test() and z_test() results in a process-wide LRU cache
+    keyed on the success and trial counts and test parameters. Returns the abba.cache.ResultCache,
+    whose info() reports hits, misses and evictions and whose save()/load() share entries between
+    processes.
+
+    ttl: seconds each entry stays valid, or None to keep entries until evicted.
+    """
+    set_cache(cache.ResultCache(maxsize=maxsize, ttl=ttl))
+    return _cache
+
+def set_cache(result_cache):
+    """
+    Install an existing abba.cache.ResultCache (or None to disable caching).
+    """
+    global _cache
+    _cache = result_cache
+
+def disable_cache():
+    set_cache(None)
+
+# z critical values keyed by (alpha, two_tailed). The first lookup fills in the values for the
+# confidence levels and numbers of comparisons below in a single call; other values are added as
+# they're used, up to a limit.
+_z_critical_values = {}
+_COMMON_CONFIDENCE_LEVELS = (0.8, 0.9, 0.95, 0.98, 0.99, 0.995, 0.999)
+_COMMON_MAX_COMPARISONS = 20
+_MAX_Z_CRITICAL_VALUES = 4096
+
+def _fill_z_critical_values(confidence_levels, max_comparisons):
+    # alphas are computed exactly as in Experiment so the keys match
+    alphas = [
+        (1 - confidence_level) / num_comparisons
+        for confidence_level in confidence_levels
+        for num_comparisons in range(1, max_comparisons + 1)
+    ]
+    for two_tailed in (True, False):
+        tail_alphas = numpy.array(alphas) / (2 if two_tailed else 1)
+        values = backends.get_backend().norm_ppf(1 - tail_alphas)
+        for alpha, value in zip(alphas, values):
+            _z_critical_values[(alpha, two_tailed)] = float(value)
 
 def get_z_critical_value(alpha, two_tailed=True):
     """
     Returns the z critical value for a particular alpha = 1 - confidence level.  By default returns
     a two-tailed z-value, meaning the actual tail probability is alpha / 2.
+
+    Values for scalar alphas are cached, so repeated calls are cheap. alpha may also be an array.
+    """
+    if numpy.ndim(alpha) == 0:
+        # a 0-d array isn't hashable
+        alpha = float(alpha)
+        key = (alpha, two_tailed)
+        if key in _z_critical_values:
+            return _z_critical_values[key]
+        if not _z_critical_values:
+            _fill_z_critical_values(_COMMON_CONFIDENCE_LEVELS, _COMMON_MAX_COMPARISONS)
+            if key in _z_critical_values:
+                return _z_critical_values[key]
+
+    tail_alpha = alpha / 2 if two_tailed else alpha
+    value = backends.get_backend().norm_ppf(1 - tail_alpha)
+    if numpy.ndim(alpha) == 0 and len(_z_critical_values) < _MAX_Z_CRITICAL_VALUES:
+        value = float(value)
+        _z_critical_values[key] = value
+    return value
+
+def probability_union(probability, num_tests):
     """
-    if two_tailed:
-        alpha /= 2
-    return stats.distributions.norm.ppf(1 - alpha)
+    Given the probability of an event, compute the probability that it happens at least once in
+    num_tests independent tests. This is used to adjust a p-value for multiple comparisons. When
+    used to adjust alpha instead, this is called a Sidak correction (the logic is the same, the
+    formula is inverted):
+    http://en.wikipedia.org/wiki/Bonferroni_correction#.C5.A0id.C3.A1k_correction
+
+    probability may be an array.
+    """
+    # 1 - (1 - probability)**num_tests, computed without losing precision for tiny probabilities
+    with numpy.errstate(divide='ignore'):
+        return -numpy.expm1(num_tests * numpy.log1p(-numpy.minimum(probability, 1)))
 
 # a value with confidence interval bounds (not necessarily centered around the point estimate)
 ValueWithInterval = collections.namedtuple(
@@ -28,6 +105,8 @@ class ValueWithError(object):
     """
     A value with standard error, from which a confidence interval can be derived.
     """
+    __slots__ = ('value', 'error')
+
     def __init__(self, value, error):
         self.value = value
         self.error = error
@@ -53,12 +132,14 @@ class ValueWithError(object):
         )
 
 class BinomialDistribution(object):
+    __slots__ = ('num_trials', 'probability', 'expectation', 'standard_deviation', '_binomial')
+
     def __init__(self, num_trials, probability):
         self.num_trials = num_trials
         self.probability = probability
         self.expectation = num_trials * probability
         self.standard_deviation = math.sqrt(self.expectation * (1 - probability))
-        self._binomial = stats.binom(num_trials, probability)
+        self._binomial = backends.get_backend().binomial(num_trials, probability)
 
     def mass(self, count):
         return self._binomial.pmf(count)
@@ -76,6 +157,8 @@ class BinomialDistribution(object):
         return self._binomial.isf(probability)
 
 class Proportion(object):
+    __slots__ = ('num_successes', 'num_trials')
+
     def __init__(self, num_successes, num_trials):
         """
         Represents a binomial proportion with num_successes successful samples out of num_trials
@@ -116,7 +199,104 @@ def confidence_interval_on_proportion(num_successes, num_trials, confidence_leve
         get_z_critical_value(1 - confidence_level)
     )
 
+def _agresti_coull_arrays(num_successes, num_trials, z_critical_value):
+    """
+    Array version of Proportion.p_estimate(): returns (interval_center, standard_error) arrays for
+    arrays of success and trial counts.
+    """
+    adjusted_num_trials = numpy.asarray(num_trials + z_critical_value**2, dtype=float)
+    interval_center = (num_successes + z_critical_value**2 / 2) / adjusted_num_trials
+    standard_error = numpy.sqrt(interval_center * (1 - interval_center) / adjusted_num_trials)
+    return interval_center, standard_error
+
+def _edgeworth_cdf(z_value, skewness):
+    """
+    Standard normal CDF with a first order Edgeworth correction for a distribution with the given
+    skewness.
+    """
+    backend = backends.get_backend()
+    return backend.norm_cdf(z_value) - skewness / 6 * (z_value**2 - 1) * backend.norm_pdf(z_value)
+
+def _edgeworth_survival(z_value, skewness):
+    backend = backends.get_backend()
+    return backend.norm_sf(z_value) + skewness / 6 * (z_value**2 - 1) * backend.norm_pdf(z_value)
+
+# log(k!) for k = 0, 1, ..., extended as needed by _log_factorials()
+_log_factorial_table = numpy.zeros(1)
+
+def _log_factorials(n):
+    """
+    Returns an array of log(k!) for k = 0..n, at least. Accurate to about 1e-9 relative for n up
+    to 1e6 or so.
+    """
+    global _log_factorial_table
+    table = _log_factorial_table
+    if len(table) <= n:
+        size = max(n + 1, 2 * len(table))
+        table = numpy.concatenate(([0.0], numpy.cumsum(numpy.log(numpy.arange(1, size)))))
+        _log_factorial_table = table
+    return table
+
+def _binomial_masses(num_trials, probability):
+    """
+    Array of binomial probability masses for 0..num_trials successes, computed in log space.
+    """
+    if probability <= 0 or probability >= 1:
+        masses = numpy.zeros(num_trials + 1)
+        masses[0 if probability <= 0 else num_trials] = 1
+        return masses
+    log_factorials = _log_factorials(num_trials)
+    counts = numpy.arange(num_trials + 1)
+    log_masses = (
+        log_factorials[num_trials] - log_factorials[:num_trials + 1]
+        - log_factorials[num_trials::-1]
+        + counts * math.log(probability) + (num_trials - counts) * math.log1p(-probability)
+    )
+    masses = numpy.exp(log_masses - log_masses.max())
+    return masses / masses.sum()
+
+def _hypergeometric_masses(population, num_successes, num_draws):
+    """
+    Returns (lowest count, masses) for the number of successes among num_draws drawn without
+    replacement from a population containing num_successes successes, computed in log space.
+    """
+    lowest = max(0, num_draws - (population - num_successes))
+    counts = numpy.arange(lowest, min(num_draws, num_successes) + 1)
+    log_factorials = _log_factorials(population)
+    log_masses = (
+        - log_factorials[counts] - log_factorials[num_successes - counts]
+        - log_factorials[num_draws - counts]
+        - log_factorials[population - num_successes - num_draws + counts]
+    )
+    masses = numpy.exp(log_masses - log_masses.max())
+    return lowest, masses / masses.sum()
+
+IteratedTestResult = collections.namedtuple(
+    'IteratedTestResult',
+    (
+        'p_value',
+        'error_bound', # estimated bound on the absolute error of p_value
+        'method', # 'coverage', 'normal', 'anytime' or 'trivial'
+        'interval_size', # number of baseline success counts summed over
+        'num_evaluations', # number of distribution function evaluations
+        'converged', # False if anytime_iterated_test() ran out of budget before full precision
+    ),
+)
+
 class ProportionComparison(object):
+    # number of Gauss-Hermite nodes first used by the normal approximation in iterated_test(), and
+    # the most it will double to while the quadrature hasn't converged
+    NORMAL_APPROXIMATION_NODES = 32
+    MAX_NORMAL_APPROXIMATION_NODES = 256
+    # number of baseline counts used to average the continuity correction
+    NORMAL_APPROXIMATION_LATTICE = 1000
+    # error of the normal approximation per 1 / standard deviation of the counts (see
+    # _normal_approximation_error()); about four times the largest ratio found comparing it to the
+    # coverage sum over a grid of proportions, sample sizes, effects and numbers of tests
+    NORMAL_APPROXIMATION_ERROR_SCALE = 0.1
+
+    __slots__ = ('baseline', 'variation')
+
     def __init__(self, baseline, variation):
         self.baseline = baseline
         self.variation = variation
@@ -142,6 +322,28 @@ class ProportionComparison(object):
         error = difference.error / baseline_value
         return ValueWithError(ratio, error)
 
+    def _cached(self, compute, *parameters):
+        """
+        Call compute(*parameters), memoizing on the counts and parameters if caching is enabled.
+        """
+        if _cache is None:
+            return compute(*parameters)
+        key = self._cache_key(compute.__name__, parameters)
+        value = _cache.get(key)
+        if value is None:
+            value = compute(*parameters)
+            _cache.set(key, value)
+        return value
+
+    def _cache_key(self, name, parameters):
+        return (
+            name,
+            self.baseline.num_successes,
+            self.baseline.num_trials,
+            self.variation.num_successes,
+            self.variation.num_trials,
+        ) + parameters
+
     def z_test(self, z_multiplier=1):
         """
         Perform a large-sample z-test of null hypothesis H0: p_baseline == p_variation against
@@ -152,6 +354,13 @@ class ProportionComparison(object):
         See http://en.wikipedia.org/wiki/Statistical_hypothesis_testing#Common_test_statistics,
         "Two-proportion z-test, pooled for d0 = 0".
         """
+        return self._cached(self._z_test, z_multiplier)
+
+    def z_value(self):
+        """
+        The test statistic of z_test(): the difference in success rates divided by its standard
+        error under H0: p_baseline == p_variation.
+        """
         pooled_stats = Proportion(
             self.baseline.num_successes + self.variation.num_successes,
             self.baseline.num_trials + self.variation.num_trials,
@@ -162,8 +371,10 @@ class ProportionComparison(object):
             * (1.0 / self.baseline.num_trials + 1.0 / self.variation.num_trials)
         )
         pooled_standard_error_of_difference = math.sqrt(pooled_variance_of_difference)
-        test_z_value = self.difference_estimate(0).value / pooled_standard_error_of_difference
-        adjusted_p_value = stats.distributions.norm.sf(test_z_value * z_multiplier)
+        return self.difference_estimate(0).value / pooled_standard_error_of_difference
+
+    def _z_test(self, z_multiplier):
+        adjusted_p_value = backends.get_backend().norm_sf(self.z_value() * z_multiplier)
         return adjusted_p_value
 
     def _binomial_coverage_interval(self, distribution, coverage_alpha):
@@ -182,22 +393,48 @@ class ProportionComparison(object):
             )
 
     def _probability_union(self, probability, num_tests):
+        return probability_union(probability, num_tests)
+
+    def _extreme_variation_counts(self, baseline_proportion, observed_delta, improvement_only):
         """
-        Given the probability of an event, compute the probability that it happens at least once in
-        num_tests independent tests. This is used to adjust a p-value for multiple comparisons.
-        When used to adjust alpha instead, this is called a Sidak correction (the logic is the same,
-        the formula is inverted):
-        http://en.wikipedia.org/wiki/Bonferroni_correction#.C5.A0id.C3.A1k_correction
+        For an array of baseline proportions, return unrounded (lower, upper) variation success
+        counts at or beyond which a variation result is at least as extreme as the one observed.
+        lower is None if improvement_only=True.
         """
-        return 1 - (1 - probability)**num_tests
+        if improvement_only:
+            return None, (baseline_proportion + observed_delta) * self.variation.num_trials
+        observed_absolute_delta = abs(observed_delta)
+        return (
+            (baseline_proportion - observed_absolute_delta) * self.variation.num_trials,
+            (baseline_proportion + observed_absolute_delta) * self.variation.num_trials,
+        )
 
-    def iterated_test(self, num_tests, coverage_alpha, improvement_only=False):
+    def _normal_approximation_error(self, pooled_proportion, num_tests):
+        """
+        Estimate the error of _normal_iterated_test() due to approximating the binomials, excluding
+        quadrature error. It's dominated by the lattice of counts, which the continuity correction
+        only partly accounts for, so it's of order 1 / standard deviation, and errors in the
+        conditional p-values are amplified by up to num_tests by the Sidak correction. This is an
+        empirical bound, not a proven one (see NORMAL_APPROXIMATION_ERROR_SCALE).
+        """
+        variance = pooled_proportion * (1 - pooled_proportion)
+        baseline_variance = self.baseline.num_trials * variance
+        variation_variance = self.variation.num_trials * variance
+        if baseline_variance == 0 or variation_variance == 0:
+            return float('inf')
+        return self.NORMAL_APPROXIMATION_ERROR_SCALE * (
+            num_tests / math.sqrt(variation_variance) + 1 / math.sqrt(baseline_variance)
+        )
+
+    def iterated_test(self, num_tests, coverage_alpha, improvement_only=False,
+                      normal_approximation_trials=None, max_normal_error=None):
         """
         Compute a p-value testing null hypothesis H0: p_baseline == p_variation against alternative
         hypothesis H1: p_baseline != p_variation by summing p-values conditioned on individual
         baseline success counts. This provides a more accurate correction for multiple testing but
         scales like O(sqrt(self.baseline.num_trials)), so can eventually get slow for very large
-        values.
+        values. The whole baseline coverage interval is evaluated in a single pass of array
+        operations, so the constant factor is small.
 
         Lower coverage_alpha increases accuracy at the cost of longer runtime. Roughly, the result
         will be accurate within no more than coverage_alpha (but this ignores error due to the
@@ -205,54 +442,656 @@ class ProportionComparison(object):
 
         If improvement_only=True, computes p-value for alternative hypothesis
         H1: p_baseline < p_variation instead.
+
+        For large samples the sum can be replaced by an integral over a normal approximation of the
+        baseline, which costs O(1) regardless of the number of trials. This is used when the
+        baseline has at least normal_approximation_trials trials, or when the estimated error of
+        the approximation is at most max_normal_error. Either may be None to disable that switch.
+        See iterated_test_details() to find out which method was used.
+
+        Results are memoized when caching is enabled, see enable_cache().
+        """
+        return self.iterated_test_details(
+            num_tests,
+            coverage_alpha,
+            improvement_only=improvement_only,
+            normal_approximation_trials=normal_approximation_trials,
+            max_normal_error=max_normal_error,
+        ).p_value
+
+    def iterated_test_details(self, num_tests, coverage_alpha, improvement_only=False,
+                              normal_approximation_trials=None, max_normal_error=None):
+        """
+        Same as iterated_test(), but returns an IteratedTestResult reporting the method used and an
+        estimated bound on the error of the p-value.
+        """
+        if instrumentation.observers:
+            start_time = timeit.default_timer()
+        result = self._cached(
+            self._iterated_test,
+            num_tests,
+            coverage_alpha,
+            improvement_only,
+            normal_approximation_trials,
+            max_normal_error,
+        )
+        if instrumentation.observers:
+            self._emit_iterated_test_event(
+                result,
+                timeit.default_timer() - start_time,
+                num_tests,
+                improvement_only,
+            )
+        return result
+
+    def iterated_test_pair_details(self, num_tests, coverage_alpha,
+                                   normal_approximation_trials=None, max_normal_error=None):
+        """
+        Returns the IteratedTestResults of iterated_test_details() for both the two-tailed and the
+        improvement-only alternatives, computed together: the pooled proportion, the choice of
+        method, the baseline coverage interval and its probability masses are shared, and the
+        variation's distribution function is evaluated for both tails in a single call.
         """
+        if instrumentation.observers:
+            start_time = timeit.default_timer()
+        results = self._cached_iterated_test_pair(
+            num_tests,
+            coverage_alpha,
+            normal_approximation_trials,
+            max_normal_error,
+        )
+        if instrumentation.observers:
+            # events are emitted on cache hits too, as by iterated_test_details(); attribute half of
+            # the time to each tail
+            seconds = (timeit.default_timer() - start_time) / 2
+            for result, improvement_only in zip(results, (False, True)):
+                self._emit_iterated_test_event(result, seconds, num_tests, improvement_only)
+        return results
+
+    def _cached_iterated_test_pair(self, num_tests, coverage_alpha, normal_approximation_trials,
+                                   max_normal_error):
+        """
+        _iterated_test_pair(), memoized under the same keys as the results of
+        iterated_test_details() for each tail.
+        """
+        if _cache is None:
+            return self._iterated_test_pair(
+                num_tests,
+                coverage_alpha,
+                normal_approximation_trials,
+                max_normal_error,
+            )
+        parameters = (num_tests, coverage_alpha)
+        options = (normal_approximation_trials, max_normal_error)
+        keys = [
+            self._cache_key('_iterated_test', parameters + (improvement_only,) + options)
+            for improvement_only in (False, True)
+        ]
+        results = tuple(_cache.get(key) for key in keys)
+        if None in results:
+            results = self._iterated_test_pair(
+                num_tests,
+                coverage_alpha,
+                normal_approximation_trials,
+                max_normal_error,
+            )
+            for key, result in zip(keys, results):
+                _cache.set(key, result)
+        return results
+
+    def _emit_iterated_test_event(self, result, seconds, num_tests, improvement_only):
+        instrumentation.emit(instrumentation.IteratedTestEvent(
+            seconds=seconds,
+            method=result.method,
+            interval_size=result.interval_size,
+            num_evaluations=result.num_evaluations,
+            num_tests=num_tests,
+            improvement_only=improvement_only,
+            baseline_num_trials=self.baseline.num_trials,
+            variation_num_trials=self.variation.num_trials,
+        ))
+
+    def _iterated_test(self, num_tests, coverage_alpha, improvement_only,
+                       normal_approximation_trials, max_normal_error):
         observed_delta = self.variation.p_estimate().value - self.baseline.p_estimate().value
         if observed_delta == 0 and not improvement_only:
             # a trivial case that the code below does not handle well
-            return 1
+            return IteratedTestResult(
+                p_value=1,
+                error_bound=0,
+                method='trivial',
+                interval_size=0,
+                num_evaluations=0,
+                converged=True,
+            )
 
-        pooled_proportion = (
+        pooled_proportion = self._pooled_proportion()
+        normal_error = self._normal_approximation_error(pooled_proportion, num_tests)
+        if self._use_normal_approximation(normal_error, normal_approximation_trials,
+                                          max_normal_error):
+            return self._normal_iterated_test(
+                num_tests,
+                coverage_alpha,
+                improvement_only,
+                observed_delta,
+                pooled_proportion,
+                normal_error,
+            )
+        return self._coverage_iterated_test(
+            num_tests,
+            coverage_alpha,
+            improvement_only,
+            observed_delta,
+            pooled_proportion,
+        )
+
+    def _iterated_test_pair(self, num_tests, coverage_alpha, normal_approximation_trials,
+                            max_normal_error):
+        observed_delta = self.variation.p_estimate().value - self.baseline.p_estimate().value
+        pooled_proportion = self._pooled_proportion()
+        normal_error = self._normal_approximation_error(pooled_proportion, num_tests)
+        if self._use_normal_approximation(normal_error, normal_approximation_trials,
+                                          max_normal_error):
+            # O(1) for each tail, so there's little to share
+            return tuple(
+                self._iterated_test(
+                    num_tests,
+                    coverage_alpha,
+                    improvement_only,
+                    normal_approximation_trials,
+                    max_normal_error,
+                )
+                for improvement_only in (False, True)
+            )
+        return self._coverage_iterated_test_pair(
+            num_tests,
+            coverage_alpha,
+            observed_delta,
+            pooled_proportion,
+        )
+
+    def _pooled_proportion(self):
+        return (
             (self.baseline.num_successes + self.variation.num_successes)
             / float(self.baseline.num_trials + self.variation.num_trials)
         )
-        variation_distribution = BinomialDistribution(self.variation.num_trials, pooled_proportion)
-        baseline_distribution = BinomialDistribution(self.baseline.num_trials, pooled_proportion)
 
+    def _use_normal_approximation(self, normal_error, normal_approximation_trials,
+                                  max_normal_error):
+        return normal_error != float('inf') and (
+            (normal_approximation_trials is not None
+             and self.baseline.num_trials >= normal_approximation_trials)
+            or (max_normal_error is not None and normal_error <= max_normal_error)
+        )
+
+    def _baseline_coverage_terms(self, pooled_proportion, coverage_alpha):
+        """
+        Returns the baseline success counts in the coverage interval, as counts and proportions,
+        and their probability masses under the pooled proportion.
+        """
+        baseline_distribution = BinomialDistribution(self.baseline.num_trials, pooled_proportion)
         baseline_limits = self._binomial_coverage_interval(baseline_distribution, coverage_alpha)
-        p_value = 0
-        for baseline_successes in xrange(baseline_limits[0], baseline_limits[1] + 1):
-            baseline_proportion = 1.0 * baseline_successes / self.baseline.num_trials
-            if improvement_only:
-                lower_trial_count = -1
-                upper_trial_count = math.ceil(
-                    (baseline_proportion + observed_delta) * self.variation.num_trials
+        # evaluate every baseline success count in the coverage interval at once
+        baseline_successes = numpy.arange(baseline_limits[0], baseline_limits[1] + 1)
+        return (
+            baseline_successes,
+            1.0 * baseline_successes / self.baseline.num_trials,
+            baseline_distribution.mass(baseline_successes),
+        )
+
+    def _coverage_iterated_test(self, num_tests, coverage_alpha, improvement_only, observed_delta,
+                                pooled_proportion):
+        variation_distribution = BinomialDistribution(self.variation.num_trials, pooled_proportion)
+        baseline_successes, baseline_proportion, baseline_probability = \
+            self._baseline_coverage_terms(pooled_proportion, coverage_alpha)
+        lower_trial_count, upper_trial_count = self._extreme_variation_counts(
+            baseline_proportion,
+            observed_delta,
+            improvement_only,
+        )
+        if lower_trial_count is None:
+            lower_trial_count = numpy.full(baseline_successes.shape, -1.0)
+        else:
+            lower_trial_count = numpy.floor(lower_trial_count)
+        upper_trial_count = numpy.ceil(upper_trial_count)
+
+        # p-values of variation success counts "at least as extreme" for each particular baseline
+        # success count
+        p_value_at_baseline = (
+            variation_distribution.cdf(lower_trial_count)
+            + variation_distribution.survival(upper_trial_count - 1)
+        )
+
+        # this is exact because we're conditioning on the baseline count, so the multiple tests are
+        # independent.
+        adjusted_p_value = self._probability_union(p_value_at_baseline, num_tests)
+        p_value = numpy.dot(baseline_probability, adjusted_p_value)
+
+        # the remaining baseline values we didn't cover contribute less than coverage_alpha to the
+        # sum, so adding that amount gives us a conservative upper bound.
+        return IteratedTestResult(
+            p_value=p_value + coverage_alpha,
+            error_bound=coverage_alpha,
+            method='coverage',
+            interval_size=len(baseline_successes),
+            num_evaluations=3 * len(baseline_successes),
+            converged=True,
+        )
+
+    def _coverage_iterated_test_pair(self, num_tests, coverage_alpha, observed_delta,
+                                     pooled_proportion):
+        """
+        _coverage_iterated_test() for both alternatives at once. The variation counts at least as
+        extreme as the one observed are, for each baseline count, those up to the two-tailed lower
+        count, and those from the two-tailed upper count (two-tailed) or from the improvement-only
+        upper count, which is the same one unless the observed difference is negative.
+        """
+        variation_distribution = BinomialDistribution(self.variation.num_trials, pooled_proportion)
+        baseline_successes, baseline_proportion, baseline_probability = \
+            self._baseline_coverage_terms(pooled_proportion, coverage_alpha)
+        size = len(baseline_successes)
+        lower_trial_count, upper_trial_count = self._extreme_variation_counts(
+            baseline_proportion,
+            observed_delta,
+            False,
+        )
+        counts = [numpy.floor(lower_trial_count), numpy.ceil(upper_trial_count) - 1]
+        if observed_delta < 0:
+            _, improvement_trial_count = self._extreme_variation_counts(
+                baseline_proportion,
+                observed_delta,
+                True,
+            )
+            counts.append(numpy.ceil(improvement_trial_count) - 1)
+        # a single evaluation of the distribution function for every count and tail
+        cdf = variation_distribution.cdf(numpy.concatenate(counts))
+        lower_tail = cdf[:size]
+        upper_tail = 1 - cdf[size:2 * size]
+        improvement_tail = upper_tail if observed_delta >= 0 else 1 - cdf[2 * size:]
+
+        def result(p_value_at_baseline, num_evaluations):
+            adjusted_p_value = self._probability_union(p_value_at_baseline, num_tests)
+            return IteratedTestResult(
+                p_value=numpy.dot(baseline_probability, adjusted_p_value) + coverage_alpha,
+                error_bound=coverage_alpha,
+                method='coverage',
+                interval_size=size,
+                num_evaluations=num_evaluations,
+                converged=True,
+            )
+
+        if observed_delta == 0:
+            two_tailed = IteratedTestResult(
+                p_value=1,
+                error_bound=0,
+                method='trivial',
+                interval_size=0,
+                num_evaluations=0,
+                converged=True,
+            )
+        else:
+            two_tailed = result(lower_tail + upper_tail, 3 * size)
+        return two_tailed, result(improvement_tail, 3 * size)
+
+    def anytime_iterated_test(self, num_tests, coverage_alpha, improvement_only=False,
+                              deadline=None, max_evaluations=None,
+                              normal_approximation_trials=None, max_normal_error=None):
+        """
+        A version of iterated_test_details() whose running time can be bounded, for callers that
+        would rather have a prompt upper bound on the p-value than a late precise one.
+
+        Baseline success counts are summed over in blocks walking outward from the most probable
+        count, so the largest masses come first. The walk stops once the baseline mass not yet
+        covered is at most coverage_alpha, or earlier, when timeit.default_timer() has passed
+        deadline or the next block would take the total number of distribution function
+        evaluations over max_evaluations. Each uncovered baseline count adds at most its mass to
+        the p-value, so the partial sum plus the uncovered mass is a guaranteed upper bound; the
+        uncovered mass is reported as error_bound, and converged is False if the walk stopped
+        before reaching coverage_alpha. The deadline is checked between blocks, so it may be
+        overrun by the time one block takes.
+
+        The normal approximation is used under the same conditions as in iterated_test(), since it
+        takes constant time anyway. Results aren't memoized.
+        """
+        return self._anytime_iterated_tests(
+            num_tests,
+            coverage_alpha,
+            (improvement_only,),
+            deadline,
+            max_evaluations,
+            normal_approximation_trials,
+            max_normal_error,
+        )[0]
+
+    def _anytime_iterated_tests(self, num_tests, coverage_alpha, tails, deadline, max_evaluations,
+                                normal_approximation_trials, max_normal_error):
+        """
+        anytime_iterated_test() for each of tails (a sequence of improvement_only flags), sharing
+        one walk over the baseline counts and one budget. Returns a list of IteratedTestResults.
+        """
+        observed_delta = self.variation.p_estimate().value - self.baseline.p_estimate().value
+        pooled_proportion = self._pooled_proportion()
+        use_normal_approximation = self._use_normal_approximation(
+            self._normal_approximation_error(pooled_proportion, num_tests),
+            normal_approximation_trials,
+            max_normal_error,
+        )
+        results = {}
+        for improvement_only in tails:
+            if use_normal_approximation or (observed_delta == 0 and not improvement_only):
+                results[improvement_only] = self._iterated_test(
+                    num_tests,
+                    coverage_alpha,
+                    improvement_only,
+                    normal_approximation_trials,
+                    max_normal_error,
                 )
-            else:
-                observed_absolute_delta = abs(observed_delta)
-                lower_trial_count = math.floor(
-                    (baseline_proportion - observed_absolute_delta) * self.variation.num_trials
+        walked_tails = [improvement_only for improvement_only in tails
+                        if improvement_only not in results]
+        if walked_tails:
+            results.update(zip(walked_tails, self._walk_iterated_tests(
+                num_tests,
+                coverage_alpha,
+                walked_tails,
+                observed_delta,
+                pooled_proportion,
+                deadline,
+                max_evaluations,
+            )))
+        return [results[improvement_only] for improvement_only in tails]
+
+    def _walk_iterated_tests(self, num_tests, coverage_alpha, tails, observed_delta,
+                             pooled_proportion, deadline, max_evaluations):
+        baseline_num_trials = self.baseline.num_trials
+        variation_distribution = BinomialDistribution(self.variation.num_trials, pooled_proportion)
+        baseline_distribution = BinomialDistribution(baseline_num_trials, pooled_proportion)
+        # each step covers this many more counts on either side, so about ten steps reach the
+        # coverage iterated_test() uses
+        block_size = max(1, int(math.ceil(baseline_distribution.standard_deviation / 2)))
+        evaluations_per_count = 1 + sum(1 if improvement_only else 2 for improvement_only in tails)
+
+        # counts in [lower, upper) are covered
+        lower = upper = min(
+            baseline_num_trials,
+            int(math.floor((baseline_num_trials + 1) * pooled_proportion)),
+        )
+        partial_sums = [0.0] * len(tails)
+        uncovered_mass = 1.0
+        num_evaluations = 0
+        converged = False
+        while True:
+            if deadline is not None and timeit.default_timer() > deadline:
+                break
+            size = block_size
+            if max_evaluations is not None:
+                # the block's counts, plus two evaluations for the uncovered mass
+                affordable_counts = (max_evaluations - num_evaluations - 2) // evaluations_per_count
+                size = min(size, affordable_counts // 2)
+                if size < 1:
+                    break
+            new_lower = max(0, lower - size)
+            new_upper = min(baseline_num_trials + 1, upper + size)
+            baseline_successes = numpy.concatenate((
+                numpy.arange(new_lower, lower),
+                numpy.arange(upper, new_upper),
+            ))
+            baseline_probability = baseline_distribution.mass(baseline_successes)
+            baseline_proportion = 1.0 * baseline_successes / baseline_num_trials
+            num_evaluations += len(baseline_successes)
+            for index, improvement_only in enumerate(tails):
+                lower_trial_count, upper_trial_count = self._extreme_variation_counts(
+                    baseline_proportion,
+                    observed_delta,
+                    improvement_only,
+                )
+                p_value_at_baseline = variation_distribution.survival(
+                    numpy.ceil(upper_trial_count) - 1
                 )
-                upper_trial_count = math.ceil(
-                    (baseline_proportion + observed_absolute_delta) * self.variation.num_trials
+                num_evaluations += len(baseline_successes)
+                if lower_trial_count is not None:
+                    p_value_at_baseline = (
+                        p_value_at_baseline
+                        + variation_distribution.cdf(numpy.floor(lower_trial_count))
+                    )
+                    num_evaluations += len(baseline_successes)
+                partial_sums[index] += numpy.dot(
+                    baseline_probability,
+                    self._probability_union(p_value_at_baseline, num_tests),
                 )
+            lower, upper = new_lower, new_upper
+            uncovered_mass = float(
+                baseline_distribution.cdf(lower - 1) + baseline_distribution.survival(upper - 1)
+            )
+            num_evaluations += 2
+            if uncovered_mass <= coverage_alpha:
+                converged = True
+                break
 
-            # p-value of variation success counts "at least as extreme" for this particular
-            # baseline success count
-            p_value_at_baseline = (
-                variation_distribution.cdf(lower_trial_count)
-                + variation_distribution.survival(upper_trial_count - 1)
+        return [
+            IteratedTestResult(
+                p_value=min(1.0, partial_sum + uncovered_mass),
+                error_bound=uncovered_mass,
+                method='anytime',
+                interval_size=upper - lower,
+                num_evaluations=num_evaluations,
+                converged=converged,
             )
+            for partial_sum in partial_sums
+        ]
 
-            # this is exact because we're conditioning on the baseline count, so the multiple
-            # tests are independent.
-            adjusted_p_value = self._probability_union(p_value_at_baseline, num_tests)
+    def _normal_iterated_test(self, num_tests, coverage_alpha, improvement_only, observed_delta,
+                              pooled_proportion, normal_error):
+        """
+        Approximate the sum computed by _coverage_iterated_test() with an integral over a normal
+        approximation of the baseline proportion, using Gauss-Hermite quadrature. Both binomials
+        get a first order Edgeworth correction for skewness, and the variation gets a continuity
+        correction averaged over the lattice of baseline counts, so the cost doesn't depend on the
+        number of trials.
+        """
+        baseline_num_trials = self.baseline.num_trials
+        variation_num_trials = self.variation.num_trials
+        variance = pooled_proportion * (1 - pooled_proportion)
+        baseline_standard_deviation = math.sqrt(baseline_num_trials * variance)
+        variation_standard_deviation = math.sqrt(variation_num_trials * variance)
+        baseline_skewness = (1 - 2 * pooled_proportion) / baseline_standard_deviation
+        variation_skewness = (1 - 2 * pooled_proportion) / variation_standard_deviation
+        variation_expectation = variation_num_trials * pooled_proportion
 
-            baseline_probability = baseline_distribution.mass(baseline_successes)
-            p_value += baseline_probability * adjusted_p_value
+        # rounding the extreme variation counts shifts them by an amount that depends on the
+        # baseline count; average the shift over baseline counts near the expectation
+        center = int(baseline_num_trials * pooled_proportion)
+        lattice = numpy.arange(
+            max(0, center - self.NORMAL_APPROXIMATION_LATTICE // 2),
+            min(baseline_num_trials, center + self.NORMAL_APPROXIMATION_LATTICE // 2) + 1,
+        )
+        lower_count, upper_count = self._extreme_variation_counts(
+            1.0 * lattice / baseline_num_trials,
+            observed_delta,
+            improvement_only,
+        )
+        upper_correction = numpy.mean(numpy.ceil(upper_count) - 0.5 - upper_count)
+        if lower_count is not None:
+            lower_correction = numpy.mean(numpy.floor(lower_count) + 0.5 - lower_count)
 
-        # the remaining baseline values we didn't cover contribute less than coverage_alpha to the
-        # sum, so adding that amount gives us a conservative upper bound.
-        return p_value + coverage_alpha
+        def integrate(num_nodes):
+            nodes, weights = hermite_e.hermegauss(num_nodes)
+            weights = (
+                weights / math.sqrt(2 * math.pi)
+                * (1 + baseline_skewness / 6 * (nodes**3 - 3 * nodes))
+            )
+            baseline_proportion = (
+                pooled_proportion + baseline_standard_deviation * nodes / baseline_num_trials
+            )
+            lower_count, upper_count = self._extreme_variation_counts(
+                baseline_proportion,
+                observed_delta,
+                improvement_only,
+            )
+            p_value_at_baseline = _edgeworth_survival(
+                (upper_count + upper_correction - variation_expectation)
+                    / variation_standard_deviation,
+                variation_skewness,
+            )
+            if lower_count is not None:
+                p_value_at_baseline += _edgeworth_cdf(
+                    (lower_count + lower_correction - variation_expectation)
+                        / variation_standard_deviation,
+                    variation_skewness,
+                )
+            adjusted_p_value = self._probability_union(
+                numpy.clip(p_value_at_baseline, 0, 1),
+                num_tests,
+            )
+            return numpy.dot(weights, adjusted_p_value)
+
+        # double the number of nodes until the quadrature has converged
+        num_nodes = self.NORMAL_APPROXIMATION_NODES
+        previous_p_value = integrate(num_nodes // 2)
+        num_evaluations = num_nodes // 2
+        while True:
+            p_value = integrate(num_nodes)
+            num_evaluations += num_nodes
+            quadrature_error = abs(p_value - previous_p_value)
+            if (quadrature_error <= coverage_alpha / 2
+                    or num_nodes >= self.MAX_NORMAL_APPROXIMATION_NODES):
+                break
+            previous_p_value = p_value
+            num_nodes *= 2
+
+        error_bound = normal_error + quadrature_error
+        return IteratedTestResult(
+            p_value=min(1.0, max(0.0, p_value) + error_bound),
+            error_bound=error_bound,
+            method='normal',
+            interval_size=0,
+            num_evaluations=num_evaluations * (1 if improvement_only else 2),
+            converged=True,
+        )
+
+    def exact_iterated_test(self, num_tests, improvement_only=False, mid_p=False):
+        """
+        Exact version of iterated_test(): the same unconditional (Barnard-style) test, but summed
+        over every baseline success count with no coverage interval or approximation, so no
+        allowance for error is added to the p-value. Best suited to small samples, where
+        iterated_test() already sums over all baseline counts but adds coverage_alpha to the
+        result.
+
+        Both binomial distributions are computed once as arrays of probability masses (in log space,
+        to avoid underflow), and the conditional tail probabilities are looked up in their
+        cumulative sums, so the cost is O(baseline trials + variation trials): a few milliseconds
+        for 1e5 trials. Whether a variation count is at least as extreme as the one observed is
+        decided in integer arithmetic, so ties are exact.
+
+        If mid_p=True, variation counts exactly as extreme as the one observed count only half,
+        giving the less conservative mid-p value.
+        """
+        return self._cached(self._exact_iterated_test, num_tests, improvement_only, mid_p)
+
+    def _exact_iterated_test(self, num_tests, improvement_only, mid_p):
+        baseline_num_trials = self.baseline.num_trials
+        variation_num_trials = self.variation.num_trials
+        # the observed difference in proportions, times both numbers of trials to keep it integral
+        observed_delta = (
+            self.variation.num_successes * baseline_num_trials
+            - self.baseline.num_successes * variation_num_trials
+        )
+        if observed_delta == 0 and not improvement_only:
+            return 1.0
+        threshold = observed_delta if improvement_only else abs(observed_delta)
+
+        pooled_proportion = (
+            (self.baseline.num_successes + self.variation.num_successes)
+            / float(baseline_num_trials + variation_num_trials)
+        )
+        baseline_masses = _binomial_masses(baseline_num_trials, pooled_proportion)
+        variation_masses = _binomial_masses(variation_num_trials, pooled_proportion)
+        # at_most[k + 1] = P(X <= k) and at_least[k] = P(X >= k) for a variation count X, over
+        # k = -1..variation_num_trials + 1; the upper tail is summed from the top for precision
+        at_most = numpy.concatenate(([0.0], numpy.cumsum(variation_masses), [1.0]))
+        at_least = numpy.concatenate((numpy.cumsum(variation_masses[::-1])[::-1], [0.0]))
+        padded_masses = numpy.concatenate(([0.0], variation_masses, [0.0]))
+
+        # variation count k is at least as extreme as observed, given baseline count b, when
+        # k * baseline_num_trials - b * variation_num_trials >= threshold (or <= -threshold)
+        scaled_baseline = (
+            numpy.arange(baseline_num_trials + 1, dtype=numpy.int64) * variation_num_trials
+        )
+        upper_numerator = scaled_baseline + threshold
+        upper_count = numpy.clip(
+            -(-upper_numerator // baseline_num_trials), 0, variation_num_trials + 1,
+        )
+        p_value_at_baseline = at_least[upper_count]
+        if mid_p:
+            upper_tie = upper_numerator % baseline_num_trials == 0
+            p_value_at_baseline -= numpy.where(upper_tie, padded_masses[upper_count + 1], 0) / 2
+        if not improvement_only:
+            lower_numerator = scaled_baseline - threshold
+            lower_count = numpy.clip(
+                lower_numerator // baseline_num_trials, -1, variation_num_trials,
+            )
+            p_value_at_baseline += at_most[lower_count + 1]
+            if mid_p:
+                lower_tie = lower_numerator % baseline_num_trials == 0
+                p_value_at_baseline -= (
+                    numpy.where(lower_tie, padded_masses[lower_count + 1], 0) / 2
+                )
+
+        adjusted_p_value = self._probability_union(
+            numpy.clip(p_value_at_baseline, 0, 1),
+            num_tests,
+        )
+        return min(1.0, float(numpy.dot(baseline_masses, adjusted_p_value)))
+
+    def fisher_exact_test(self, num_tests=1, improvement_only=False, mid_p=False):
+        """
+        Fisher's exact test of H0: p_baseline == p_variation, conditioning on the total number of
+        successes, against H1: p_baseline != p_variation (or H1: p_baseline < p_variation if
+        improvement_only=True). The two-tailed p-value sums the probabilities of all outcomes no
+        more likely than the one observed. The p-value is adjusted for num_tests independent
+        tests, as in iterated_test().
+
+        If mid_p=True, outcomes exactly as extreme as the one observed count only half.
+
+        This test is more conservative than iterated_test(), but needs only a single array of
+        hypergeometric probability masses, so it's fast for any sample size.
+        """
+        return self._cached(self._fisher_exact_test, num_tests, improvement_only, mid_p)
+
+    def _fisher_exact_test(self, num_tests, improvement_only, mid_p):
+        lowest_count, masses = _hypergeometric_masses(
+            self.baseline.num_trials + self.variation.num_trials,
+            self.baseline.num_successes + self.variation.num_successes,
+            self.variation.num_trials,
+        )
+        observed_index = self.variation.num_successes - lowest_count
+        observed_mass = masses[observed_index]
+        if improvement_only:
+            p_value = masses[observed_index:].sum()
+            tie_mass = observed_mass
+        else:
+            # allow for rounding error when comparing masses, as scipy.stats.fisher_exact does
+            as_extreme = masses <= observed_mass * (1 + 1e-7)
+            p_value = masses[as_extreme].sum()
+            tie_mass = masses[as_extreme & (masses >= observed_mass * (1 - 1e-7))].sum()
+        if mid_p:
+            p_value -= tie_mass / 2
+        return float(self._probability_union(min(1.0, p_value), num_tests))
+
+def _estimates(baseline, trial, z_critical_value):
+    comparison = ProportionComparison(baseline, trial)
+    return (
+        trial.mixed_estimate(z_critical_value),
+        comparison.difference_estimate(z_critical_value)
+            .value_with_interval(
+                z_critical_value,
+                estimated_value=comparison.difference_estimate(0).value,
+            ),
+        comparison.difference_ratio(z_critical_value)
+            .value_with_interval(
+                z_critical_value,
+                estimated_value=comparison.difference_ratio(0).value,
+            ),
+    )
 
 Results = collections.namedtuple(
     'Results',
@@ -269,6 +1108,16 @@ Results = collections.namedtuple(
 
 class Experiment(object):
     P_VALUE_PRECISION = 1e-5
+    # iterated_test() switches to its O(1) normal approximation when the estimated error is within
+    # this bound, or when the baseline has at least this many trials (None disables either switch).
+    # Off by default, since the error estimate is empirical.
+    NORMAL_APPROXIMATION_MAX_ERROR = None
+    NORMAL_APPROXIMATION_TRIALS = None
+    # when either is set, p-values are computed with anytime_iterated_test() within this many
+    # seconds, or distribution function evaluations, per get_results() call, and may be upper
+    # bounds short of P_VALUE_PRECISION (see get_p_value_details())
+    P_VALUE_TIME_BUDGET = None
+    P_VALUE_MAX_EVALUATIONS = None
 
     def __init__(self, num_trials, baseline_num_successes, baseline_num_trials,
                  confidence_level=0.95):
@@ -284,30 +1133,341 @@ class Experiment(object):
     def get_baseline_proportion(self):
         return self._baseline.mixed_estimate(self._z_critical_value)
 
-    def get_results(self, num_successes, num_trials):
-        trial = Proportion(num_successes, num_trials)
-        comparison = ProportionComparison(self._baseline, trial)
-        return Results(
-            num_successes=num_successes,
-            num_trials=num_trials,
-            proportion=trial.mixed_estimate(self._z_critical_value),
-            improvement=comparison.difference_estimate(self._z_critical_value)
-                .value_with_interval(
-                    self._z_critical_value,
-                    estimated_value=comparison.difference_estimate(0).value,
-                ),
-            relative_improvement=comparison.difference_ratio(self._z_critical_value)
-                .value_with_interval(
-                    self._z_critical_value,
-                    estimated_value=comparison.difference_ratio(0).value,
-                ),
-            two_tailed_p_value=comparison.iterated_test(
-                self.num_comparisons,
-                self.P_VALUE_PRECISION,
+    def get_results_batch(self, num_successes, num_trials):
+        """
+        Score many variations against the baseline at once. num_successes and num_trials are
+        equal-length arrays (or sequences); returns a Results whose fields are arrays with one entry
+        per variation. See get_results_batch() at module level. p-values are computed by
+        get_p_values(), so they're subject to the same budget as in get_results().
+        """
+        return _get_results_arrays(
+            self._baseline.num_successes,
+            self._baseline.num_trials,
+            num_successes,
+            num_trials,
+            self._z_critical_value,
+            self.num_comparisons,
+            lambda comparison, num_tests: self.get_p_values(
+                comparison.variation.num_successes,
+                comparison.variation.num_trials,
             ),
-            improvement_one_tailed_p_value=comparison.iterated_test(
+        )
+
+    def _iterated_test_options(self):
+        return dict(
+            coverage_alpha=self.P_VALUE_PRECISION,
+            normal_approximation_trials=self.NORMAL_APPROXIMATION_TRIALS,
+            max_normal_error=self.NORMAL_APPROXIMATION_MAX_ERROR,
+        )
+
+    def get_p_value_details(self, num_successes, num_trials):
+        """
+        Returns IteratedTestResults for the two-tailed and improvement-only p-values reported by
+        get_results(), including the method used to compute each and its estimated error, and
+        whether it reached P_VALUE_PRECISION within the budget, if one is set.
+        """
+        comparison = ProportionComparison(self._baseline, Proportion(num_successes, num_trials))
+        if self.P_VALUE_TIME_BUDGET is not None or self.P_VALUE_MAX_EVALUATIONS is not None:
+            deadline = None
+            if self.P_VALUE_TIME_BUDGET is not None:
+                deadline = timeit.default_timer() + self.P_VALUE_TIME_BUDGET
+            return tuple(comparison._anytime_iterated_tests(
                 self.num_comparisons,
                 self.P_VALUE_PRECISION,
+                (False, True),
+                deadline,
+                self.P_VALUE_MAX_EVALUATIONS,
+                self.NORMAL_APPROXIMATION_TRIALS,
+                self.NORMAL_APPROXIMATION_MAX_ERROR,
+            ))
+        return comparison.iterated_test_pair_details(
+            self.num_comparisons,
+            **self._iterated_test_options()
+        )
+
+    def get_p_values(self, num_successes, num_trials):
+        """
+        Returns the (two_tailed_p_value, improvement_one_tailed_p_value) pair reported by
+        get_results(). This is the costly part of get_results().
+        """
+        return tuple(
+            details.p_value for details in self.get_p_value_details(num_successes, num_trials)
+        )
+
+    def get_exact_p_values(self, num_successes, num_trials, mid_p=False):
+        """
+        Same as get_p_values(), but computed with ProportionComparison.exact_iterated_test(). Meant
+        for small samples.
+        """
+        comparison = ProportionComparison(self._baseline, Proportion(num_successes, num_trials))
+        return (
+            comparison.exact_iterated_test(self.num_comparisons, mid_p=mid_p),
+            comparison.exact_iterated_test(
+                self.num_comparisons,
                 improvement_only=True,
+                mid_p=mid_p,
             ),
         )
+
+    def get_estimates(self, num_successes, num_trials):
+        """
+        Returns the (proportion, improvement, relative_improvement) ValueWithIntervals reported by
+        get_results(). These take constant time to compute.
+        """
+        return _estimates(
+            self._baseline,
+            Proportion(num_successes, num_trials),
+            self._z_critical_value,
+        )
+
+    def get_results(self, num_successes, num_trials):
+        if instrumentation.observers:
+            return self._get_results_instrumented(num_successes, num_trials)
+        return Results(
+            num_successes,
+            num_trials,
+            *(
+                self.get_estimates(num_successes, num_trials)
+                + self.get_p_values(num_successes, num_trials)
+            )
+        )
+
+    def get_all_results(self, arms):
+        """
+        Score several variations, given as (num_successes, num_trials) pairs, and return a list of
+        Results. Each distinct pair of counts is only scored once. Nothing else is shared between
+        variations: the baseline coverage interval and its masses depend on the pooled proportion,
+        which differs from one variation to another.
+        """
+        arms = [(num_successes, num_trials) for num_successes, num_trials in arms]
+        results = {}
+        for arm in arms:
+            if arm not in results:
+                results[arm] = self.get_results(*arm)
+        return [results[arm] for arm in arms]
+
+    def _get_results_instrumented(self, num_successes, num_trials):
+        start_time = timeit.default_timer()
+        estimates = self.get_estimates(num_successes, num_trials)
+        p_value_start_time = timeit.default_timer()
+        p_values = self.get_p_values(num_successes, num_trials)
+        end_time = timeit.default_timer()
+        instrumentation.emit(instrumentation.GetResultsEvent(
+            seconds=end_time - start_time,
+            p_value_seconds=end_time - p_value_start_time,
+            num_comparisons=self.num_comparisons,
+            baseline_num_trials=self._baseline.num_trials,
+            num_trials=num_trials,
+        ))
+        return Results(num_successes, num_trials, *(estimates + p_values))
+
+def _get_results_arrays(baseline_num_successes, baseline_num_trials, num_successes, num_trials,
+                        z_critical_value, num_comparisons, p_values):
+    """
+    p_values(comparison, num_tests) returns the (two-tailed, improvement-only) p-values of one
+    ProportionComparison.
+    """
+    baseline_num_successes, baseline_num_trials, num_successes, num_trials, z_critical_value, \
+        num_comparisons = numpy.broadcast_arrays(
+            baseline_num_successes, baseline_num_trials, num_successes, num_trials,
+            z_critical_value, num_comparisons,
+        )
+
+    baseline_center, baseline_error = _agresti_coull_arrays(
+        baseline_num_successes, baseline_num_trials, z_critical_value,
+    )
+    variation_center, variation_error = _agresti_coull_arrays(
+        num_successes, num_trials, z_critical_value,
+    )
+    baseline_mle = baseline_num_successes / baseline_num_trials.astype(float)
+    variation_mle = num_successes / num_trials.astype(float)
+
+    difference = variation_center - baseline_center
+    difference_error = numpy.sqrt(baseline_error**2 + variation_error**2)
+    ratio = difference / baseline_center
+    ratio_error = difference_error / baseline_center
+
+    def with_interval(value, center, error):
+        width = z_critical_value * error
+        return ValueWithInterval(
+            value=value,
+            lower_bound=center - width,
+            upper_bound=center + width,
+        )
+
+    # the p-values depend on a coverage interval specific to each row, so they're computed one
+    # comparison at a time (each one vectorized internally)
+    two_tailed_p_value = numpy.empty(num_trials.shape)
+    improvement_one_tailed_p_value = numpy.empty(num_trials.shape)
+    for index in numpy.ndindex(*num_trials.shape):
+        comparison = ProportionComparison(
+            Proportion(int(baseline_num_successes[index]), int(baseline_num_trials[index])),
+            Proportion(int(num_successes[index]), int(num_trials[index])),
+        )
+        two_tailed_p_value[index], improvement_one_tailed_p_value[index] = p_values(
+            comparison,
+            max(1, int(num_comparisons[index])),
+        )
+
+    return Results(
+        num_successes=num_successes,
+        num_trials=num_trials,
+        proportion=with_interval(variation_mle, variation_center, variation_error),
+        improvement=with_interval(variation_mle - baseline_mle, difference, difference_error),
+        relative_improvement=with_interval(
+            (variation_mle - baseline_mle) / baseline_mle,
+            ratio,
+            ratio_error,
+        ),
+        two_tailed_p_value=two_tailed_p_value,
+        improvement_one_tailed_p_value=improvement_one_tailed_p_value,
+    )
+
+def get_results_batch(baseline_num_successes, baseline_num_trials, num_successes, num_trials,
+                      num_comparisons, confidence_level=0.95,
+                      p_value_precision=Experiment.P_VALUE_PRECISION):
+    """
+    Columnar version of Experiment.get_results() for many experiments at once. Each argument may be
+    an array with one entry per (experiment, variation) pair, or a scalar shared by all of them.
+    num_comparisons is the number of variations in each row's experiment, used for multiple test
+    correction exactly as Experiment does.
+
+    Returns a Results whose fields are arrays, and whose ValueWithInterval fields hold arrays.
+    Confidence intervals, differences and ratios are computed with array operations; p-values are
+    computed per row.
+    """
+    num_comparisons = numpy.maximum(1, num_comparisons)
+    z_critical_value = get_z_critical_value((1 - numpy.asarray(confidence_level)) / num_comparisons)
+
+    def p_values(comparison, num_tests):
+        return tuple(
+            details.p_value
+            for details in comparison.iterated_test_pair_details(
+                num_tests,
+                coverage_alpha=p_value_precision,
+                normal_approximation_trials=Experiment.NORMAL_APPROXIMATION_TRIALS,
+                max_normal_error=Experiment.NORMAL_APPROXIMATION_MAX_ERROR,
+            )
+        )
+
+    return _get_results_arrays(
+        baseline_num_successes,
+        baseline_num_trials,
+        num_successes,
+        num_trials,
+        z_critical_value,
+        num_comparisons,
+        p_values,
+    )
+
+class ResultsTable(object):
+    """
+    Many Results stored compactly, in one contiguous float array per field, for keeping results for
+    large numbers of arms in memory. Rows are read back as ordinary Results, built on demand; whole
+    fields are available as arrays with column().
+
+        >>> table = ResultsTable.from_batch(experiment.get_results_batch(successes, trials))
+        >>> table[0].relative_improvement.lower_bound
+        >>> table.column('two_tailed_p_value')
+
+    Counts are stored as floats, so they're exact up to 2**53.
+    """
+    COLUMNS = (
+        'num_successes',
+        'num_trials',
+        'proportion',
+        'proportion_lower_bound',
+        'proportion_upper_bound',
+        'improvement',
+        'improvement_lower_bound',
+        'improvement_upper_bound',
+        'relative_improvement',
+        'relative_improvement_lower_bound',
+        'relative_improvement_upper_bound',
+        'two_tailed_p_value',
+        'improvement_one_tailed_p_value',
+    )
+    _COLUMN_INDEXES = dict((name, index) for index, name in enumerate(COLUMNS))
+
+    __slots__ = ('_data', '_size')
+
+    def __init__(self, capacity=0):
+        # one row per column, so each column is contiguous
+        self._data = numpy.empty((len(self.COLUMNS), capacity))
+        self._size = 0
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Build a table from an iterable of Results.
+        """
+        table = cls()
+        table.extend(results)
+        return table
+
+    @classmethod
+    def from_batch(cls, results):
+        """
+        Build a table from a Results of arrays, as returned by get_results_batch().
+        """
+        columns = [numpy.ravel(results.num_successes), numpy.ravel(results.num_trials)]
+        for value_with_interval in results[2:5]:
+            columns.extend(numpy.ravel(value) for value in value_with_interval)
+        columns.append(numpy.ravel(results.two_tailed_p_value))
+        columns.append(numpy.ravel(results.improvement_one_tailed_p_value))
+        table = cls()
+        table._data = numpy.array(numpy.broadcast_arrays(*columns), dtype=float)
+        table._size = table._data.shape[1]
+        return table
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size):
+        if size > self._data.shape[1]:
+            data = numpy.empty((len(self.COLUMNS), max(size, 2 * self._data.shape[1])))
+            data[:, :self._size] = self._data[:, :self._size]
+            self._data = data
+
+    def append(self, results):
+        self._reserve(self._size + 1)
+        self._data[:, self._size] = (
+            (results.num_successes, results.num_trials)
+            + tuple(results.proportion)
+            + tuple(results.improvement)
+            + tuple(results.relative_improvement)
+            + (results.two_tailed_p_value, results.improvement_one_tailed_p_value)
+        )
+        self._size += 1
+
+    def extend(self, results):
+        for row in results:
+            self.append(row)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('ResultsTable index out of range')
+        row = self._data[:, index].tolist()
+        return Results(
+            num_successes=int(row[0]),
+            num_trials=int(row[1]),
+            proportion=ValueWithInterval(*row[2:5]),
+            improvement=ValueWithInterval(*row[5:8]),
+            relative_improvement=ValueWithInterval(*row[8:11]),
+            two_tailed_p_value=row[11],
+            improvement_one_tailed_p_value=row[12],
+        )
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield self[index]
+
+    def column(self, name):
+        """
+        Returns a read-only view of a column by name, see COLUMNS.
+        """
+        view = self._data[self._COLUMN_INDEXES[name], :self._size]
+        view.flags.writeable = False
+        return view
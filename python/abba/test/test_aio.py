@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+import unittest
+
+import abba.aio
+import abba.parallel
+import abba.stats
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    Records the most calls running at once.
+    """
+    def __init__(self, max_workers):
+        concurrent.futures.ThreadPoolExecutor.__init__(self, max_workers=max_workers)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.num_calls = 0
+
+    def submit(self, function, *arguments, **keyword_arguments):
+        def counted():
+            with self._lock:
+                self.running += 1
+                self.num_calls += 1
+                self.max_running = max(self.max_running, self.running)
+            try:
+                # long enough for the other requests to pile up
+                time.sleep(0.01)
+                return function(*arguments, **keyword_arguments)
+            finally:
+                with self._lock:
+                    self.running -= 1
+        return concurrent.futures.ThreadPoolExecutor.submit(self, counted)
+
+class AioTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.executor = CountingExecutor(max_workers=8)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.loop.close()
+
+    def gather(self, coroutines):
+        async def gather():
+            return await asyncio.gather(*coroutines)
+        return self.loop.run_until_complete(gather())
+
+    def experiment(self, max_concurrency=None):
+        scorer = abba.aio.Scorer(self.executor, max_concurrency=max_concurrency)
+        return abba.aio.Experiment(3, 20, 1000, scorer=scorer)
+
+    def test_get_results(self):
+        experiment = self.experiment()
+        results = self.loop.run_until_complete(experiment.get_results(50, 2000))
+        self.assertEqual(abba.stats.Experiment(3, 20, 1000).get_results(50, 2000), results)
+        all_results = self.loop.run_until_complete(
+            experiment.get_all_results([(50, 2000), (70, 2000)])
+        )
+        self.assertEqual(
+            abba.stats.Experiment(3, 20, 1000).get_all_results([(50, 2000), (70, 2000)]),
+            all_results,
+        )
+
+    def test_coalescing(self):
+        experiment = self.experiment()
+        results = self.gather(
+            [experiment.get_results(50, 2000) for _ in range(10)]
+            + [experiment.get_results(70, 2000) for _ in range(5)]
+        )
+        self.assertEqual(2, self.executor.num_calls)
+        self.assertEqual(2, experiment.scorer.num_computed)
+        self.assertEqual(13, experiment.scorer.num_coalesced)
+        self.assertEqual(1, len(set(results[:10])))
+        # finished requests aren't kept
+        self.loop.run_until_complete(experiment.get_results(50, 2000))
+        self.assertEqual(3, self.executor.num_calls)
+
+    def test_default_scorer(self):
+        # one Experiment per request, as in a web app
+        async def get_results():
+            experiment = abba.aio.Experiment(3, 20, 1000)
+            return experiment.scorer, await experiment.get_results(50, 2000)
+
+        outputs = self.gather([get_results(), get_results()])
+        scorer = outputs[0][0]
+        self.assertTrue(scorer is outputs[1][0])
+        self.assertEqual(outputs[0][1], outputs[1][1])
+        self.assertEqual((1, 1), (scorer.num_computed, scorer.num_coalesced))
+
+        # another event loop gets its own
+        other_loop = asyncio.new_event_loop()
+        try:
+            other_scorer = other_loop.run_until_complete(get_results())[0]
+        finally:
+            other_loop.close()
+        self.assertFalse(other_scorer is scorer)
+
+    def test_max_concurrency(self):
+        experiment = self.experiment(max_concurrency=2)
+        results = self.gather([
+            experiment.get_results(num_successes, 2000) for num_successes in range(40, 60)
+        ])
+        self.assertEqual(20, len(results))
+        self.assertEqual(20, self.executor.num_calls)
+        self.assertEqual(2, self.executor.max_running)
+
+    def test_cancellation(self):
+        experiment = self.experiment()
+
+        async def cancel_one():
+            cancelled = asyncio.ensure_future(experiment.get_results(50, 2000))
+            kept = asyncio.ensure_future(experiment.get_results(50, 2000))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            return await kept
+
+        results = self.loop.run_until_complete(cancel_one())
+        self.assertEqual(50, results.num_successes)
+        self.assertEqual(1, self.executor.num_calls)
+
+    def test_process_pool(self):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            scorer = abba.aio.Scorer(executor)
+            results = self.loop.run_until_complete(
+                scorer.score_experiment((20, 1000), [(50, 2000), (70, 2000)])
+            )
+        self.assertEqual(
+            abba.parallel.score_experiment((20, 1000), [(50, 2000), (70, 2000)]),
+            results,
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import numpy
+
+import abba.backends
+import abba.stats
+
+try:
+    import scipy
+except ImportError:
+    scipy = None
+
+class NumpyBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = abba.backends.NumpyBackend()
+
+    def test_normal(self):
+        self.assertAlmostEqual(1.959963984540054, self.backend.norm_ppf(0.975), places=12)
+        self.assertAlmostEqual(-4.753424308822899, self.backend.norm_ppf(1e-6), places=12)
+        self.assertAlmostEqual(0.025, self.backend.norm_sf(1.959963984540054), places=12)
+        self.assertAlmostEqual(0.975, self.backend.norm_cdf(1.959963984540054), places=12)
+        values = self.backend.norm_ppf(numpy.array([0.5, 0.975]))
+        self.assertEqual((2,), values.shape)
+        self.assertAlmostEqual(0, values[0])
+
+    def test_binomial(self):
+        binomial = self.backend.binomial(10, 0.3)
+        self.assertAlmostEqual(0.266827932, binomial.pmf(3), places=9)
+        self.assertAlmostEqual(0.6496107184, binomial.cdf(3), places=9)
+        self.assertAlmostEqual(0.3503892816, binomial.sf(3), places=9)
+        self.assertEqual(0, binomial.pmf(2.5))
+        self.assertEqual([0, 1], list(binomial.cdf([-1, 10])))
+        self.assertEqual(3, binomial.ppf(0.6))
+        self.assertEqual(3, binomial.isf(0.4))
+
+    @unittest.skipIf(scipy is None, 'SciPy is not installed')
+    def test_matches_scipy(self):
+        scipy_backend = abba.backends.ScipyBackend()
+        for num_trials, probability in ((1000, 0.02), (10**6, 0.05), (10**9, 1e-7)):
+            expected = scipy_backend.binomial(num_trials, probability)
+            actual = self.backend.binomial(num_trials, probability)
+            expectation = num_trials * probability
+            counts = numpy.arange(expectation * 0.8, expectation * 1.2)
+            self.assertTrue(numpy.allclose(expected.cdf(counts), actual.cdf(counts), atol=1e-12))
+            self.assertTrue(numpy.allclose(expected.pmf(counts), actual.pmf(counts), atol=1e-15))
+            for q in (1e-5, 0.3):
+                self.assertEqual(expected.ppf(q), actual.ppf(q))
+                self.assertEqual(expected.isf(q), actual.isf(q))
+
+class NumpyBackendStatsTest(unittest.TestCase):
+    def setUp(self):
+        abba.backends.set_backend('numpy')
+
+    def tearDown(self):
+        abba.backends.set_backend(None)
+
+    def test_experiment(self):
+        experiment = abba.stats.Experiment(
+            num_trials=3,
+            baseline_num_successes=20,
+            baseline_num_trials=1000,
+        )
+        results = experiment.get_results(50, 2000)
+        self.assertAlmostEqual(-0.011, results.improvement.lower_bound, places=3)
+        self.assertAlmostEqual(0.691, results.two_tailed_p_value, places=3)
+        self.assertAlmostEqual(0.362, results.improvement_one_tailed_p_value, places=3)
+
+    def test_z_test(self):
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(20, 1000),
+            abba.stats.Proportion(60, 2000),
+        )
+        self.assertAlmostEqual(0.055, comparison.z_test(), places=3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import math
+import unittest
+
+import abba.bayes
+import abba.stats
+
+def exact_probability_to_beat(baseline_posterior, variation_posterior):
+    """
+    Closed form of P(variation > baseline) for an integer variation alpha.
+    """
+    def log_beta(a, b):
+        return math.lgamma(a) + math.lgamma(b) - math.lgamma(a + b)
+    baseline_alpha, baseline_beta = baseline_posterior
+    variation_alpha, variation_beta = variation_posterior
+    return sum(
+        math.exp(
+            log_beta(baseline_alpha + i, baseline_beta + variation_beta)
+            - math.log(variation_beta + i)
+            - log_beta(1 + i, variation_beta)
+            - log_beta(baseline_alpha, baseline_beta)
+        )
+        for i in range(variation_alpha)
+    )
+
+class BayesTest(unittest.TestCase):
+    def test_beta_posterior(self):
+        self.assertEqual((51, 151), abba.bayes.beta_posterior(50, 200))
+        self.assertEqual((50.5, 150.5), abba.bayes.beta_posterior(50, 200, prior=(0.5, 0.5)))
+
+    def test_compare_posteriors(self):
+        all_counts = ((50, 200, 70, 190), (0, 10, 1, 10), (3, 5, 2, 5), (1000, 100000, 1100, 100000))
+        for counts in all_counts:
+            baseline_posterior = abba.bayes.beta_posterior(*counts[:2])
+            variation_posterior = abba.bayes.beta_posterior(*counts[2:])
+            probability, _ = abba.bayes.compare_posteriors(baseline_posterior, variation_posterior)
+            self.assertAlmostEqual(
+                exact_probability_to_beat(baseline_posterior, variation_posterior),
+                probability,
+                places=6,
+            )
+        # checked by Monte Carlo
+        _, expected_loss = abba.bayes.compare_posteriors((4, 3), (3, 4))
+        self.assertAlmostEqual(0.188, expected_loss, places=3)
+        # far enough apart that the loss is the difference in means
+        probability, expected_loss = abba.bayes.compare_posteriors((101, 1), (1, 101))
+        self.assertAlmostEqual(0, probability, places=12)
+        self.assertAlmostEqual(100 / 102.0, expected_loss, places=6)
+
+    def test_singular_posteriors(self):
+        # Jeffreys prior and no successes (or no failures) give a density infinite at 0 (or 1);
+        # checked by numerical integration with scipy
+        probability, _ = abba.bayes.compare_posteriors((0.5, 10.5), (3.5, 7.5))
+        self.assertAlmostEqual(0.9762505, probability, places=6)
+
+        experiment = abba.bayes.BayesianExperiment(
+            num_trials=2,
+            baseline_num_successes=3,
+            baseline_num_trials=20,
+            prior=(0.5, 0.5),
+        )
+        results = experiment.get_results(0, 20)
+        self.assertAlmostEqual(0.028405, results.probability_to_beat_baseline, places=6)
+        self.assertAlmostEqual(0.143902, results.expected_loss, places=6)
+        # the same comparison of failure rates, with no failures in the baseline
+        self.assertEqual(
+            (results.probability_to_beat_baseline, results.expected_loss),
+            abba.bayes.compare_posteriors((20.5, 0.5), (17.5, 3.5)),
+        )
+
+    def test_probability_to_be_best(self):
+        probabilities = abba.bayes.probability_to_be_best(
+            [(51, 151), (71, 121), (71, 121)],
+            num_draws=100000,
+            seed=1,
+            memory_budget=100000,
+        )
+        self.assertAlmostEqual(1, sum(probabilities))
+        self.assertTrue(probabilities[0] < 0.01)
+        self.assertAlmostEqual(probabilities[1], probabilities[2], places=2)
+
+    def test_experiment(self):
+        experiment = abba.bayes.BayesianExperiment(
+            num_trials=2,
+            baseline_num_successes=50,
+            baseline_num_trials=200,
+        )
+        results = experiment.get_results(70, 190)
+        expected = abba.stats.Experiment(2, 50, 200).get_results(70, 190)
+        self.assertEqual(expected.relative_improvement, results.relative_improvement)
+        self.assertAlmostEqual(0.994264, results.probability_to_beat_baseline, places=5)
+        self.assertTrue(results.expected_loss < 1e-3)
+        self.assertEqual(None, results.probability_to_be_best)
+
+        all_results = experiment.get_all_results([(70, 190), (40, 210)], seed=1)
+        self.assertEqual(results[:-1], all_results[0][:-1])
+        self.assertTrue(all_results[0].probability_to_be_best > 0.99)
+        self.assertTrue(all_results[1].probability_to_beat_baseline < 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
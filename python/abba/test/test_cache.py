@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import abba.cache
+import abba.stats
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+class ResultCacheTest(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = abba.cache.ResultCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+        self.assertEqual(None, cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+        info = cache.info()
+        self.assertEqual((2, 1, 1), (info.hits, info.misses, info.evictions))
+        self.assertEqual(2, info.size)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = abba.cache.ResultCache(ttl=10, clock=clock)
+        cache.set('a', 1)
+        clock.now = 9
+        self.assertEqual(1, cache.get('a'))
+        clock.now = 10
+        self.assertEqual(None, cache.get('a'))
+        self.assertEqual(1, cache.info().expirations)
+        self.assertEqual(0, len(cache))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'cache.pickle')
+            cache = abba.cache.ResultCache()
+            cache.set(('key', 1), 0.5)
+            cache.save(path)
+            other_cache = abba.cache.ResultCache()
+            self.assertEqual(1, other_cache.load(path))
+            self.assertEqual(0.5, other_cache.get(('key', 1)))
+        finally:
+            shutil.rmtree(directory)
+
+class StatsCacheTest(unittest.TestCase):
+    def tearDown(self):
+        abba.stats.disable_cache()
+
+    def test_iterated_test_cache(self):
+        cache = abba.stats.enable_cache(maxsize=10)
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(20, 1000),
+            abba.stats.Proportion(60, 2000),
+        )
+        p_value = comparison.iterated_test(2, 1e-7)
+        self.assertEqual(p_value, comparison.iterated_test(2, 1e-7))
+        self.assertNotEqual(p_value, comparison.iterated_test(2, 1e-7, improvement_only=True))
+        comparison.z_test()
+        info = cache.info()
+        self.assertEqual((1, 3), (info.hits, info.misses))
+
+if __name__ == '__main__':
+    unittest.main()
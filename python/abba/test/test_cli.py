@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import abba.cli
+import abba.report
+
+COUNTS_CSV = '''experiment,label,num_successes,num_trials
+signup,baseline,20,1000
+signup,red,50,2000
+checkout,baseline,5,100
+signup,blue,70,2000
+checkout,green,9,100
+'''
+
+EVENTS_JSONL = '''{"experiment": 1, "label": "baseline", "num_successes": true}
+{"experiment": 1, "label": "test", "num_successes": 0}
+{"experiment": 1, "label": "baseline", "num_successes": "false"}
+
+{"experiment": 1, "label": "test", "num_successes": 1}
+{"experiment": 1, "label": "test", "num_successes": "Yes"}
+'''
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as output_file:
+            output_file.write(text)
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name)) as input_file:
+            return input_file.read()
+
+    def test_aggregate(self):
+        # the rows twice
+        text = COUNTS_CSV + COUNTS_CSV.split('\n', 1)[1]
+        experiments = abba.cli.aggregate_file(self.write('counts.csv', text))
+        self.assertEqual(['signup', 'checkout'], list(experiments))
+        self.assertEqual(['baseline', 'red', 'blue'], list(experiments['signup']))
+        self.assertEqual([40, 2000], experiments['signup']['baseline'])
+        self.assertEqual([18, 200], experiments['checkout']['green'])
+        self.assertEqual(
+            experiments,
+            abba.cli.aggregate_stream(io.BytesIO(text.encode('utf-8'))),
+        )
+
+        experiments = abba.cli.aggregate_file(self.write('events.jsonl', EVENTS_JSONL), 'jsonl')
+        self.assertEqual({1: {'baseline': [1, 2], 'test': [2, 3]}}, experiments)
+
+    def test_event_columns(self):
+        path = self.write('events.csv', 'Arm,Converted\nA,1\nB,0\nA,0\nB,true\n')
+        columns = abba.cli.Columns('experiment', 'Arm', 'Converted', 'num_trials')
+        experiments = abba.cli.aggregate_file(path, columns=columns)
+        self.assertEqual({None: {'A': [1, 2], 'B': [1, 2]}}, experiments)
+
+    def test_invalid_rows(self):
+        for text in ('label,num_successes\nA,maybe\n', 'label,num_trials\nA,3\n',
+                     'label,num_successes,num_trials\nA,1\n'):
+            with self.assertRaises(ValueError):
+                abba.cli.aggregate_file(self.write('invalid.csv', text))
+        with self.assertRaises(ValueError):
+            abba.cli.aggregate_file(self.write('invalid.jsonl', '{"label": "A"}\n'), 'jsonl')
+
+    def test_line_ranges(self):
+        lines = ['experiment,label,num_successes,num_trials\n'] + [
+            '%d,%s,%d,100\n' % (index % 7, 'baseline' if index % 3 else 'test', index % 11)
+            for index in range(1000)
+        ]
+        path = self.write('counts.csv', ''.join(lines))
+        expected = abba.cli.aggregate_file(path)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            for num_ranges in (2, 7, 5000):
+                self.assertEqual(
+                    expected,
+                    abba.cli.aggregate_file(path, executor=executor, num_ranges=num_ranges),
+                )
+        # lines spanning blocks
+        block_size = abba.cli._BLOCK_SIZE
+        try:
+            for abba.cli._BLOCK_SIZE in (10, 100):
+                self.assertEqual(expected, abba.cli.aggregate_file(path))
+        finally:
+            abba.cli._BLOCK_SIZE = block_size
+
+    def test_main_jsonl(self):
+        path = self.write('counts.csv', COUNTS_CSV + 'single,baseline,1,10\n')
+        output_path = os.path.join(self.directory, 'output.jsonl')
+        self.assertEqual(1, abba.cli.main([path, '-o', output_path, '-j', '1']))
+        outputs = [json.loads(line) for line in self.read('output.jsonl').splitlines()]
+        self.assertEqual(['signup', 'checkout', 'single'], [
+            output['experiment'] for output in outputs
+        ])
+        groups = collections.OrderedDict((
+            ('baseline', (20, 1000)),
+            ('red', (50, 2000)),
+            ('blue', (70, 2000)),
+        ))
+        expected = abba.report.group_results_to_dict(groups, abba.report.score_groups(groups))
+        self.assertEqual(expected['variations'], outputs[0]['variations'])
+        self.assertEqual(expected['baseline'], outputs[0]['baseline'])
+        self.assertTrue('error' in outputs[2])
+
+    def test_main_csv(self):
+        path = self.write('counts.csv', COUNTS_CSV)
+        output_path = os.path.join(self.directory, 'output.csv')
+        self.assertEqual(
+            0,
+            abba.cli.main([path, '-o', output_path, '--output_format', 'csv', '-j', '1']),
+        )
+        rows = list(csv.DictReader(io.StringIO(self.read('output.csv'))))
+        self.assertEqual(list(abba.cli.CSV_FIELDS), list(rows[0]))
+        self.assertEqual(
+            [('signup', 'red'), ('signup', 'blue'), ('checkout', 'green')],
+            [(row['experiment'], row['label']) for row in rows],
+        )
+        expected = abba.report.score_groups({'baseline': (5, 100), 'green': (9, 100)})
+        self.assertAlmostEqual(
+            expected.results['green'].two_tailed_p_value,
+            float(rows[2]['two_tailed_p_value']),
+        )
+        self.assertEqual('100', rows[2]['baseline_num_trials'])
+
+    def test_invalid_confidence_level(self):
+        path = self.write('counts.csv', COUNTS_CSV)
+        for confidence_level in ('0', '1', '1.5', '-0.5', 'nan'):
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                with self.assertRaises(SystemExit) as context:
+                    abba.cli.main([path, '--confidence_level', confidence_level])
+            self.assertEqual(2, context.exception.code)
+            self.assertTrue('--confidence_level' in stderr.getvalue())
+        args = abba.cli.parse_arguments([path, '--confidence_level', '0.9'])
+        self.assertEqual(0.9, args.confidence_level)
+
+    def test_parallel_scoring(self):
+        experiments = collections.OrderedDict(
+            (index, collections.OrderedDict((
+                ('baseline', [20 + index, 1000]),
+                ('test', [30, 1000]),
+            )))
+            for index in range(10)
+        )
+        experiments['invalid'] = collections.OrderedDict((('baseline', [5, 2]), ('test', [1, 2])))
+        expected = list(abba.cli.score_aggregates(experiments))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            actual = list(abba.cli.score_aggregates(experiments, executor=executor))
+        self.assertEqual(expected, actual)
+        self.assertEqual(None, expected[-1][2])
+        self.assertTrue(expected[-1][3].startswith('Invalid counts'))
+
+if __name__ == '__main__':
+    unittest.main()
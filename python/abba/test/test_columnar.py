@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import numpy
+
+import abba.columnar
+import abba.stats
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+COLUMNS = {
+    'experiment': numpy.array(['signup', 'checkout', 'signup', 'signup', 'checkout', 'solo']),
+    'label': numpy.array(['red', 'control', 'baseline', 'blue', 'green', 'control']),
+    'num_successes': numpy.array([50, 5, 20, 70, 9, 3]),
+    'num_trials': numpy.array([2000, 100, 1000, 2000, 100, 50]),
+}
+
+class ColumnarTest(unittest.TestCase):
+    def test_group_experiments(self):
+        groups = abba.columnar.group_experiments(COLUMNS['experiment'], COLUMNS['label'])
+        # experiments in sorted order; checkout has no arm labeled baseline, so its first row is
+        # the baseline
+        self.assertEqual([4, 0, 3], list(groups.variation_rows))
+        self.assertEqual([1, 2, 2], list(groups.baseline_rows))
+        self.assertEqual([1, 2, 2], list(groups.num_comparisons))
+
+    def test_score_columns(self):
+        results = abba.columnar.score_columns(COLUMNS)
+        self.assertEqual(['checkout', 'signup', 'signup'], list(results['experiment']))
+        self.assertEqual(['green', 'red', 'blue'], list(results['label']))
+        self.assertEqual(['control', 'baseline', 'baseline'], list(results['baseline_label']))
+
+        experiment = abba.stats.Experiment(2, 20, 1000)
+        for row, num_successes in ((1, 50), (2, 70)):
+            expected = experiment.get_results(num_successes, 2000)
+            self.assertAlmostEqual(expected.two_tailed_p_value, results['two_tailed_p_value'][row])
+            self.assertAlmostEqual(
+                expected.improvement_one_tailed_p_value,
+                results['improvement_one_tailed_p_value'][row],
+            )
+            self.assertAlmostEqual(
+                expected.relative_improvement.lower_bound,
+                results['relative_improvement_lower_bound'][row],
+            )
+        expected = abba.stats.Experiment(1, 5, 100).get_results(9, 100)
+        self.assertAlmostEqual(expected.two_tailed_p_value, results['two_tailed_p_value'][0])
+        self.assertAlmostEqual(
+            expected.proportion.upper_bound,
+            results['proportion_upper_bound'][0],
+        )
+
+    def test_baseline_label(self):
+        results = abba.columnar.score_columns(COLUMNS, baseline_label='control')
+        self.assertEqual(['green', 'baseline', 'blue'], list(results['label']))
+        self.assertEqual(['control', 'red', 'red'], list(results['baseline_label']))
+
+    def test_empty(self):
+        results = abba.columnar.score_columns(
+            dict((name, column[:0]) for name, column in COLUMNS.items())
+        )
+        self.assertEqual(0, len(results['two_tailed_p_value']))
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_dataframe(self):
+        frame = pandas.DataFrame(COLUMNS).rename(columns={'experiment': 'test'})
+        results = abba.columnar.score_columns(frame, experiment='test')
+        self.assertIsInstance(results, pandas.DataFrame)
+        self.assertEqual(['green', 'red', 'blue'], list(results['label']))
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_arrow_table(self):
+        results = abba.columnar.score_columns(pyarrow.table(COLUMNS))
+        self.assertIsInstance(results, pyarrow.Table)
+        self.assertEqual(['green', 'red', 'blue'], results.column('label').to_pylist())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import abba.instrumentation
+import abba.stats
+
+class InstrumentationTest(unittest.TestCase):
+    def test_events(self):
+        events = []
+        experiment = abba.stats.Experiment(3, 20, 1000)
+        with abba.instrumentation.observe(events.append):
+            experiment.get_results(50, 2000)
+        experiment.get_results(50, 2000)
+
+        self.assertEqual(
+            ['IteratedTestEvent', 'IteratedTestEvent', 'GetResultsEvent'],
+            [type(event).__name__ for event in events],
+        )
+        two_tailed, improvement, results = events
+        self.assertEqual('coverage', two_tailed.method)
+        self.assertEqual(42, two_tailed.interval_size)
+        self.assertEqual(3 * 42, two_tailed.num_evaluations)
+        self.assertEqual(3, two_tailed.num_tests)
+        self.assertTrue(improvement.improvement_only)
+        self.assertEqual(3, results.num_comparisons)
+        self.assertTrue(0 < results.p_value_seconds <= results.seconds)
+
+    def test_cached_events(self):
+        abba.stats.enable_cache(maxsize=10)
+        try:
+            experiment = abba.stats.Experiment(3, 20, 1000)
+            experiment.get_results(50, 2000)
+            events = []
+            with abba.instrumentation.observe(events.append):
+                # both tails come from the cache
+                experiment.get_results(50, 2000)
+        finally:
+            abba.stats.disable_cache()
+        self.assertEqual(
+            ['IteratedTestEvent', 'IteratedTestEvent', 'GetResultsEvent'],
+            [type(event).__name__ for event in events],
+        )
+        self.assertEqual('coverage', events[0].method)
+
+    def test_histogram_collector(self):
+        collector = abba.instrumentation.HistogramCollector()
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(5000000, 100000000),
+            abba.stats.Proportion(5012345, 100000007),
+        )
+        with abba.instrumentation.observe(collector):
+            comparison.iterated_test(2, 1e-5)
+            comparison.iterated_test(2, 1e-5, normal_approximation_trials=1)
+        summary = collector.summary()['IteratedTestEvent']
+        self.assertEqual(1, summary['coverage']['seconds']['count'])
+        self.assertEqual(1, summary['normal']['interval_size']['count'])
+        self.assertEqual(0, summary['normal']['interval_size']['max'])
+        self.assertTrue(summary['coverage']['interval_size']['p50'] > 1000)
+
+class HistogramTest(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = abba.instrumentation.Histogram()
+        for value in range(1, 101):
+            histogram.add(value)
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(50.5, histogram.summary()['mean'])
+        self.assertTrue(50 <= histogram.percentile(50) <= 50 * 2 ** 0.25)
+        self.assertEqual(100, histogram.percentile(100))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import abba.live
+import abba.stats
+
+class LiveExperimentTest(unittest.TestCase):
+    def setUp(self):
+        self.live = abba.live.LiveExperiment()
+        self.live.add('baseline', 20, 1000)
+        for label in ('a', 'b', 'c'):
+            self.live.add_trials(label, 2000)
+        self.live.add_successes('a', 50)
+        self.live.add_successes('b', 70)
+        self.live.add_successes('c', 20)
+
+    def test_matches_experiment(self):
+        experiment = abba.stats.Experiment(3, 20, 1000)
+        self.assertEqual(['a', 'b', 'c'], self.live.variation_labels)
+        for label, results in self.live.get_all_results().items():
+            self.assertEqual(experiment.get_results(*self.live.get_counts(label)), results)
+
+    def test_lazy_p_values(self):
+        results = self.live.get_results('a')
+        self.live.add('a', 1, 2)
+        updated_results = self.live.get_results('a')
+        self.assertNotEqual(results.two_tailed_p_value, updated_results.two_tailed_p_value)
+
+        live = abba.live.LiveExperiment(recompute_threshold=0.05)
+        live.add('baseline', 20, 1000)
+        live.add('a', 50, 2000)
+        results = live.get_results('a')
+        live.add('a', 1, 2)
+        updated_results = live.get_results('a')
+        self.assertEqual(51, updated_results.num_successes)
+        self.assertNotEqual(results.proportion, updated_results.proportion)
+        self.assertEqual(results.two_tailed_p_value, updated_results.two_tailed_p_value)
+        live.add('a', 0, 200)
+        updated_results = live.get_results('a')
+        self.assertNotEqual(results.two_tailed_p_value, updated_results.two_tailed_p_value)
+
+    def test_new_arm_changes_comparisons(self):
+        results = self.live.get_results('a')
+        self.live.add('d', 30, 2000)
+        self.assertTrue(self.live.get_results('a').two_tailed_p_value > results.two_tailed_p_value)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import abba.parallel
+
+SPECS = [
+    ((20, 1000), [(50, 2000), (70, 2000), (20, 2000)]),
+    ((10, 100), [(20, 200)], 0.99),
+    ((500, 20000), [(560, 21000)]),
+]
+
+class ParallelTest(unittest.TestCase):
+    def setUp(self):
+        self.expected = [abba.parallel.score_experiment(*spec) for spec in SPECS]
+
+    def test_ordered(self):
+        results = list(abba.parallel.imap_experiments(iter(SPECS), max_workers=2, chunksize=1))
+        self.assertEqual(self.expected, results)
+
+    def test_unordered(self):
+        results = dict(
+            abba.parallel.imap_experiments_unordered(SPECS, max_workers=2, chunksize=2)
+        )
+        self.assertEqual(self.expected, [results[index] for index in range(len(SPECS))])
+
+if __name__ == '__main__':
+    unittest.main()
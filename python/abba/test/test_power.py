@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import numpy
+
+import abba.power
+import abba.stats
+
+class PowerTest(unittest.TestCase):
+    def test_corrected_alpha(self):
+        self.assertAlmostEqual(0.05, abba.power.corrected_alpha(0.05, 1))
+        self.assertAlmostEqual(1 - 0.95**(1 / 3.0), abba.power.corrected_alpha(0.05, 3))
+        self.assertAlmostEqual(0.05 / 3, abba.power.corrected_alpha(0.05, 3, 'bonferroni'))
+        self.assertRaises(ValueError, abba.power.corrected_alpha, 0.05, 3, 'holm')
+
+    def test_required_trials(self):
+        # the textbook example: 10% to 12% at 95% confidence and 80% power
+        num_trials = abba.power.required_trials(0.1, 0.2)
+        self.assertEqual(3841, num_trials)
+        self.assertTrue(abba.power.get_power(0.1, 0.2, num_trials) >= 0.8)
+        self.assertTrue(abba.power.get_power(0.1, 0.2, num_trials - 1) < 0.8)
+        self.assertEqual(3841, abba.power.required_trials(0.1, 0.2, num_comparisons=1))
+        self.assertTrue(abba.power.required_trials(0.1, 0.2, num_comparisons=3) > 3841)
+        self.assertTrue(abba.power.required_trials(0.1, 0.2, two_tailed=False) < 3841)
+        self.assertTrue(numpy.isinf(abba.power.required_trials(0.1, 0)))
+
+    def test_unequal_allocation(self):
+        num_trials = abba.power.required_trials(0.1, 0.2, ratio=2)
+        self.assertTrue(num_trials < 3841)
+        self.assertAlmostEqual(0.8, abba.power.get_power(0.1, 0.2, num_trials, ratio=2), places=3)
+
+    def test_minimum_detectable_effect(self):
+        self.assertAlmostEqual(0.2, abba.power.minimum_detectable_effect(0.1, 3841), places=4)
+        self.assertTrue(numpy.isnan(abba.power.minimum_detectable_effect(0.5, 10)))
+
+    def test_grid(self):
+        baseline_rates = numpy.array([[0.01], [0.05], [0.1]])
+        relative_effects = numpy.array([0.05, 0.1, 0.2])
+        num_trials = abba.power.required_trials(baseline_rates, relative_effects, num_comparisons=3)
+        self.assertEqual((3, 3), num_trials.shape)
+        self.assertEqual(
+            abba.power.required_trials(0.05, 0.1, num_comparisons=3),
+            num_trials[1, 1],
+        )
+        effects = abba.power.minimum_detectable_effect(
+            baseline_rates,
+            num_trials,
+            num_comparisons=[1, 3, 3],
+        )
+        self.assertEqual((3, 3), effects.shape)
+        for row in range(3):
+            self.assertTrue(effects[row, 0] < relative_effects[0])
+            for column in (1, 2):
+                self.assertAlmostEqual(relative_effects[column], effects[row, column], places=3)
+
+    def test_matches_z_test(self):
+        # with the expected counts, a study at the required size has a z-test p-value near the
+        # value where power is 50%
+        num_trials = int(abba.power.required_trials(0.1, 0.2, power=0.5))
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(0.1 * num_trials, num_trials),
+            abba.stats.Proportion(0.12 * num_trials, num_trials),
+        )
+        self.assertAlmostEqual(0.025, comparison.z_test(), places=3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import collections
+import json
+import unittest
+
+import abba.report
+import abba.stats
+
+class ReportTest(unittest.TestCase):
+    def setUp(self):
+        self.groups = collections.OrderedDict((
+            ('a', (50, 2000)),
+            ('baseline', (20, 1000)),
+            ('b', (70, 2000)),
+        ))
+
+    def test_choose_baseline(self):
+        self.assertEqual('baseline', abba.report.choose_baseline(self.groups))
+        self.assertEqual('b', abba.report.choose_baseline(self.groups, 'b'))
+        self.assertEqual('x', abba.report.choose_baseline(['x', 'y']))
+        self.assertRaises(ValueError, abba.report.choose_baseline, self.groups, 'c')
+        self.assertRaises(ValueError, abba.report.choose_baseline, [])
+
+    def test_score_groups(self):
+        group_results = abba.report.score_groups(self.groups)
+        experiment = abba.stats.Experiment(2, 20, 1000)
+        self.assertEqual('baseline', group_results.baseline_label)
+        self.assertEqual(['a', 'b'], list(group_results.results))
+        self.assertEqual(experiment.get_results(70, 2000), group_results.results['b'])
+        table = abba.report.format_results_table(self.groups, group_results)
+        self.assertEqual(4, len(table.splitlines()))
+        self.assertTrue('+75.00%' in table)
+
+    def test_to_dict(self):
+        group_results = abba.report.score_groups(self.groups)
+        output = json.loads(json.dumps(
+            abba.report.group_results_to_dict(self.groups, group_results)
+        ))
+        self.assertEqual('baseline', output['baseline']['label'])
+        self.assertEqual(1000, output['baseline']['num_trials'])
+        variation = output['variations'][1]
+        self.assertEqual('b', variation['label'])
+        results = group_results.results['b']
+        self.assertEqual(results.two_tailed_p_value, variation['two_tailed_p_value'])
+        self.assertEqual(
+            results.relative_improvement.lower_bound,
+            variation['relative_improvement']['lower_bound'],
+        )
+
+if __name__ == '__main__':
+    unittest.main()
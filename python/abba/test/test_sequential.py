@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import abba.sequential
+import abba.stats
+
+class BoundariesTest(unittest.TestCase):
+    def test_single_look(self):
+        boundaries = abba.sequential.get_boundaries([1], alpha=0.05)
+        self.assertAlmostEqual(abba.stats.get_z_critical_value(0.05), boundaries[0], places=6)
+
+    def test_pocock(self):
+        # published boundaries for the Lan-DeMets Pocock-type spending function
+        boundaries = abba.sequential.get_boundaries(
+            [0.2, 0.4, 0.6, 0.8, 1],
+            alpha=0.05,
+            spending='pocock',
+        )
+        for expected, actual in zip((2.438, 2.427, 2.410, 2.397, 2.386), boundaries):
+            self.assertAlmostEqual(expected, actual, places=3)
+
+    def test_obrien_fleming(self):
+        boundaries = abba.sequential.get_boundaries([0.2, 0.4, 0.6, 0.8, 1], alpha=0.05)
+        # nothing has been spent before the first look, so its boundary is exact
+        self.assertAlmostEqual(1.959964 / 0.2**0.5, boundaries[0], places=5)
+        # checked against a simulation of 10^6 experiments
+        for expected, actual in zip((3.100, 2.553, 2.254, 2.064), boundaries[1:]):
+            self.assertAlmostEqual(expected, actual, places=3)
+        self.assertTrue(
+            abba.sequential.get_boundaries((0.2, 0.4, 0.6, 0.8, 1.0), alpha=0.05) is boundaries
+        )
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, abba.sequential.get_boundaries, [0.5, 0.5, 1])
+        self.assertRaises(ValueError, abba.sequential.get_boundaries, [0, 1])
+        self.assertRaises(ValueError, abba.sequential.get_boundaries, [1], spending='linear')
+
+class SequentialExperimentTest(unittest.TestCase):
+    def test_get_results(self):
+        experiment = abba.sequential.SequentialExperiment(num_trials=2, num_looks=5)
+        self.assertEqual(5, experiment.num_looks)
+        # Bonferroni correction across the two variations
+        self.assertEqual(
+            abba.sequential.get_boundaries([0.2, 0.4, 0.6, 0.8, 1.0], alpha=0.025),
+            experiment.boundaries,
+        )
+
+        early = experiment.get_results(0, 80, 4000, 130, 4000)
+        self.assertAlmostEqual(3.497, early.z_value, places=3)
+        self.assertFalse(early.reject)
+        late = experiment.get_results(4, 200, 10000, 280, 10000)
+        self.assertTrue(late.reject)
+        self.assertTrue(late.improvement.lower_bound > 0)
+        self.assertTrue(early.improvement.lower_bound < 0)
+
+        self.assertRaises(ValueError, experiment.get_results, 5, 200, 10000, 280, 10000)
+        no_failures = experiment.get_results(0, 100, 100, 100, 100)
+        self.assertEqual(0, no_failures.z_value)
+        self.assertFalse(no_failures.reject)
+
+    def test_single_look_matches_experiment(self):
+        sequential = abba.sequential.SequentialExperiment(num_trials=3, num_looks=1)
+        results = sequential.get_results(0, 20, 1000, 50, 2000)
+        expected = abba.stats.Experiment(3, 20, 1000).get_results(50, 2000)
+        for field in ('proportion', 'improvement', 'relative_improvement'):
+            values = zip(getattr(expected, field), getattr(results, field))
+            for expected_value, actual_value in values:
+                self.assertAlmostEqual(expected_value, actual_value, places=6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import collections
+import json
+import threading
+import unittest
+
+from http import client as http_client
+
+import abba.report
+import abba.server
+import abba.stats
+
+GROUPS = collections.OrderedDict((
+    ('baseline', (20, 1000)),
+    ('red', (50, 2000)),
+    ('blue', (70, 2000)),
+))
+EXPERIMENT = {'groups': dict((label, list(counts)) for label, counts in GROUPS.items())}
+
+class ScoringServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.service = abba.server.ScoringService()
+
+    def test_score(self):
+        expected = abba.report.group_results_to_dict(GROUPS, abba.report.score_groups(GROUPS))
+        self.assertEqual(expected, self.service.score(EXPERIMENT))
+        self.assertEqual(
+            {'results': [expected, expected]},
+            self.service.score_payload({'experiments': [EXPERIMENT, EXPERIMENT]}),
+        )
+        # the batch came from the cache
+        self.assertEqual(6, self.service.cache.hits)
+        self.assertEqual(3, len(self.service.cache))
+
+    def test_options(self):
+        results = self.service.score(dict(
+            EXPERIMENT,
+            baseline='red',
+            confidence_level=0.99,
+            multiple_test_correction=False,
+        ))
+        self.assertEqual('red', results['baseline']['label'])
+        expected = abba.stats.Experiment(1, 50, 2000, 0.99).get_results(70, 2000)
+        self.assertEqual('blue', results['variations'][1]['label'])
+        self.assertEqual(
+            expected.two_tailed_p_value,
+            results['variations'][1]['two_tailed_p_value'],
+        )
+
+    def test_errors(self):
+        batch = self.service.score_payload({'experiments': [
+            {},
+            {'groups': {'baseline': [20, 10]}},
+            {'groups': {'baseline': 'many'}},
+            {'groups': {'baseline': [20, 1000]}, 'baseline': 'missing'},
+            {'groups': {'baseline': [float('inf'), float('inf')]}},
+            {'groups': {'baseline': [float('nan'), 1000]}},
+            dict(EXPERIMENT, confidence_level=0),
+            dict(EXPERIMENT, confidence_level=1),
+            dict(EXPERIMENT, confidence_level=95),
+            dict(EXPERIMENT, confidence_level=float('nan')),
+            dict(EXPERIMENT, confidence_level='high'),
+            dict(EXPERIMENT, multiple_test_correction='false'),
+            dict(EXPERIMENT, multiple_test_correction=0),
+            5,
+            None,
+            EXPERIMENT,
+        ]})['results']
+        for results in batch[:-1]:
+            self.assertEqual(['error'], list(results))
+        self.assertFalse('error' in batch[-1])
+        for payload in ({'experiments': 5}, {'experiments': {'a': EXPERIMENT}}, [EXPERIMENT], 5):
+            self.assertEqual(['error'], list(self.service.score_payload(payload)))
+
+    def test_demo_results(self):
+        results = self.service.demo_results(
+            'Baseline=20%2C1000&Variation+1=50%2C2000&Variation+2=70%2C2000'
+            '&abba%3AintervalConfidenceLevel=95&abba%3AuseMultipleTestCorrection=true'
+        )
+        self.assertEqual(2, results['numComparisons'])
+        self.assertAlmostEqual(0.05, results['intervalAlpha'])
+        self.assertEqual(20, results['baseline']['numSuccesses'])
+        expected = abba.stats.Experiment(2, 20, 1000).get_results(70, 2000)
+        self.assertEqual(expected.two_tailed_p_value, results['variations']['70,2000']['pValue'])
+        self.assertEqual(
+            expected.relative_improvement.lower_bound,
+            results['variations']['70,2000']['relativeImprovement']['lowerBound'],
+        )
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = abba.server.make_server(port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.connection = http_client.HTTPConnection(*self.server.server_address[:2])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, method, path, body=None):
+        self.connection.request(method, path, body)
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def test_score(self):
+        status, body = self.request('POST', '/score', json.dumps({'experiments': [EXPERIMENT]}))
+        self.assertEqual(200, status)
+        self.assertEqual(
+            abba.server.ScoringService().score_payload({'experiments': [EXPERIMENT]}),
+            json.loads(body.decode('utf-8')),
+        )
+        # on the same connection
+        status, body = self.request('POST', '/score', '{')
+        self.assertEqual(400, status)
+        self.assertEqual(404, self.request('POST', '/other', '{}')[0])
+        for body in ('{"experiments": 5}', '{"groups": {"baseline": [Infinity, Infinity]}}',
+                     json.dumps(dict(EXPERIMENT, confidence_level=1.5))):
+            status, body = self.request('POST', '/score', body)
+            self.assertEqual(400, status)
+            self.assertEqual(['error'], list(json.loads(body.decode('utf-8'))))
+
+    def test_internal_error(self):
+        def score_payload(payload):
+            raise RuntimeError('broken')
+        self.server.service.score_payload = score_payload
+        status, body = self.request('POST', '/score', json.dumps(EXPERIMENT))
+        self.assertEqual(500, status)
+        self.assertEqual(['error'], list(json.loads(body.decode('utf-8'))))
+        # the connection is still usable
+        self.assertEqual(404, self.request('POST', '/other', '{}')[0])
+
+    @unittest.skipIf(abba.server._default_static_root() is None, 'not a source checkout')
+    def test_demo(self):
+        status, body = self.request('GET', '/demo/abba.html?Baseline=20%2C1000&Test=50%2C2000')
+        self.assertEqual(200, status)
+        page = body.decode('utf-8')
+        self.assertTrue('Abba.SERVER_RESULTS = {' in page)
+        self.assertTrue(page.index('render.js') < page.index('server_results.js'))
+        self.assertTrue(page.index('server_results.js') < page.index('app.js'))
+        self.assertEqual(200, self.request('GET', '/demo/server_results.js')[0])
+        self.assertEqual(200, self.request('GET', '/lib/hash.js')[0])
+        self.assertEqual(404, self.request('GET', '/demo/../python/setup.py')[0])
+        self.assertEqual(404, self.request('GET', '/python/setup.py')[0])
+        self.assertEqual(400, self.request('GET', '/demo/abba.html?Baseline=x')[0])
+
+if __name__ == '__main__':
+    unittest.main()
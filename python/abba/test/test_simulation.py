@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+import unittest
+
+import numpy
+
+import abba.simulation
+
+class SimulationTest(unittest.TestCase):
+    def assertWithinErrors(self, expected, results, num_errors=4):
+        self.assertTrue(
+            abs(results.familywise_rejection_rate - expected)
+                <= num_errors * results.familywise_standard_error,
+            '%s not within %s standard errors of %s' % (results, num_errors, expected),
+        )
+
+    def test_z_test_type_one_error(self):
+        results = abba.simulation.simulate(
+            baseline_rate=0.1,
+            num_trials=10000,
+            num_experiments=200000,
+            method='z_test',
+            seed=1,
+        )
+        self.assertWithinErrors(0.05, results)
+
+        results = abba.simulation.simulate(
+            baseline_rate=0.1,
+            num_trials=10000,
+            num_variations=3,
+            num_experiments=200000,
+            method='z_test',
+            seed=1,
+        )
+        self.assertEqual(3, len(results.rejection_rates))
+        # the variations share a baseline, so their tests are positively correlated and the Sidak
+        # correction is conservative
+        self.assertTrue(0.04 < results.familywise_rejection_rate < 0.05)
+
+    def test_iterated_test_type_one_error(self):
+        results = abba.simulation.simulate(
+            baseline_rate=0.05,
+            num_trials=500,
+            num_variations=2,
+            num_experiments=5000,
+            seed=2,
+        )
+        # the test is conservative, particularly for small samples
+        self.assertTrue(
+            results.familywise_rejection_rate
+                <= 0.05 + 3 * results.familywise_standard_error,
+        )
+        self.assertTrue(results.familywise_rejection_rate > 0.02)
+
+    def test_unequal_trials(self):
+        results = abba.simulation.simulate(
+            baseline_rate=0.05,
+            num_trials=1000,
+            baseline_num_trials=3000,
+            num_experiments=200000,
+            method='z_test',
+            seed=5,
+        )
+        self.assertWithinErrors(0.05, results)
+
+        results = abba.simulation.simulate(
+            baseline_rate=0.05,
+            num_trials=200,
+            baseline_num_trials=600,
+            num_experiments=5000,
+            seed=5,
+        )
+        self.assertTrue(
+            results.familywise_rejection_rate
+                <= 0.05 + 3 * results.familywise_standard_error,
+        )
+
+    def test_power(self):
+        results = abba.simulation.simulate(
+            baseline_rate=0.1,
+            num_trials=3841,
+            relative_effect=0.2,
+            num_experiments=100000,
+            method='z_test',
+            seed=3,
+        )
+        # abba.power.required_trials(0.1, 0.2) for 80% power
+        self.assertWithinErrors(0.8, results)
+
+    def test_reproducible(self):
+        arguments = dict(
+            baseline_rate=0.05,
+            num_trials=2000,
+            num_variations=3,
+            relative_effect=[0, 0.1, 0.3],
+            num_experiments=25000,
+            chunk_size=10000,
+            method='z_test',
+            seed=4,
+        )
+        results = abba.simulation.simulate(**arguments)
+        for repeated_results in (
+            abba.simulation.simulate(**arguments),
+            abba.simulation.simulate(max_workers=2, **arguments),
+        ):
+            self.assertEqual(
+                results.familywise_rejection_rate,
+                repeated_results.familywise_rejection_rate,
+            )
+            numpy.testing.assert_array_equal(
+                results.rejection_rates,
+                repeated_results.rejection_rates,
+            )
+        self.assertTrue(results.rejection_rates[0] < results.rejection_rates[2])
+
+    def test_invalid_method(self):
+        self.assertRaises(ValueError, abba.simulation.simulate, 0.1, 100, method='bayes')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,11 @@
 
 # Copyright (c) 2012 Thumbtack, Inc.
 
+import math
 import unittest
 
+import numpy
+
 import abba.stats
 
 Z_05 = abba.stats.get_z_critical_value(0.05)
@@ -16,6 +19,28 @@ class GlobalsTest(LessPreciseTestCase):
     def test_z_value(self):
         self.assertAlmostEqual(1.960, Z_05)
 
+    def test_z_value_cache(self):
+        self.assertAlmostEqual(2.807, abba.stats.get_z_critical_value(0.01 / 2))
+        self.assertAlmostEqual(2.326, abba.stats.get_z_critical_value(0.01, two_tailed=False))
+        self.assertAlmostEqual(2.503, abba.stats.get_z_critical_value(0.0123))
+        self.assertEqual(
+            abba.stats.get_z_critical_value(0.0123),
+            abba.stats.get_z_critical_value(0.0123),
+        )
+        self.assertEqual(
+            abba.stats.get_z_critical_value(0.05),
+            abba.stats.get_z_critical_value(numpy.array(0.05)),
+        )
+        z_values = abba.stats.get_z_critical_value(numpy.array([0.05, 0.01]))
+        self.assertAlmostEqual(1.960, z_values[0])
+        self.assertAlmostEqual(2.576, z_values[1])
+
+    def test_probability_union(self):
+        self.assertAlmostEqual(0.51, abba.stats.probability_union(0.3, 2))
+        self.assertEqual(1, abba.stats.probability_union(1, 2))
+        # 1 - (1 - p)**n underflows to zero here
+        self.assertEqual(5e-18, abba.stats.probability_union(1e-18, 5))
+
 class ProportionTest(LessPreciseTestCase):
     def test_estimate(self):
         p_estimate = abba.stats.Proportion(20, 1000).p_estimate()
@@ -58,6 +83,134 @@ class ProportionComparisonTest(LessPreciseTestCase):
             self.comparison.iterated_test(2, 1e-7, improvement_only=True)
         )
 
+    def test_iterated_test_large_sample(self):
+        # large enough that only the baseline coverage interval is evaluated
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(500, 20000),
+            abba.stats.Proportion(560, 21000),
+        )
+        self.assertAlmostEqual(0.577, comparison.iterated_test(3, 1e-5))
+        self.assertAlmostEqual(0.297, comparison.iterated_test(3, 1e-5, improvement_only=True))
+
+    def test_normal_approximation(self):
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(5000000, 100000000),
+            abba.stats.Proportion(5012345, 100000007),
+        )
+        for improvement_only in (False, True):
+            coverage = comparison.iterated_test_details(
+                10, 1e-6, improvement_only=improvement_only,
+            )
+            normal = comparison.iterated_test_details(
+                10, 1e-6, improvement_only=improvement_only, normal_approximation_trials=1e8,
+            )
+            self.assertEqual('coverage', coverage.method)
+            self.assertEqual('normal', normal.method)
+            self.assertTrue(normal.num_evaluations < 1000)
+            self.assertNormalApproximates(coverage, normal)
+
+    def assertNormalApproximates(self, coverage, normal):
+        """
+        The normal p-value, which includes its error bound, is an upper bound on the coverage sum
+        and within twice its error bound of it.
+        """
+        self.assertTrue(normal.p_value >= coverage.p_value - coverage.error_bound)
+        self.assertTrue(
+            normal.p_value - coverage.p_value <= 2 * normal.error_bound + coverage.error_bound
+        )
+
+    def test_normal_approximation_error(self):
+        # sample sizes where the error estimate is near a switching threshold, for effects up to
+        # a few standard deviations
+        for proportion, baseline_num_trials, variation_num_trials, num_tests in (
+                (0.5, 200000, 400000, 1), (0.5, 400000, 400000, 1), (0.5, 10000, 30000, 1),
+                (0.02, 200000, 200000, 1), (0.1, 1000000, 300000, 5), (0.3, 50000, 50000, 10)):
+            standard_deviation = math.sqrt(
+                variation_num_trials * proportion * (1 - proportion)
+            )
+            for shift in (0.3, 0.7, 1, 2, 3):
+                comparison = abba.stats.ProportionComparison(
+                    abba.stats.Proportion(
+                        int(baseline_num_trials * proportion),
+                        baseline_num_trials,
+                    ),
+                    abba.stats.Proportion(
+                        int(variation_num_trials * proportion + shift * standard_deviation),
+                        variation_num_trials,
+                    ),
+                )
+                for improvement_only in (False, True):
+                    coverage = comparison.iterated_test_details(
+                        num_tests, 1e-8, improvement_only=improvement_only,
+                    )
+                    normal = comparison.iterated_test_details(
+                        num_tests, 1e-8, improvement_only=improvement_only,
+                        normal_approximation_trials=0,
+                    )
+                    self.assertEqual('normal', normal.method)
+                    self.assertNormalApproximates(coverage, normal)
+
+    def test_normal_approximation_off_by_default(self):
+        self.assertEqual(None, abba.stats.Experiment.NORMAL_APPROXIMATION_MAX_ERROR)
+        details = abba.stats.Experiment(1, 200000, 400000).get_p_value_details(200400, 400000)
+        self.assertEqual('coverage', details[0].method)
+        unittest.TestCase.assertAlmostEqual(self, 0.37147, details[0].p_value, places=5)
+
+    def test_normal_approximation_switch(self):
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(20, 1000),
+            abba.stats.Proportion(60, 2000),
+        )
+        details = comparison.iterated_test_details(2, 1e-7, max_normal_error=1e-5)
+        self.assertEqual('coverage', details.method)
+        self.assertAlmostEqual(0.191, details.p_value)
+
+    def test_iterated_test_pair(self):
+        for baseline, variation in (((20, 1000), (60, 2000)), ((60, 2000), (20, 1000)),
+                                    ((10, 100), (20, 200)), ((0, 50), (3, 60))):
+            comparison = abba.stats.ProportionComparison(
+                abba.stats.Proportion(*baseline),
+                abba.stats.Proportion(*variation),
+            )
+            pair = comparison.iterated_test_pair_details(3, 1e-5)
+            self.assertEqual(
+                (
+                    comparison.iterated_test_details(3, 1e-5),
+                    comparison.iterated_test_details(3, 1e-5, improvement_only=True),
+                ),
+                pair,
+            )
+
+    def test_anytime_iterated_test(self):
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(300000, 2000000),
+            abba.stats.Proportion(301000, 2000000),
+        )
+        for improvement_only in (False, True):
+            expected = comparison.iterated_test_details(3, 1e-5, improvement_only=improvement_only)
+            converged = comparison.anytime_iterated_test(
+                3, 1e-5, improvement_only=improvement_only,
+            )
+            self.assertEqual('anytime', converged.method)
+            self.assertTrue(converged.converged)
+            self.assertTrue(converged.error_bound <= 1e-5)
+            unittest.TestCase.assertAlmostEqual(
+                self, expected.p_value, converged.p_value, delta=2e-5,
+            )
+
+            budgeted = comparison.anytime_iterated_test(
+                3, 1e-5, improvement_only=improvement_only, max_evaluations=200,
+            )
+            self.assertFalse(budgeted.converged)
+            self.assertTrue(budgeted.num_evaluations <= 200)
+            self.assertTrue(budgeted.error_bound > 1e-5)
+            # still an upper bound on the p-value
+            self.assertTrue(budgeted.p_value >= converged.p_value - converged.error_bound)
+
+        late = comparison.anytime_iterated_test(3, 1e-5, deadline=0)
+        self.assertFalse(late.converged)
+        self.assertEqual(1, late.p_value)
+
     def test_trivial_case(self):
         comparison = abba.stats.ProportionComparison(
             abba.stats.Proportion(10, 100),
@@ -66,6 +219,48 @@ class ProportionComparisonTest(LessPreciseTestCase):
         self.assertAlmostEqual(1, comparison.iterated_test(2, 1e-7))
         self.assertAlmostEqual(0.664, comparison.iterated_test(2, 1e-7, improvement_only=True))
 
+    def test_exact_iterated_test(self):
+        for improvement_only in (False, True):
+            self.assertAlmostEqual(
+                self.comparison.iterated_test(2, 1e-7, improvement_only=improvement_only),
+                self.comparison.exact_iterated_test(2, improvement_only=improvement_only),
+            )
+        # checked by summing over all outcomes in exact rational arithmetic; with equal numbers of
+        # trials every extreme count is a tie
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(0, 10),
+            abba.stats.Proportion(3, 10),
+        )
+        unittest.TestCase.assertAlmostEqual(
+            self, 0.11133755699285723, comparison.exact_iterated_test(1), places=12,
+        )
+        unittest.TestCase.assertAlmostEqual(
+            self,
+            0.05566877849642861,
+            comparison.exact_iterated_test(1, improvement_only=True),
+            places=12,
+        )
+        self.assertAlmostEqual(0.069, comparison.exact_iterated_test(1, mid_p=True))
+        trivial_comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(10, 100),
+            abba.stats.Proportion(20, 200),
+        )
+        self.assertAlmostEqual(1, trivial_comparison.exact_iterated_test(2))
+
+    def test_fisher_exact_test(self):
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(20, 100),
+            abba.stats.Proportion(30, 100),
+        )
+        # agrees with scipy.stats.fisher_exact
+        self.assertAlmostEqual(0.141, comparison.fisher_exact_test())
+        self.assertAlmostEqual(0.071, comparison.fisher_exact_test(improvement_only=True))
+        self.assertAlmostEqual(
+            0.053,
+            comparison.fisher_exact_test(improvement_only=True, mid_p=True),
+        )
+        self.assertAlmostEqual(0.367, comparison.fisher_exact_test(3))
+
 class ExperimentTest(LessPreciseTestCase):
     def test_experiment(self):
         experiment = abba.stats.Experiment(
@@ -96,5 +291,123 @@ class ExperimentTest(LessPreciseTestCase):
         self.assertAlmostEqual(0.062, results.two_tailed_p_value)
         self.assertAlmostEqual(0.997, results.improvement_one_tailed_p_value)
 
+    def test_get_all_results(self):
+        experiment = abba.stats.Experiment(
+            num_trials=3,
+            baseline_num_successes=20,
+            baseline_num_trials=1000,
+        )
+        arms = [(50, 2000), (70, 2000), (50, 2000)]
+        results = experiment.get_all_results(arms)
+        self.assertEqual([experiment.get_results(*arm) for arm in arms], results)
+
+    def test_p_value_budget(self):
+        experiment = abba.stats.Experiment(
+            num_trials=3,
+            baseline_num_successes=300000,
+            baseline_num_trials=2000000,
+        )
+        experiment.P_VALUE_MAX_EVALUATIONS = 100000
+        details = experiment.get_p_value_details(301000, 2000000)
+        self.assertEqual(['anytime', 'anytime'], [result.method for result in details])
+        self.assertTrue(all(result.converged for result in details))
+        experiment.P_VALUE_MAX_EVALUATIONS = 200
+        details = experiment.get_p_value_details(301000, 2000000)
+        self.assertFalse(any(result.converged for result in details))
+        results = experiment.get_results(301000, 2000000)
+        self.assertEqual(
+            tuple(result.p_value for result in details),
+            (results.two_tailed_p_value, results.improvement_one_tailed_p_value),
+        )
+        # the budget applies to batches too
+        batch = experiment.get_results_batch([301000], [2000000])
+        self.assertEqual(results.two_tailed_p_value, batch.two_tailed_p_value[0])
+        self.assertEqual(
+            results.improvement_one_tailed_p_value,
+            batch.improvement_one_tailed_p_value[0],
+        )
+
+    def test_get_results_batch(self):
+        experiment = abba.stats.Experiment(
+            num_trials=3,
+            baseline_num_successes=20,
+            baseline_num_trials=1000,
+        )
+        batch = experiment.get_results_batch([50, 70, 20], [2000, 2000, 2000])
+        for index, num_successes in enumerate([50, 70, 20]):
+            results = experiment.get_results(num_successes, 2000)
+            self.assertEquals(num_successes, batch.num_successes[index])
+            for field in ('proportion', 'improvement', 'relative_improvement'):
+                for expected, actual in zip(getattr(results, field), getattr(batch, field)):
+                    self.assertAlmostEqual(expected, actual[index])
+            self.assertAlmostEqual(results.two_tailed_p_value, batch.two_tailed_p_value[index])
+            self.assertAlmostEqual(
+                results.improvement_one_tailed_p_value,
+                batch.improvement_one_tailed_p_value[index],
+            )
+
+    def test_get_exact_p_values(self):
+        experiment = abba.stats.Experiment(
+            num_trials=3,
+            baseline_num_successes=20,
+            baseline_num_trials=100,
+        )
+        two_tailed_p_value, improvement_one_tailed_p_value = experiment.get_exact_p_values(30, 100)
+        results = experiment.get_results(30, 100)
+        self.assertAlmostEqual(results.two_tailed_p_value, two_tailed_p_value)
+        self.assertAlmostEqual(
+            results.improvement_one_tailed_p_value,
+            improvement_one_tailed_p_value,
+        )
+        self.assertAlmostEqual(0.244, experiment.get_exact_p_values(30, 100, mid_p=True)[0])
+
+    def test_module_get_results_batch(self):
+        batch = abba.stats.get_results_batch(
+            baseline_num_successes=[20, 500],
+            baseline_num_trials=[1000, 20000],
+            num_successes=[50, 560],
+            num_trials=[2000, 21000],
+            num_comparisons=[3, 1],
+        )
+        self.assertAlmostEqual(-0.011, batch.improvement.lower_bound[0])
+        self.assertAlmostEqual(0.691, batch.two_tailed_p_value[0])
+        results = abba.stats.Experiment(1, 500, 20000).get_results(560, 21000)
+        self.assertAlmostEqual(results.improvement.lower_bound, batch.improvement.lower_bound[1])
+        self.assertAlmostEqual(results.two_tailed_p_value, batch.two_tailed_p_value[1])
+
+class ResultsTableTest(LessPreciseTestCase):
+    def test_from_batch_and_from_results(self):
+        experiment = abba.stats.Experiment(3, 20, 1000)
+        batch_table = abba.stats.ResultsTable.from_batch(
+            experiment.get_results_batch([50, 70, 20], [2000, 2000, 2000])
+        )
+        table = abba.stats.ResultsTable.from_results(
+            experiment.get_results(num_successes, 2000) for num_successes in (50, 70, 20)
+        )
+        self.assertEqual(3, len(table))
+        self.assertEqual(3, len(batch_table))
+        for expected, actual, from_batch in zip(
+                [experiment.get_results(count, 2000) for count in (50, 70, 20)],
+                table,
+                batch_table):
+            self.assertEqual(expected, actual)
+            self.assertEqual(expected.num_successes, from_batch.num_successes)
+            self.assertAlmostEqual(expected.relative_improvement.lower_bound,
+                                   from_batch.relative_improvement.lower_bound)
+            self.assertAlmostEqual(expected.two_tailed_p_value, from_batch.two_tailed_p_value)
+        self.assertEqual(table[2], table[-1])
+        self.assertRaises(IndexError, lambda: table[3])
+
+    def test_append_and_column(self):
+        experiment = abba.stats.Experiment(1, 20, 1000)
+        table = abba.stats.ResultsTable()
+        for num_successes in range(10, 40):
+            table.append(experiment.get_results(num_successes, 1000))
+        self.assertEqual(30, len(table))
+        self.assertEqual(list(range(10, 40)), table.column('num_successes').tolist())
+        p_values = table.column('two_tailed_p_value')
+        self.assertAlmostEqual(experiment.get_results(25, 1000).two_tailed_p_value, p_values[15])
+        self.assertRaises(ValueError, p_values.fill, 0)
+
 if __name__ == '__main__':
     unittest.main()
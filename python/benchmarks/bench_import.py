@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Measures the time and peak memory (RSS) taken to import abba.stats and score a first experiment,
+with each backend, in fresh interpreters. Run from the python/ directory:
+
+    python benchmarks/bench_import.py
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import subprocess
+import sys
+
+CHILD_SCRIPT = '''
+import json
+import resource
+import time
+
+start = time.time()
+import abba.stats
+imported = time.time()
+abba.stats.Experiment(3, 20, 1000).get_results(50, 2000)
+scored = time.time()
+print(json.dumps({
+    'import_seconds': imported - start,
+    'first_results_seconds': scored - imported,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+'''
+
+def measure(backend, repeat=5):
+    """
+    Returns the best of several runs of CHILD_SCRIPT with the given backend name.
+    """
+    environment = dict(os.environ, ABBA_BACKEND=backend)
+    environment['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + [environment.get('PYTHONPATH', '')]
+    )
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', CHILD_SCRIPT], env=environment)
+        runs.append(json.loads(output.decode('utf-8')))
+    return dict((key, min(run[key] for run in runs)) for key in runs[0])
+
+def main():
+    for backend in ('numpy', 'scipy'):
+        result = measure(backend)
+        print(
+            '%-6s import %7.1f ms  first results %7.1f ms  max RSS %6.1f MB' % (
+                backend,
+                result['import_seconds'] * 1e3,
+                result['first_results_seconds'] * 1e3,
+                result['max_rss_kb'] / 1024.0,
+            )
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Thumbtack, Inc.
+
+"""
+Benchmarks for the hot paths of abba.stats. Run from the python/ directory:
+
+    python benchmarks/bench_stats.py --output before.json
+    ... change things ...
+    python benchmarks/bench_stats.py --output after.json --compare before.json
+
+Each benchmark is timed over a grid of baseline sizes, conversion rates and numbers of comparisons.
+For every point the suite records the best and median wall time per call, the number of calls made
+into the distribution backend (SciPy by default) and the peak memory allocated during one call.
+Results are written as JSON so runs from different commits can be compared with --compare.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import datetime
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy
+
+import abba.backends
+import abba.stats
+
+BASELINE_NUM_TRIALS = (10**3, 10**4, 10**5, 10**6, 10**7, 10**8, 10**9)
+QUICK_BASELINE_NUM_TRIALS = (10**3, 10**5, 10**7)
+CONVERSION_RATES = (0.01, 0.1, 0.5)
+NUM_COMPARISONS = (1, 3, 10)
+# the variation converts this much better than the baseline, relative to the baseline rate
+RELATIVE_LIFT = 0.02
+
+class CountingBackend(object):
+    """
+    Wraps a backend and counts calls to each of its functions, including calls to the binomial
+    distributions it creates.
+    """
+    def __init__(self, backend):
+        self._backend = backend
+        self.name = backend.name
+        self.counts = collections.Counter()
+
+    def _counted(self, name, function):
+        def call(*args):
+            self.counts[name] += 1
+            return function(*args)
+        return call
+
+    def __getattr__(self, name):
+        return self._counted(name, getattr(self._backend, name))
+
+    def binomial(self, num_trials, probability):
+        self.counts['binomial'] += 1
+        return _CountingBinomial(self, self._backend.binomial(num_trials, probability))
+
+class _CountingBinomial(object):
+    def __init__(self, counting_backend, binomial):
+        self._counting_backend = counting_backend
+        self._binomial = binomial
+
+    def __getattr__(self, name):
+        return self._counting_backend._counted(
+            'binomial.' + name,
+            getattr(self._binomial, name),
+        )
+
+def time_per_call(function, min_seconds=0.2, max_repeat=1000):
+    """
+    Returns (best, median, number of calls) of wall times per call, running function repeatedly
+    for about min_seconds.
+    """
+    function()
+    times = []
+    start = time.time()
+    while len(times) < max_repeat and (len(times) < 3 or time.time() - start < min_seconds):
+        times.append(min(timeit.repeat(function, number=1, repeat=1)))
+    return min(times), float(numpy.median(times)), len(times)
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_benchmark(name, function, parameters, min_seconds):
+    abba.stats.disable_cache()
+    backend = CountingBackend(abba.backends.get_backend())
+    abba.backends.set_backend(backend)
+    try:
+        function()
+        backend_calls = dict(backend.counts)
+    finally:
+        abba.backends.set_backend(backend._backend)
+    best, median, repeat = time_per_call(function, min_seconds=min_seconds)
+    return collections.OrderedDict((
+        ('benchmark', name),
+        ('parameters', parameters),
+        ('seconds', best),
+        ('median_seconds', median),
+        ('repeat', repeat),
+        ('backend_calls', backend_calls),
+        ('peak_memory_bytes', peak_memory(function)),
+    ))
+
+def grid_benchmarks(baseline_num_trials_grid):
+    """
+    Yields (name, function, parameters) for each benchmark at each grid point.
+    """
+    for baseline_num_trials, rate, num_comparisons in itertools.product(
+        baseline_num_trials_grid, CONVERSION_RATES, NUM_COMPARISONS,
+    ):
+        baseline_num_successes = int(baseline_num_trials * rate)
+        num_successes = int(baseline_num_trials * rate * (1 + RELATIVE_LIFT))
+        parameters = collections.OrderedDict((
+            ('baseline_num_trials', baseline_num_trials),
+            ('rate', rate),
+            ('num_comparisons', num_comparisons),
+        ))
+        comparison = abba.stats.ProportionComparison(
+            abba.stats.Proportion(baseline_num_successes, baseline_num_trials),
+            abba.stats.Proportion(num_successes, baseline_num_trials),
+        )
+        experiment = abba.stats.Experiment(
+            num_comparisons,
+            baseline_num_successes,
+            baseline_num_trials,
+        )
+        precision = abba.stats.Experiment.P_VALUE_PRECISION
+
+        # bind loop variables as defaults so each closure keeps its own grid point
+        yield 'iterated_test', (
+            lambda comparison=comparison, num_comparisons=num_comparisons:
+                comparison.iterated_test(num_comparisons, precision)
+        ), parameters
+        yield 'iterated_test_improvement_only', (
+            lambda comparison=comparison, num_comparisons=num_comparisons:
+                comparison.iterated_test(num_comparisons, precision, improvement_only=True)
+        ), parameters
+        yield 'get_results', (
+            lambda experiment=experiment, num_successes=num_successes,
+                   num_trials=baseline_num_trials:
+                experiment.get_results(num_successes, num_trials)
+        ), parameters
+        if num_comparisons == 1:
+            yield 'z_test', (lambda comparison=comparison: comparison.z_test()), parameters
+            yield 'confidence_interval_on_proportion', (
+                lambda successes=baseline_num_successes, trials=baseline_num_trials:
+                    abba.stats.confidence_interval_on_proportion(successes, trials)
+            ), parameters
+
+def construction_benchmarks():
+    yield 'experiment_construction', (
+        lambda: abba.stats.Experiment(
+            num_trials=3,
+            baseline_num_successes=20,
+            baseline_num_trials=1000,
+        )
+    ), {}
+
+    def uncached_z_critical_value():
+        # an alpha that's not in the table, with the cache cleared each time
+        abba.stats._z_critical_values.pop((0.0123, True), None)
+        return abba.stats.get_z_critical_value(0.0123)
+    yield 'z_critical_value_uncached', uncached_z_critical_value, {}
+
+    probabilities = numpy.linspace(0, 1, 10000)
+    yield 'probability_union_10000', (
+        lambda: abba.stats.probability_union(probabilities, 20)
+    ), {}
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.STDOUT,
+        ).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def metadata():
+    try:
+        import scipy
+        scipy_version = scipy.__version__
+    except ImportError:
+        scipy_version = None
+    return collections.OrderedDict((
+        ('time', datetime.datetime.utcnow().isoformat() + 'Z'),
+        ('git_revision', git_revision()),
+        ('python', platform.python_version()),
+        ('numpy', numpy.__version__),
+        ('scipy', scipy_version),
+        ('backend', abba.backends.get_backend().name),
+        ('machine', platform.platform()),
+    ))
+
+def result_key(result):
+    return (result['benchmark'], json.dumps(result['parameters'], sort_keys=True))
+
+def compare(baseline_run, run, threshold):
+    """
+    Print the ratio of each benchmark's time to its time in baseline_run and return the number of
+    benchmarks that got slower by more than the threshold ratio.
+    """
+    baseline_results = dict((result_key(result), result) for result in baseline_run['results'])
+    num_regressions = 0
+    for result in run['results']:
+        baseline_result = baseline_results.get(result_key(result))
+        if baseline_result is None:
+            continue
+        ratio = result['seconds'] / baseline_result['seconds']
+        regressed = ratio > threshold
+        num_regressions += regressed
+        print('%-34s %-60s %8.2fx%s' % (
+            result['benchmark'],
+            json.dumps(result['parameters']),
+            ratio,
+            '  REGRESSION' if regressed else '',
+        ))
+    return num_regressions
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--output', help='write JSON results to this file (default: stdout)')
+    parser.add_argument('--compare', metavar='JSON', help='compare against an earlier run')
+    parser.add_argument(
+        '--threshold', type=float, default=1.25,
+        help='time ratio above which --compare reports a regression (default: 1.25)',
+    )
+    parser.add_argument(
+        '--quick', action='store_true', help='use a smaller grid of baseline sizes',
+    )
+    parser.add_argument(
+        '--min-seconds', type=float, default=0.2,
+        help='approximate time spent timing each benchmark (default: 0.2)',
+    )
+    parser.add_argument('--backend', choices=sorted(abba.backends.BACKENDS))
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    if arguments.backend:
+        abba.backends.set_backend(arguments.backend)
+
+    baseline_num_trials_grid = (
+        QUICK_BASELINE_NUM_TRIALS if arguments.quick else BASELINE_NUM_TRIALS
+    )
+    results = []
+    for name, function, parameters in itertools.chain(
+        construction_benchmarks(),
+        grid_benchmarks(baseline_num_trials_grid),
+    ):
+        result = run_benchmark(name, function, parameters, arguments.min_seconds)
+        print('%-34s %-60s %12.1f us' % (
+            name,
+            json.dumps(parameters),
+            result['seconds'] * 1e6,
+        ), file=sys.stderr)
+        results.append(result)
+
+    run = collections.OrderedDict((('metadata', metadata()), ('results', results)))
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(run, output_file, indent=2)
+    else:
+        json.dump(run, sys.stdout, indent=2)
+        print()
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            num_regressions = compare(json.load(baseline_file), run, arguments.threshold)
+        if num_regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
-from distutils.core import setup
+try:
+    from setuptools import setup
+except ImportError:
+    from distutils.core import setup
 
 import abba
 
@@ -12,5 +15,7 @@ setup(
     license='LICENSE.txt',
     long_description=abba.__doc__,
     packages=['abba', 'abba.test'],
-    install_requires=['scipy'],
+    install_requires=['numpy'],
+    extras_require={'scipy': ['scipy']},
+    entry_points={'console_scripts': ['abba = abba.cli:main']},
 )
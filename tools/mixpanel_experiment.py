@@ -6,157 +6,361 @@
 #
 # Modified by Chris Mueller at Thumbtack for  A/B tests
 
+from __future__ import print_function
+
+import argparse
+import collections
+import datetime
 import hashlib
-import urllib
+import json
+import os
+import socket
+import tempfile
 import time
-import datetime
-import sys
 import webbrowser
+from concurrent import futures
 
 try:
-    import json
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urlencode
+    from urllib.request import urlopen
 except ImportError:
-    import simplejson as json
+    from urllib import urlencode
+    from urllib2 import HTTPError, URLError, urlopen
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+API_KEY = os.environ.get('MIXPANEL_API_KEY', 'xxxxxxxxxxxx')
+API_SECRET = os.environ.get('MIXPANEL_API_SECRET', 'xxxxxxxxxxxx')
+
+TOOL_DESCRIPTION = '''
+Scores an A/B test from a Mixpanel funnel segmented by an experiment property
+
+The funnel is fetched one day at a time, with up to --workers requests in
+flight.  Mixpanel counts days in the project's timezone, given by --timezone.
+Every day before today there is cached on disk under --cache_dir (its counts
+no longer change), so running the tool again only fetches today.  Without
+--timezone, today is the local date and yesterday isn't cached either, since
+it may not be over in the project's timezone.
+Counts are summed over the days; the last funnel step gives the successes
+and the first step gives the trials of each group.  The results are printed
+along with the Abba url, which is also opened in a browser unless
+--no_browser is given.
+'''
 
-API_KEY = 'xxxxxxxxxxxx'
-API_SECRET = 'xxxxxxxxxxxx'
+# HTTP statuses worth retrying: rate limiting and server errors
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# the counts are appended to this to view them in the web app, see --abba_url
+ABBA_URL = "http://www.thumbtack.com/labs/abba/#"
+
+def _utf8(value):
+    if isinstance(value, text_type):
+        return value.encode('utf-8')
+    return str(value).encode('utf-8')
 
 class Mixpanel(object):
 
     ENDPOINT = 'http://mixpanel.com/api'
     VERSION = '2.0'
 
-    def __init__(self, api_key, api_secret):
+    def __init__(self, api_key, api_secret, endpoint=None, timeout=60, retries=3,
+                 backoff_seconds=1.0):
         self.api_key = api_key
         self.api_secret = api_secret
-        
+        self.endpoint = endpoint or self.ENDPOINT
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+
     def request(self, methods, params, format='json'):
         """
             methods - List of methods to be joined, e.g. ['events', 'properties', 'values']
                       will give us http://mixpanel.com/api/2.0/events/properties/values/
             params - Extra parameters associated with method
+
+            Failed requests are retried up to self.retries times, waiting
+            backoff_seconds, then twice that, and so on between attempts.
         """
+        attempt = 0
+        while True:
+            try:
+                return self._request_once(methods, dict(params), format)
+            except (HTTPError, URLError, socket.timeout) as error:
+                retryable = getattr(error, 'code', None) in RETRY_STATUSES or not isinstance(
+                    error, HTTPError
+                )
+                if not retryable or attempt >= self.retries:
+                    raise
+            time.sleep(self.backoff_seconds * 2 ** attempt)
+            attempt += 1
+
+    def _request_once(self, methods, params, format):
         params['api_key'] = self.api_key
         params['expire'] = int(time.time()) + 600   # Grant this request 10 minutes.
         params['format'] = format
         if 'sig' in params: del params['sig']
         params['sig'] = self.hash_args(params)
 
-        request_url = '/'.join([self.ENDPOINT, str(self.VERSION)] + methods) + '/?' + self.unicode_urlencode(params)
+        request_url = '/'.join([self.endpoint, str(self.VERSION)] + methods) + '/?' + self.unicode_urlencode(params)
 
-        request = urllib.urlopen(request_url)
-        data = request.read()
+        request = urlopen(request_url, timeout=self.timeout)
+        try:
+            data = request.read()
+        finally:
+            request.close()
 
-        return json.loads(data)
+        return json.loads(data.decode('utf-8'))
 
     def unicode_urlencode(self, params):
         """
-            Convert lists to JSON encoded strings, and correctly handle any 
+            Convert lists to JSON encoded strings, and correctly handle any
             unicode URL parameters.
         """
         if isinstance(params, dict):
-            params = params.items()
+            params = list(params.items())
         for i, param in enumerate(params):
-            if isinstance(param[1], list): 
+            if isinstance(param[1], list):
                 params[i] = (param[0], json.dumps(param[1]),)
 
-        return urllib.urlencode(
-            [(k, isinstance(v, unicode) and v.encode('utf-8') or v) for k, v in params]
+        return urlencode(
+            [(k, isinstance(v, text_type) and v.encode('utf-8') or v) for k, v in params]
         )
 
     def hash_args(self, args, secret=None):
         """
-            Hashes arguments by joining key=value pairs, appending a secret, and 
+            Hashes arguments by joining key=value pairs, appending a secret, and
             then taking the MD5 hex digest.
         """
         for a in args:
             if isinstance(args[a], list): args[a] = json.dumps(args[a])
 
-        args_joined = ''
+        args_joined = b''
         for a in sorted(args.keys()):
-            if isinstance(a, unicode):
-                args_joined += a.encode('utf-8')
-            else:
-                args_joined += str(a)
-
-            args_joined += '='
-
-            if isinstance(args[a], unicode):
-                args_joined += args[a].encode('utf-8')
-            else:
-                args_joined += str(args[a])
+            args_joined += _utf8(a) + b'=' + _utf8(args[a])
 
         hash = hashlib.md5(args_joined)
 
         if secret:
-            hash.update(secret)
+            hash.update(_utf8(secret))
         elif self.api_secret:
-            hash.update(self.api_secret)
-        return hash.hexdigest() 
+            hash.update(_utf8(self.api_secret))
+        return hash.hexdigest()
 
-def get_api():
+def get_api(endpoint=None):
     return Mixpanel(
-        api_key = API_KEY, 
-        api_secret = API_SECRET
+        api_key = API_KEY,
+        api_secret = API_SECRET,
+        endpoint = endpoint,
     )
 
-def experiment(funnel, exp, days=None):
+class DayCache(object):
     """
-    funnel: a Mixpanel funnel ID
-    exp: experiment key (a Mixpanel property)
-    days: number of days back (defaults to 1 day)
+        Funnel counts for single days, stored as one JSON file per funnel,
+        property and day under a directory.  Only days that are over are
+        cached, since today's counts still change.
     """
-    api = get_api()
 
-    if days is None:
-        days = 0
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, funnel, prop, day):
+        key = hashlib.md5(_utf8(prop)).hexdigest()[:16]
+        return os.path.join(self.directory, '%s-%s-%s.json' % (funnel, key, day))
 
-    today = datetime.datetime.now()
-    past = today - datetime.timedelta(days=int(days))
+    def get(self, funnel, prop, day):
+        try:
+            with open(self._path(funnel, prop, day)) as cache_file:
+                return json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return None
 
+    def set(self, funnel, prop, day, buckets):
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+        # write to a temporary file and rename it, so readers never see a partial file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as cache_file:
+            json.dump(buckets, cache_file)
+        getattr(os, 'replace', os.rename)(temporary_path, self._path(funnel, prop, day))
+
+def fetch_day(api, funnel, prop, day):
+    """
+    Returns the funnel steps of each bucket of the property on one day, as a dict of bucket ->
+    list of steps
+    """
+    day = day.strftime('%Y-%m-%d')
     result = api.request(['funnels'], {
         'funnel_id': int(funnel),
-        'from_date': past.strftime('%Y-%m-%d'),
-        'to_date': today.strftime('%Y-%m-%d'),
-        'on': 'properties["%s"]' % exp,
+        'from_date': day,
+        'to_date': day,
+        'on': 'properties["%s"]' % prop,
     })
+    return result['data'].get(day, {})
+
+def project_today(timezone=None):
+    """
+    Returns today's date in timezone (an IANA name such as 'America/Los_Angeles'), or the local
+    date if timezone is None
+    """
+    if timezone is None:
+        return datetime.date.today()
+    if ZoneInfo is None:
+        raise ValueError('Timezones need Python 3.9 or later')
+    return datetime.datetime.now(ZoneInfo(timezone)).date()
 
-    data = result['data']
+def fetch_days(api, funnel, prop, days, cache=None, workers=8, today=None, timezone=None):
+    """
+    Fetch the last days + 1 days of the funnel (today included), running up to workers requests
+    at once. today defaults to project_today(timezone), where timezone is the project's.
+    Days that are over there are read from and saved to cache, if given: days before today, or
+    without a timezone, days before yesterday, since the project's day may lag the local one.
+    Returns a list of the per-day results of fetch_day(), oldest first.
+    """
+    today = today or project_today(timezone)
+    dates = [today - datetime.timedelta(days=offset) for offset in range(int(days), -1, -1)]
+    last_cached = today - datetime.timedelta(days=1 if timezone else 2)
+
+    def fetch(date):
+        cacheable = cache is not None and date <= last_cached
+        if cacheable:
+            buckets = cache.get(funnel, prop, str(date))
+            if buckets is not None:
+                return buckets
+        buckets = fetch_day(api, funnel, prop, date)
+        if cacheable:
+            cache.set(funnel, prop, str(date), buckets)
+        return buckets
+
+    with futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(fetch, dates))
+
+def aggregate_days(days_of_buckets):
+    """
+    Sum funnel steps over days, returning an OrderedDict of bucket -> [successes, trials] with
+    successes from the last step and trials from the first. The baseline bucket comes first.
+    """
+    steps = {}
+    for buckets in days_of_buckets:
+        for bucket_key, events in buckets.items():
+            counts = steps.setdefault(bucket_key, [])
+            for i, event in enumerate(events):
+                if len(counts) < i + 1:
+                    counts.append(0)
+                counts[i] += event['count']
 
-    final = {}
-    for day, buckets in data.iteritems():
-        for bucket_key, events in buckets.iteritems():
-            if not final.has_key(bucket_key):
-                final[bucket_key] = []
-            for i in xrange(0, len(events)):
-                if len(final[bucket_key]) < (i + 1):
-                    final[bucket_key].append(0)
-                final[bucket_key][i] += events[i]['count']
+    groups = collections.OrderedDict()
+    for key in sorted(steps, key=lambda key: (key != 'baseline', key)):
+        if steps[key]:
+            groups[key] = [steps[key][-1], steps[key][0]]
+    return groups
 
-    abba = []
-    for key, events in final.iteritems():
-        events.reverse()
-        query = "%s=%s" % (key, ",".join([str(event) for event in events]))
-        if key == "baseline":
-            abba.insert(0, query)
-        else:
-            abba.append(query)
+def build_url(groups, abba_url=ABBA_URL):
+    return abba_url + "&".join(
+        "%s=%s,%s" % (key, successes, trials) for key, (successes, trials) in groups.items()
+    )
 
-    abba_url = "http://www.thumbtack.com/labs/abba/#" + "&".join(abba)
+def format_results(groups, confidence_level=0.95):
+    """
+    Score the groups with abba.stats and format them as a text table
+    """
+    import abba.report
 
-    print abba_url
-    webbrowser.open_new_tab(abba_url)
+    group_results = abba.report.score_groups(groups, confidence_level=confidence_level)
+    return abba.report.format_results_table(groups, group_results, confidence_level)
+
+def experiment(funnel, exp, days=None, endpoint=None, cache_dir=None, workers=8,
+               open_browser=True, abba_url=ABBA_URL, timezone=None):
+    """
+    funnel: a Mixpanel funnel ID
+    exp: experiment key (a Mixpanel property)
+    days: number of days back (defaults to 0, today only)
+    timezone: the Mixpanel project's timezone (defaults to the local one, see fetch_days())
+    """
+    api = get_api(endpoint)
+    cache = DayCache(cache_dir) if cache_dir else None
+    groups = aggregate_days(fetch_days(
+        api, funnel, exp, days or 0, cache, workers, timezone=timezone,
+    ))
+
+    abba_url = build_url(groups, abba_url)
+    if len(groups) > 1:
+        print(format_results(groups))
+    print(abba_url)
+    if open_browser:
+        webbrowser.open_new_tab(abba_url)
+    return groups
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description=TOOL_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('funnel', help='A Mixpanel funnel ID')
+    parser.add_argument('experiment', help='The Mixpanel property holding the experiment group')
+    parser.add_argument(
+        'days', nargs='?', type=int, default=0,
+        help='Number of days back to include (default: 0, today only)',
+    )
+    parser.add_argument(
+        '-e', '--endpoint', default=Mixpanel.ENDPOINT,
+        help='Base url of the Mixpanel API (default: %s)' % Mixpanel.ENDPOINT,
+    )
+    parser.add_argument(
+        '--cache_dir', default=os.path.join(os.path.expanduser('~'), '.abba', 'mixpanel'),
+        help='Directory for cached daily counts (default: ~/.abba/mixpanel)',
+    )
+    parser.add_argument(
+        '--no_cache', action='store_true', help='Fetch every day, ignoring the cache',
+    )
+    parser.add_argument(
+        '--timezone',
+        help="The Mixpanel project's timezone, e.g. America/Los_Angeles (default: "
+             "the local one, and yesterday isn't cached)",
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int, default=8,
+        help='Maximum number of concurrent requests (default: 8)',
+    )
+    parser.add_argument(
+        '-n', '--no_browser', action='store_true', help="Don't open the Abba url",
+    )
+    parser.add_argument(
+        '--abba_url', default=ABBA_URL,
+        help='Start of the Abba url, followed by the counts (default: %s; for a local '
+             'abba.server, http://localhost:8000/demo/abba.html?)' % ABBA_URL,
+    )
+    args = parser.parse_args()
+    if args.timezone is not None:
+        try:
+            project_today(args.timezone)
+        except (KeyError, ValueError) as error:
+            # an unknown timezone raises a KeyError
+            parser.error('Invalid --timezone %r: %s' % (args.timezone, error))
+    return args
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print "Usage: %s <funnel> <experiment> [days]" % sys.argv[0]
-        sys.exit()
-
-    funnel = sys.argv[1]
-    exp = sys.argv[2]
-
-    if len(sys.argv) > 3:
-        days = sys.argv[3]
-        experiment(funnel, exp, days)
-    else:
-        experiment(funnel, exp)
+    args = parse_arguments()
+    experiment(
+        args.funnel,
+        args.experiment,
+        args.days,
+        endpoint=args.endpoint,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        workers=args.workers,
+        open_browser=not args.no_browser,
+        abba_url=args.abba_url,
+        timezone=args.timezone,
+    )
@@ -6,8 +6,13 @@ A CLI tool for formulating an Abba url using data from PostgreSQL
 from __future__ import print_function
 
 import argparse
-import psycopg2
+import collections
+import contextlib
+import importlib
+import json
 import sys
+import threading
+from concurrent import futures
 
 
 TOOL_DESCRIPTION = '''
@@ -17,10 +22,47 @@ The query passed to this tool should return three columns, which will
 become the label, success count, and trial count in Abba.  If the query
 flag is not specified, the query will be taken from standard input.
 
+With --aggregate, the query should instead return one row per trial with
+two columns, the label and whether the trial succeeded (a boolean or 0/1),
+and the counting is done by PostgreSQL.
+
+Rows are streamed from a server-side cursor and summed per label as they
+arrive, so memory use doesn't depend on the size of the result set.  With
+--results, the groups are scored locally with the abba Python package
+(which must be installed) instead of printing a URL.  The baseline is the
+group given by --baseline, else the group labeled "baseline", else the
+first group returned.
+
+With --batch, many experiments are scored in one run and one JSON line
+of results is printed per experiment.  The batch file has one JSON object
+per line with a "name" and a "query", and optionally "aggregate" and
+"baseline" overriding the flags of the same names.  Alternatively, with
+--key_column, the query's first column is an experiment key and one JSON
+line is printed per key.  Batch queries share a pool of up to --workers
+connections and run concurrently on that many threads.
+
 Note that the db parameters are optional, and if not provided psycopg2
 will attempt to connect to the default locally-hosted database.
 '''
 
+CURSOR_NAME = 'abba_experiment'
+
+AGGREGATE_QUERY_TEMPLATE = '''
+SELECT label, SUM(success::int), COUNT(*)
+FROM ({}) AS abba_trials (label, success)
+GROUP BY label
+ORDER BY label
+'''
+
+KEYED_AGGREGATE_QUERY_TEMPLATE = '''
+SELECT experiment, label, SUM(success::int), COUNT(*)
+FROM ({}) AS abba_trials (experiment, label, success)
+GROUP BY experiment, label
+ORDER BY experiment, label
+'''
+
+ABBA_URL = 'http://thumbtack.com/labs/abba#'
+
 
 def parse_arguments():
     '''
@@ -38,36 +80,324 @@ def parse_arguments():
         '-q', '--query',
         help='The query which will provide the data for Abba',
     )
+    parser.add_argument(
+        '-a', '--aggregate', action='store_true',
+        help='The query returns (label, success) rows, one per trial, to be '
+             'counted by the database',
+    )
+    parser.add_argument(
+        '-r', '--results', action='store_true',
+        help='Print results computed locally instead of an Abba url',
+    )
+    parser.add_argument(
+        '--abba_url', default=ABBA_URL,
+        help='Start of the Abba url, followed by the counts (default: %s; for a '
+             'local abba.server, http://localhost:8000/demo/abba.html?)' % ABBA_URL,
+    )
+    parser.add_argument(
+        '-b', '--baseline', metavar='LABEL',
+        help='Label of the baseline group, for --results',
+    )
+    parser.add_argument(
+        '-c', '--confidence_level', type=float, default=0.95,
+        help='Confidence level for --results (default: 0.95)',
+    )
+    parser.add_argument(
+        '--itersize', type=int, default=10000,
+        help='Number of rows fetched from the server at a time (default: 10000)',
+    )
+    parser.add_argument(
+        '--batch', metavar='FILE',
+        help='A file of named queries to score, one JSON object per line',
+    )
+    parser.add_argument(
+        '-k', '--key_column', action='store_true',
+        help='The query returns an experiment key before the other columns; '
+             'print JSON results per key',
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int, default=4,
+        help='Maximum number of concurrent queries and connections for '
+             '--batch (default: 4)',
+    )
+    parser.add_argument(
+        '--db_module', default='psycopg2',
+        help='DB-API module used to connect (default: psycopg2)',
+    )
     return parser.parse_args()
 
 
-def build_url_from_database_query(dsn, query):
+class ConnectionPool(object):
     '''
-    Build an Abba URL using data from a PostgreSQL connection and query
+    A thread-safe pool of DB-API connections, opened as needed up to maxconn
+    '''
+
+    def __init__(self, connect, maxconn):
+        self._connect = connect
+        self._idle = []
+        self._available = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def connection(self):
+        self._available.acquire()
+        try:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = self._connect()
+            try:
+                yield connection
+                connection.commit()
+            except Exception:
+                connection.close()
+                raise
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._available.release()
+
+    def close_all(self):
+        with self._lock:
+            for connection in self._idle:
+                connection.close()
+            self._idle = []
+
+
+def build_query(query, aggregate=False):
+    '''
+    Return the query to run, pushing the counting down into SQL if aggregate
+    is set
     '''
-    url_template = 'http://thumbtack.com/labs/abba#{}'
+    if aggregate:
+        return AGGREGATE_QUERY_TEMPLATE.format(query.strip().rstrip(';'))
+    return query
 
-    cursor = psycopg2.connect(dsn).cursor()
-    cursor.execute(query)
 
-    if not cursor.rowcount:
-        return url_template.format('')
+def stream_rows(connection, query, itersize=10000):
+    '''
+    Yield the rows of a query from a server-side cursor, fetching itersize
+    rows at a time.  DB-API modules without named cursors fall back to
+    fetchmany() on an ordinary cursor.
+    '''
+    try:
+        cursor = connection.cursor(name=CURSOR_NAME)
+    except TypeError:
+        cursor = connection.cursor()
+    else:
+        # psycopg2 named cursors fetch this many rows per round trip
+        cursor.itersize = itersize
+    try:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(itersize)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        cursor.close()
 
-    rows = cursor.fetchall()
-    if len(rows[0]) != 3:
-        raise ValueError('Query does not return 3 columns of data')
 
-    groups_querystr = '&'.join('{}={}%2C{}'.format(*row) for row in rows)
+def aggregate_groups(rows):
+    '''
+    Sum (label, successes, trials) rows per label, keeping labels in the order
+    they were first seen
+    '''
+    groups = collections.OrderedDict()
+    for row in rows:
+        if len(row) != 3:
+            raise ValueError('Query does not return 3 columns of data')
+        label, num_successes, num_trials = row
+        counts = groups.setdefault(label, [0, 0])
+        counts[0] += int(num_successes)
+        counts[1] += int(num_trials)
+    return groups
+
+
+def aggregate_keyed_groups(rows):
+    '''
+    Sum (key, label, successes, trials) rows per key and label, returning an
+    OrderedDict of key -> OrderedDict of label -> [successes, trials]
+    '''
+    experiments = collections.OrderedDict()
+    for row in rows:
+        if len(row) != 4:
+            raise ValueError('Query does not return 4 columns of data')
+        key, label, num_successes, num_trials = row
+        groups = experiments.setdefault(key, collections.OrderedDict())
+        counts = groups.setdefault(label, [0, 0])
+        counts[0] += int(num_successes)
+        counts[1] += int(num_trials)
+    return experiments
 
+
+def load_db_module(name='psycopg2'):
+    return importlib.import_module(name)
+
+
+def groups_from_database_query(dsn, query, aggregate=False, itersize=10000,
+                               db_module=None):
+    '''
+    Run a query and return an OrderedDict of label -> [successes, trials]
+    '''
+    db_module = db_module or load_db_module()
+    connection = db_module.connect(dsn)
+    try:
+        return aggregate_groups(
+            stream_rows(connection, build_query(query, aggregate), itersize)
+        )
+    finally:
+        connection.close()
+
+
+def build_url_from_groups(groups, abba_url=ABBA_URL):
+    '''
+    Build an Abba URL from an OrderedDict of label -> (successes, trials)
+    '''
+    url_template = abba_url + '{}'
+    groups_querystr = '&'.join(
+        '{}={}%2C{}'.format(label, *counts) for label, counts in groups.items()
+    )
     return url_template.format(groups_querystr)
 
 
+def build_url_from_database_query(dsn, query, aggregate=False, itersize=10000):
+    '''
+    Build an Abba URL using data from a PostgreSQL connection and query
+    '''
+    return build_url_from_groups(
+        groups_from_database_query(dsn, query, aggregate, itersize)
+    )
+
+
+def read_batch(batch_file, aggregate=False, baseline=None):
+    '''
+    Read named queries from a file with one JSON object per line, filling in
+    defaults for aggregate and baseline
+    '''
+    specs = []
+    for line in batch_file:
+        if not line.strip():
+            continue
+        spec = json.loads(line)
+        if 'name' not in spec or 'query' not in spec:
+            raise ValueError('Batch entries need a "name" and a "query"')
+        spec.setdefault('aggregate', aggregate)
+        spec.setdefault('baseline', baseline)
+        specs.append(spec)
+    return specs
+
+
+def score_to_dict(name, groups, baseline=None, confidence_level=0.95):
+    '''
+    Score the groups of one experiment and return a dict suitable for JSON
+    '''
+    import abba.report
+
+    output = collections.OrderedDict([('experiment', name)])
+    try:
+        group_results = abba.report.score_groups(
+            groups, baseline, confidence_level
+        )
+        output.update(abba.report.group_results_to_dict(groups, group_results))
+    except (ValueError, ZeroDivisionError) as error:
+        output['error'] = str(error)
+    return output
+
+
+def run_batch(pool, specs, confidence_level=0.95, itersize=10000, workers=4):
+    '''
+    Run each named query over the pool, with up to workers at once, and yield
+    a result dict per query in the order given
+    '''
+    def run_spec(spec):
+        try:
+            with pool.connection() as connection:
+                groups = aggregate_groups(stream_rows(
+                    connection,
+                    build_query(spec['query'], spec['aggregate']),
+                    itersize,
+                ))
+        except Exception as error:
+            return collections.OrderedDict(
+                [('experiment', spec['name']), ('error', str(error))]
+            )
+        return score_to_dict(
+            spec['name'], groups, spec['baseline'], confidence_level
+        )
+
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for output in executor.map(run_spec, specs):
+            yield output
+
+
+def run_keyed_query(pool, query, aggregate=False, baseline=None,
+                    confidence_level=0.95, itersize=10000):
+    '''
+    Run a query whose first column is an experiment key and yield a result
+    dict per key
+    '''
+    if aggregate:
+        query = KEYED_AGGREGATE_QUERY_TEMPLATE.format(query.strip().rstrip(';'))
+    with pool.connection() as connection:
+        experiments = aggregate_keyed_groups(
+            stream_rows(connection, query, itersize)
+        )
+    for key, groups in experiments.items():
+        yield score_to_dict(key, groups, baseline, confidence_level)
+
+
+def format_results(groups, baseline=None, confidence_level=0.95):
+    '''
+    Score the groups with abba.stats and format them as a text table
+    '''
+    import abba.report
+
+    group_results = abba.report.score_groups(groups, baseline, confidence_level)
+    return abba.report.format_results_table(
+        groups, group_results, confidence_level
+    )
+
+
 def main():
     args = parse_arguments()
-    query = args.query if args.query is not None else sys.stdin.read()
     params = args.db_params if args.db_params else ''
+    db_module = load_db_module(args.db_module)
+
+    if args.batch or args.key_column:
+        pool = ConnectionPool(lambda: db_module.connect(params), args.workers)
+        try:
+            if args.batch:
+                with open(args.batch) as batch_file:
+                    specs = read_batch(batch_file, args.aggregate, args.baseline)
+                outputs = run_batch(
+                    pool, specs, args.confidence_level, args.itersize,
+                    args.workers,
+                )
+            else:
+                query = (
+                    args.query if args.query is not None else sys.stdin.read()
+                )
+                outputs = run_keyed_query(
+                    pool, query, args.aggregate, args.baseline,
+                    args.confidence_level, args.itersize,
+                )
+            for output in outputs:
+                print(json.dumps(output))
+                sys.stdout.flush()
+        finally:
+            pool.close_all()
+        return
 
-    print(build_url_from_database_query(params, query))
+    query = args.query if args.query is not None else sys.stdin.read()
+    groups = groups_from_database_query(
+        params, query, args.aggregate, args.itersize, db_module
+    )
+    if args.results:
+        print(format_results(groups, args.baseline, args.confidence_level))
+    else:
+        print(build_url_from_groups(groups, args.abba_url))
 
 
 if __name__ == '__main__':
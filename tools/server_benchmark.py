@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+'''
+A load generator measuring the throughput and latency of abba.server
+'''
+
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import timeit
+
+from http import client as http_client
+from urllib import parse
+
+
+TOOL_DESCRIPTION = '''
+Measures requests per second and latency percentiles of abba.server
+
+Client threads send POST /score requests over keep-alive connections for
+a fixed duration.  Each request is a batch of --batch_size experiments,
+drawn from a pool of --distinct experiments (so repeated experiments are
+answered from the server's cache) or all different with --distinct 0.
+Each experiment has a baseline and --variations variations of --trials
+trials each, with success rates around 5%.
+
+Unless --url is given, a server is started in a separate process so it
+doesn't compete with the clients for the interpreter lock.
+'''
+
+
+def parse_arguments():
+    '''
+    Parse the arguments from the command line for this program
+    '''
+    parser = argparse.ArgumentParser(
+        description=TOOL_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        '--url',
+        help='Base url of a running server (default: start one)',
+    )
+    parser.add_argument(
+        '-c', '--clients', type=int, default=8,
+        help='Number of concurrent client connections (default: 8)',
+    )
+    parser.add_argument(
+        '-d', '--duration', type=float, default=10,
+        help='Seconds to send requests for (default: 10)',
+    )
+    parser.add_argument(
+        '-b', '--batch_size', type=int, default=1,
+        help='Experiments per request (default: 1)',
+    )
+    parser.add_argument(
+        '--distinct', type=int, default=1000,
+        help='Number of distinct experiments, or 0 for all different '
+             '(default: 1000)',
+    )
+    parser.add_argument(
+        '--variations', type=int, default=2,
+        help='Variations per experiment (default: 2)',
+    )
+    parser.add_argument(
+        '--trials', type=int, default=10000,
+        help='Trials per group (default: 10000)',
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Random seed for the experiments (default: 0)',
+    )
+    return parser.parse_args()
+
+
+def random_experiment(generator, num_variations, num_trials):
+    '''
+    An experiment with success rates around 5%, in the abba.server format
+    '''
+    groups = {}
+    for index in range(num_variations + 1):
+        label = 'baseline' if index == 0 else 'variation {}'.format(index)
+        rate = generator.uniform(0.04, 0.06)
+        groups[label] = [int(rate * num_trials), num_trials]
+    return {'groups': groups}
+
+
+def serve(connection):
+    '''
+    Run a server on a free port in this process, sending the port back
+    '''
+    import abba.server
+
+    server = abba.server.make_server(port=0)
+    connection.send(server.server_address[1])
+    server.serve_forever()
+
+
+def start_server():
+    '''
+    Start a server in a child process, returning (process, base url)
+    '''
+    parent_connection, child_connection = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=serve, args=(child_connection,))
+    process.daemon = True
+    process.start()
+    port = parent_connection.recv()
+    return process, 'http://127.0.0.1:{}'.format(port)
+
+
+def make_payloads(args, seed, pool):
+    '''
+    Yield request bodies forever, drawing experiments from the pool, or
+    making new ones if it's empty
+    '''
+    generator = random.Random(seed)
+    while True:
+        experiments = [
+            pool[generator.randrange(len(pool))] if pool else
+            random_experiment(generator, args.variations, args.trials)
+            for _ in range(args.batch_size)
+        ]
+        yield json.dumps({'experiments': experiments}).encode('utf-8')
+
+
+def run_client(url, payloads, deadline, latencies, errors):
+    '''
+    Send requests until the deadline, appending latencies in seconds
+    '''
+    address = parse.urlsplit(url)
+    connection = http_client.HTTPConnection(address.hostname, address.port)
+    headers = {'Content-Type': 'application/json'}
+    try:
+        for payload in payloads:
+            if timeit.default_timer() >= deadline:
+                break
+            start_time = timeit.default_timer()
+            connection.request('POST', '/score', payload, headers)
+            response = connection.getresponse()
+            response.read()
+            latencies.append(timeit.default_timer() - start_time)
+            if response.status != 200:
+                errors.append(response.status)
+    finally:
+        connection.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    args = parse_arguments()
+    generator = random.Random(args.seed)
+    pool = [
+        random_experiment(generator, args.variations, args.trials)
+        for _ in range(args.distinct)
+    ]
+    payloads_per_client = [
+        make_payloads(args, args.seed * args.clients + client + 1, pool)
+        for client in range(args.clients)
+    ]
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server()
+    try:
+        latencies = [[] for _ in range(args.clients)]
+        errors = []
+        deadline = timeit.default_timer() + args.duration
+        threads = [
+            threading.Thread(
+                target=run_client,
+                args=(url, payloads, deadline, client_latencies, errors),
+            )
+            for payloads, client_latencies in zip(payloads_per_client, latencies)
+        ]
+        start_time = timeit.default_timer()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = timeit.default_timer() - start_time
+    finally:
+        if process is not None:
+            process.terminate()
+
+    all_latencies = sorted(
+        latency for client_latencies in latencies for latency in client_latencies
+    )
+    if not all_latencies:
+        print('No requests completed')
+        return
+    num_requests = len(all_latencies)
+    print('requests:        {}'.format(num_requests))
+    print('errors:          {}'.format(len(errors)))
+    print('requests/s:      {:.1f}'.format(num_requests / elapsed))
+    print('experiments/s:   {:.1f}'.format(num_requests * args.batch_size / elapsed))
+    for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        print('{} latency:     {:.2f} ms'.format(
+            name, 1000 * percentile(all_latencies, fraction)
+        ))
+    print('max latency:     {:.2f} ms'.format(1000 * all_latencies[-1]))
+
+
+if __name__ == '__main__':
+    main()
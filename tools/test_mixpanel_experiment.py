@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+'''
+Tests for mixpanel_experiment.py, against a stand-in Mixpanel API served
+over HTTP on localhost
+
+Run from the repository root with: python -m pytest tools
+'''
+
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from http import server as http_server
+from urllib import parse
+
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIRECTORY, os.pardir, 'python'))
+sys.path.insert(0, TOOLS_DIRECTORY)
+
+import mixpanel_experiment
+
+TODAY = datetime.date(2012, 9, 27)
+
+
+class FunnelHandler(http_server.BaseHTTPRequestHandler):
+    '''
+    Answers funnel requests with counts depending on the day, after first
+    answering with any statuses queued in server.failures
+    '''
+
+    def log_message(self, format, *arguments):
+        pass
+
+    def do_GET(self):
+        url = parse.urlsplit(self.path)
+        params = dict(parse.parse_qsl(url.query))
+        with self.server.lock:
+            self.server.requests.append((url.path, params))
+            status = self.server.failures.pop(0) if self.server.failures else 200
+        if status != 200:
+            self.send_error(status)
+            return
+        day = params['from_date']
+        count = int(day[-2:])
+        body = json.dumps({'data': {day: {
+            'baseline': [{'count': 100 * count}, {'count': 10 * count}],
+            'test': [{'count': 100 * count}, {'count': 20 * count}],
+        }}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MixpanelExperimentTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http_server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), FunnelHandler
+        )
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.failures = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.api = mixpanel_experiment.Mixpanel(
+            'key', 'secret',
+            endpoint='http://127.0.0.1:%d/api' % self.server.server_address[1],
+            timeout=5,
+            retries=2,
+            backoff_seconds=0.001,
+        )
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+
+    def requested_days(self):
+        return sorted(params['from_date'] for _, params in self.server.requests)
+
+    def test_fetch_days(self):
+        days = mixpanel_experiment.fetch_days(
+            self.api, 42, 'experiment', 2, today=TODAY,
+        )
+        self.assertEqual(
+            ['2012-09-25', '2012-09-26', '2012-09-27'], self.requested_days()
+        )
+        path, params = self.server.requests[0]
+        self.assertEqual('/api/2.0/funnels/', path)
+        self.assertEqual(params['from_date'], params['to_date'])
+        self.assertEqual('42', params['funnel_id'])
+        self.assertEqual('properties["experiment"]', params['on'])
+        self.assertTrue(params['sig'])
+        # oldest first
+        self.assertEqual(250, days[0]['baseline'][1]['count'])
+        self.assertEqual(270, days[2]['baseline'][1]['count'])
+
+        groups = mixpanel_experiment.aggregate_days(days)
+        self.assertEqual(['baseline', 'test'], list(groups))
+        self.assertEqual([780, 7800], groups['baseline'])
+        self.assertEqual([1560, 7800], groups['test'])
+
+    def test_cache(self):
+        cache = mixpanel_experiment.DayCache(os.path.join(self.directory, 'cache'))
+        first = mixpanel_experiment.fetch_days(
+            self.api, 42, 'experiment', 2, cache=cache, today=TODAY,
+            timezone='America/Los_Angeles',
+        )
+        self.assertEqual(3, len(self.server.requests))
+        # only the days that are over were saved
+        self.assertEqual(2, len(os.listdir(cache.directory)))
+        self.assertEqual(None, cache.get(42, 'experiment', str(TODAY)))
+
+        del self.server.requests[:]
+        second = mixpanel_experiment.fetch_days(
+            self.api, 42, 'experiment', 2, cache=cache, today=TODAY,
+            timezone='America/Los_Angeles',
+        )
+        self.assertEqual(['2012-09-27'], self.requested_days())
+        self.assertEqual(first, second)
+
+        # another property doesn't share the cached days
+        del self.server.requests[:]
+        mixpanel_experiment.fetch_days(
+            self.api, 42, 'other', 1, cache=cache, today=TODAY,
+            timezone='America/Los_Angeles',
+        )
+        self.assertEqual(['2012-09-26', '2012-09-27'], self.requested_days())
+
+    def test_cache_without_timezone(self):
+        cache = mixpanel_experiment.DayCache(os.path.join(self.directory, 'cache'))
+        mixpanel_experiment.fetch_days(
+            self.api, 42, 'experiment', 2, cache=cache, today=TODAY,
+        )
+        # yesterday may still be in progress in the project's timezone
+        self.assertEqual(None, cache.get(42, 'experiment', '2012-09-26'))
+        self.assertNotEqual(None, cache.get(42, 'experiment', '2012-09-25'))
+
+    @unittest.skipIf(mixpanel_experiment.ZoneInfo is None, 'needs zoneinfo')
+    def test_project_today(self):
+        # UTC+14 is always a day or two ahead of UTC-12
+        days = (
+            mixpanel_experiment.project_today('Pacific/Kiritimati')
+            - mixpanel_experiment.project_today('Etc/GMT+12')
+        ).days
+        self.assertTrue(days in (1, 2))
+
+    def test_retries(self):
+        self.server.failures = [429, 503]
+        days = mixpanel_experiment.fetch_days(
+            self.api, 42, 'experiment', 0, workers=1, today=TODAY,
+        )
+        self.assertEqual(3, len(self.server.requests))
+        self.assertEqual(2700, days[0]['baseline'][0]['count'])
+
+    def test_retries_exhausted(self):
+        self.server.failures = [500, 502, 504]
+        with self.assertRaises(mixpanel_experiment.HTTPError) as context:
+            self.api.request(['funnels'], {'from_date': '2012-09-27'})
+        self.assertEqual(504, context.exception.code)
+        self.assertEqual(3, len(self.server.requests))
+
+    def test_client_errors_not_retried(self):
+        for status in (400, 403, 404):
+            del self.server.requests[:]
+            self.server.failures = [status]
+            with self.assertRaises(mixpanel_experiment.HTTPError) as context:
+                self.api.request(['funnels'], {'from_date': '2012-09-27'})
+            self.assertEqual(status, context.exception.code)
+            self.assertEqual(1, len(self.server.requests))
+
+    def test_build_url(self):
+        groups = mixpanel_experiment.aggregate_days([{
+            'test': [{'count': 10}, {'count': 1}],
+            'baseline': [{'count': 20}, {'count': 3}],
+        }])
+        self.assertEqual(
+            'http://localhost:8000/demo/abba.html?baseline=3,20&test=1,10',
+            mixpanel_experiment.build_url(
+                groups, 'http://localhost:8000/demo/abba.html?'
+            ),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
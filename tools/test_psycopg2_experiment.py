@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+'''
+Tests for psycopg2_experiment.py, using sqlite3 as a stand-in DB-API module
+
+Run from the repository root with: python -m pytest tools
+'''
+
+import collections
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIRECTORY, os.pardir, 'python'))
+sys.path.insert(0, TOOLS_DIRECTORY)
+
+import abba.report
+import psycopg2_experiment
+
+ROWS = [
+    ('signup', 'baseline', 20, 1000),
+    ('signup', 'red', 50, 2000),
+    ('checkout', 'baseline', 5, 100),
+    ('signup', 'red', 10, 500),
+    ('checkout', 'green', 9, 100),
+]
+
+
+class Psycopg2ExperimentTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'experiments.db')
+        connection = self.connect()
+        connection.execute(
+            'CREATE TABLE counts (experiment, label, successes, trials)'
+        )
+        connection.executemany('INSERT INTO counts VALUES (?, ?, ?, ?)', ROWS)
+        connection.commit()
+        connection.close()
+        self.num_connections = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def connect(self):
+        # pooled connections are used by other threads
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def counting_connect(self):
+        self.num_connections += 1
+        return self.connect()
+
+    def test_stream_rows(self):
+        connection = self.connect()
+        try:
+            rows = list(psycopg2_experiment.stream_rows(
+                connection,
+                'SELECT label, successes, trials FROM counts',
+                itersize=2,
+            ))
+        finally:
+            connection.close()
+        self.assertEqual([row[1:] for row in ROWS], rows)
+
+    def test_aggregate_groups(self):
+        groups = psycopg2_experiment.aggregate_groups(row[1:] for row in ROWS)
+        self.assertEqual(['baseline', 'red', 'green'], list(groups))
+        self.assertEqual([25, 1100], groups['baseline'])
+        self.assertEqual([60, 2500], groups['red'])
+        with self.assertRaises(ValueError):
+            psycopg2_experiment.aggregate_groups([('baseline', 1)])
+
+        experiments = psycopg2_experiment.aggregate_keyed_groups(ROWS)
+        self.assertEqual(['signup', 'checkout'], list(experiments))
+        self.assertEqual([60, 2500], experiments['signup']['red'])
+
+    def test_read_batch(self):
+        batch_file = io.StringIO(
+            '{"name": "signup", "query": "SELECT 1"}\n'
+            '\n'
+            '{"name": "checkout", "query": "SELECT 2", "baseline": "green"}\n'
+        )
+        specs = psycopg2_experiment.read_batch(
+            batch_file, aggregate=True, baseline='baseline'
+        )
+        self.assertEqual(['signup', 'checkout'], [spec['name'] for spec in specs])
+        self.assertEqual([True, True], [spec['aggregate'] for spec in specs])
+        self.assertEqual(
+            ['baseline', 'green'], [spec['baseline'] for spec in specs]
+        )
+        with self.assertRaises(ValueError):
+            psycopg2_experiment.read_batch(io.StringIO('{"name": "signup"}\n'))
+
+    def test_connection_pool(self):
+        pool = psycopg2_experiment.ConnectionPool(self.counting_connect, 2)
+        lock = threading.Lock()
+        counts = {'running': 0, 'max_running': 0}
+
+        def query():
+            with pool.connection() as connection:
+                with lock:
+                    counts['running'] += 1
+                    counts['max_running'] = max(
+                        counts['max_running'], counts['running']
+                    )
+                connection.execute('SELECT COUNT(*) FROM counts').fetchall()
+                time.sleep(0.01)
+                with lock:
+                    counts['running'] -= 1
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, counts['max_running'])
+        self.assertEqual(2, self.num_connections)
+
+        # a connection that raised is closed rather than reused
+        with self.assertRaises(sqlite3.OperationalError):
+            with pool.connection() as connection:
+                connection.execute('SELECT * FROM missing')
+        self.assertEqual(1, len(pool._idle))
+        pool.close_all()
+
+    def test_run_batch(self):
+        pool = psycopg2_experiment.ConnectionPool(self.connect, 2)
+        specs = [
+            {
+                'name': name,
+                'query': (
+                    "SELECT label, successes, trials FROM counts "
+                    "WHERE experiment = '%s'" % name
+                ),
+                'aggregate': False,
+                'baseline': None,
+            }
+            for name in ('signup', 'checkout')
+        ]
+        specs.insert(1, {
+            'name': 'broken',
+            'query': 'SELECT * FROM missing',
+            'aggregate': False,
+            'baseline': None,
+        })
+        try:
+            outputs = list(psycopg2_experiment.run_batch(pool, specs, itersize=1))
+        finally:
+            pool.close_all()
+        self.assertEqual(
+            ['signup', 'broken', 'checkout'],
+            [output['experiment'] for output in outputs],
+        )
+        self.assertTrue('error' in outputs[1])
+        groups = collections.OrderedDict(
+            (('baseline', [20, 1000]), ('red', [60, 2500]))
+        )
+        expected = abba.report.group_results_to_dict(
+            groups, abba.report.score_groups(groups)
+        )
+        self.assertEqual(expected['variations'], outputs[0]['variations'])
+
+    def test_run_keyed_query(self):
+        pool = psycopg2_experiment.ConnectionPool(self.connect, 1)
+        try:
+            outputs = list(psycopg2_experiment.run_keyed_query(
+                pool, 'SELECT * FROM counts', baseline='baseline', itersize=2,
+            ))
+        finally:
+            pool.close_all()
+        self.assertEqual(
+            ['signup', 'checkout'], [output['experiment'] for output in outputs]
+        )
+        self.assertEqual(
+            ['green'],
+            [variation['label'] for variation in outputs[1]['variations']],
+        )
+        self.assertEqual(100, outputs[1]['baseline']['num_trials'])
+
+
+if __name__ == '__main__':
+    unittest.main()